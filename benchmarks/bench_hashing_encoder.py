@@ -0,0 +1,160 @@
+"""
+Benchmark of `HashingEncoder.encode`, against the previous encoder that hashed every n-gram of every text.
+
+Sentences are drawn from a fixed vocabulary, so that words come up again as they do in real texts.
+Every analyzer is timed with a cold cache (a new encoder per batch) and a warm one, and the vectors
+are checked to be the same as the previous encoder's:
+
+    python benchmarks/bench_hashing_encoder.py --output encoder.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import numpy as np  # noqa: E402
+
+from learn_to_pick.encoders import _WORD, HashingEncoder  # noqa: E402
+
+
+class PreviousHashingEncoder(HashingEncoder):
+    """The encoder before this benchmark: every n-gram of every text is encoded and hashed one by one."""
+
+    def _ngrams(self, text: str) -> List[str]:
+        if self.lowercase:
+            text = text.lower()
+        low, high = self.ngram_range
+        if self.analyzer == "word":
+            words = _WORD.findall(text)
+            return [
+                " ".join(words[i : i + n])
+                for n in range(low, high + 1)
+                for i in range(len(words) - n + 1)
+            ]
+        if self.analyzer == "char":
+            texts = [" ".join(_WORD.findall(text))] if _WORD.search(text) else []
+        else:
+            texts = [f" {word} " for word in _WORD.findall(text)]
+        return [
+            text[i : i + n]
+            for text in texts
+            for n in range(low, high + 1)
+            for i in range(max(len(text) - n + 1, 1 if n == low else 0))
+        ]
+
+    def _hash(self, text: str) -> Tuple[List[int], List[float]]:
+        buckets, signs = [], []
+        for ngram in self._ngrams(text):
+            h = zlib.crc32(ngram.encode("utf-8"), self.seed)
+            buckets.append(h % self.n_features)
+            signs.append(-1.0 if h & 0x80000000 else 1.0)
+        return buckets, signs
+
+    def encode(self, to_encode: Union[str, List[str]], **kwargs: Any) -> Any:
+        texts = [to_encode] if isinstance(to_encode, str) else list(to_encode)
+        rows, buckets, signs = [], [], []
+        for row, text in enumerate(texts):
+            b, s = self._hash(text)
+            rows.extend([row] * len(b))
+            buckets.extend(b)
+            signs.extend(s)
+        flat = np.asarray(rows, dtype=np.int64) * self.n_features + np.asarray(
+            buckets, dtype=np.int64
+        )
+        vectors = (
+            np.bincount(flat, weights=signs, minlength=len(texts) * self.n_features)
+            .astype(np.float64)
+            .reshape(len(texts), self.n_features)
+        )
+        if self.idf is not None:
+            vectors *= self.idf
+        if self.norm:
+            lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(lengths > 0, lengths, 1)
+        vectors = vectors.astype(np.float32)
+        return vectors[0] if isinstance(to_encode, str) else vectors
+
+
+ANALYZERS = {"char_wb": (3, 5), "char": (3, 5), "word": (1, 2)}
+
+
+def sentences(n: int, vocabulary: int = 2000, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    words = [
+        "".join(
+            rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10))
+        )
+        for _ in range(vocabulary)
+    ]
+    return [" ".join(rng.choices(words, k=rng.randint(5, 15))) for _ in range(n)]
+
+
+def time_per_sentence(encoder: HashingEncoder, texts: List[str], batch: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        encoder.encode(texts[i : i + batch])
+    return (time.perf_counter() - start) / len(texts)
+
+
+def bench(n: int, batch: int, repeat: int) -> Dict[str, Any]:
+    texts = sentences(n)
+    results: Dict[str, Any] = {}
+    for analyzer, ngram_range in ANALYZERS.items():
+        settings = dict(analyzer=analyzer, ngram_range=ngram_range)
+        previous = PreviousHashingEncoder(**settings)
+        warm = HashingEncoder(**settings)
+        np.testing.assert_array_equal(warm.encode(texts), previous.encode(texts))
+        timings: Dict[str, List[float]] = {"previous": [], "cold": [], "warm": []}
+        for _ in range(repeat):
+            timings["previous"].append(time_per_sentence(previous, texts, batch))
+            timings["cold"].append(
+                time_per_sentence(HashingEncoder(**settings), texts, batch)
+            )
+            timings["warm"].append(time_per_sentence(warm, texts, batch))
+        results[analyzer] = {
+            name: statistics.median(values) for name, values in timings.items()
+        }
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="bench_hashing_encoder.json")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sentences": args.sentences,
+            "batch": args.batch,
+            "repeat": args.repeat,
+        },
+        "seconds_per_sentence": bench(args.sentences, args.batch, args.repeat),
+    }
+    for analyzer, timings in report["seconds_per_sentence"].items():
+        print(
+            f"{analyzer:<8} previous {timings['previous'] * 1e6:>7.1f}us"
+            f" cold {timings['cold'] * 1e6:>7.1f}us (x{timings['previous'] / timings['cold']:.1f})"
+            f" warm {timings['warm'] * 1e6:>7.1f}us (x{timings['previous'] / timings['warm']:.1f})"
+        )
+
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
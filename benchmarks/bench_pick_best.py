@@ -0,0 +1,224 @@
+"""
+Benchmarks of the PickBest hot path: run(), featurize, format, predict and learn.
+
+Runs offline, with a deterministic fake sentence encoder and a real VW workspace, over a grid of
+action counts, embedding dimensions, namespace counts and auto_embed on/off. Results are written to
+JSON, and can be compared against a baseline from an earlier run:
+
+    python benchmarks/bench_pick_best.py --output baseline.json
+    # ... change the code ...
+    python benchmarks/bench_pick_best.py --output current.json --baseline baseline.json
+
+The comparison is made on the p50 of every stage, and the exit code is 1 if a stage got slower than
+`--tolerance` (20% by default).
+"""
+import argparse
+import itertools
+import json
+import platform
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import learn_to_pick  # noqa: E402
+from learn_to_pick.metrics import LatencyHistogram  # noqa: E402
+
+STAGES = ["run", "featurize", "format", "predict", "learn"]
+
+
+class FakeEncoder:
+    """Deterministic stand-in for a SentenceTransformer, with embeddings of `dim` floats."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def encode(self, text: Any) -> np.ndarray:
+        rng = np.random.default_rng(zlib.crc32(str(text).encode("utf-8")))
+        return rng.standard_normal(self.dim, dtype=np.float32)
+
+
+class ConstantScorer(learn_to_pick.SelectionScorer):
+    def score_response(self, inputs: Dict[str, Any], picked: Any, event: Any) -> float:
+        return 1.0
+
+
+def make_inputs(
+    actions: int, namespaces: int, auto_embed: bool, seed: int
+) -> Dict[str, Any]:
+    """With auto_embed the featurizer embeds the text itself, otherwise actions are explicitly embedded."""
+    embed = (lambda text: text) if auto_embed else learn_to_pick.Embed
+    inputs: Dict[str, Any] = {
+        f"context{ns}": learn_to_pick.BasedOn(f"context {ns} of user {seed % 97}")
+        for ns in range(namespaces)
+    }
+    inputs["action"] = learn_to_pick.ToSelectFrom(
+        [
+            {
+                f"action{ns}": embed(f"action {a} namespace {ns}")
+                for ns in range(namespaces)
+            }
+            for a in range(actions)
+        ]
+    )
+    return inputs
+
+
+def _timed(histogram: LatencyHistogram, fn: Callable[[], Any]) -> Any:
+    start = time.perf_counter()
+    result = fn()
+    histogram.record(time.perf_counter() - start)
+    return result
+
+
+def bench_config(
+    actions: int,
+    dim: int,
+    namespaces: int,
+    auto_embed: bool,
+    iterations: int,
+    warmup: int,
+) -> Dict[str, Dict[str, float]]:
+    import vowpal_wabbit_next as vw
+
+    histograms = {stage: LatencyHistogram() for stage in STAGES}
+    with tempfile.TemporaryDirectory() as model_dir:
+        picker = learn_to_pick.PickBest.create(
+            selection_scorer=ConstantScorer(),
+            featurizer=learn_to_pick.PickBestFeaturizer(
+                auto_embed=auto_embed, model=FakeEncoder(dim)
+            ),
+            model_save_dir=model_dir,
+        )
+        policy = picker.policy
+        inputs = [
+            make_inputs(actions, namespaces, auto_embed, seed) for seed in range(64)
+        ]
+
+        for i in range(warmup):
+            picker.run(inputs[i % len(inputs)])
+
+        start = time.perf_counter()
+        for i in range(iterations):
+            _timed(histograms["run"], lambda: picker.run(inputs[i % len(inputs)]))
+        run_seconds = time.perf_counter() - start
+
+        parser = vw.TextFormatParser(policy.workspace)
+        for i in range(iterations):
+            event = picker._call_before_predict(inputs[i % len(inputs)])
+            featurized = _timed(
+                histograms["featurize"], lambda: policy.featurizer.featurize(event)
+            )
+            vw_ex = _timed(histograms["format"], lambda: policy.formatter(*featurized))
+            prediction = _timed(
+                histograms["predict"],
+                lambda: policy.workspace.predict_one(
+                    learn_to_pick.base._parse_lines(parser, vw_ex)
+                ),
+            )
+            _, _, event = picker._call_after_predict_before_scoring(
+                inputs=inputs[i % len(inputs)], event=event, prediction=prediction
+            )
+            picker._call_after_scoring_before_learning(event=event, score=1.0)
+            _timed(histograms["learn"], lambda: policy.learn(event))
+
+    results = {stage: h.summary() for stage, h in histograms.items()}
+    results["run"]["throughput"] = iterations / run_seconds
+    return results
+
+
+def config_key(config: Dict[str, Any]) -> str:
+    return ",".join(f"{k}={v}" for k, v in sorted(config.items()))
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Returns a line per (config, stage) present in both runs, marking the regressions."""
+    baseline_results = {config_key(r["config"]): r for r in baseline["results"]}
+    lines = []
+    for result in current["results"]:
+        key = config_key(result["config"])
+        if key not in baseline_results:
+            continue
+        for stage, stats in result["stages"].items():
+            before = baseline_results[key]["stages"].get(stage, {}).get("p50")
+            if not before:
+                continue
+            ratio = stats["p50"] / before
+            marker = "REGRESSION" if ratio > 1 + tolerance else ""
+            lines.append(
+                f"{key:<55} {stage:<10} {before * 1e6:>10.1f}us -> {stats['p50'] * 1e6:>10.1f}us  x{ratio:.2f} {marker}".rstrip()
+            )
+    return lines
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--actions", type=_int_list, default=[2, 10, 50])
+    parser.add_argument("--dims", type=_int_list, default=[2, 64, 384])
+    parser.add_argument("--namespaces", type=_int_list, default=[1, 4])
+    parser.add_argument("--auto-embed", choices=["on", "off", "both"], default="both")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", default="bench_pick_best.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    auto_embeds = {"on": [True], "off": [False], "both": [False, True]}[args.auto_embed]
+    import vowpal_wabbit_next as vw
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "vowpal_wabbit_next": getattr(vw, "__version__", "unknown"),
+            "iterations": args.iterations,
+        },
+        "results": [],
+    }
+    for actions, dim, namespaces, auto_embed in itertools.product(
+        args.actions, args.dims, args.namespaces, auto_embeds
+    ):
+        config = {
+            "actions": actions,
+            "dim": dim,
+            "namespaces": namespaces,
+            "auto_embed": auto_embed,
+        }
+        stages = bench_config(iterations=args.iterations, warmup=args.warmup, **config)
+        report["results"].append({"config": config, "stages": stages})
+        print(
+            f"{config_key(config):<55} run p50 {stages['run']['p50'] * 1e6:>9.1f}us "
+            f"p99 {stages['run']['p99'] * 1e6:>9.1f}us "
+            f"{stages['run']['throughput']:>8.1f} runs/s"
+        )
+
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        lines = compare(
+            report, json.loads(Path(args.baseline).read_text()), args.tolerance
+        )
+        print("\n".join(lines))
+        if any(line.endswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
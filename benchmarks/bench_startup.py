@@ -0,0 +1,135 @@
+"""
+Benchmark of the startup of a worker: importing learn_to_pick, creating a picker and its first run().
+
+Every sample runs in a fresh interpreter, so that nothing is already imported or loaded. Results are
+written to JSON, and can be compared against a baseline from an earlier run:
+
+    python benchmarks/bench_startup.py --output baseline.json
+    # ... change the code ...
+    python benchmarks/bench_startup.py --output current.json --baseline baseline.json
+
+The comparison is made on the median of every stage, and the exit code is 1 if a stage got slower
+than `--tolerance` (20% by default).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SRC = str(Path(__file__).resolve().parents[1] / "src")
+
+STAGES = ["import", "create", "first_run"]
+
+# prints the duration of every stage, and the heavy modules loaded by the end of each
+_WORKER = """
+import json, sys, time
+start = time.perf_counter()
+import learn_to_pick
+imported = time.perf_counter()
+picker = learn_to_pick.PickBest.create(selection_scorer=None, model_save_dir=sys.argv[1])
+created = time.perf_counter()
+picker.run(
+    user=learn_to_pick.BasedOn("Tom"),
+    article=learn_to_pick.ToSelectFrom(["politics", "sports", "music"]),
+)
+ran = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "create": created - imported,
+    "first_run": ran - created,
+    "modules": sorted({"numpy", "pandas", "torch", "sentence_transformers"} & set(sys.modules)),
+}))
+"""
+
+
+def sample() -> Dict[str, Any]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC, env.get("PYTHONPATH")]))
+    with tempfile.TemporaryDirectory() as model_dir:
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", _WORKER, model_dir],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=env,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["process"] = time.perf_counter() - start
+    return result
+
+
+def bench(repeat: int) -> Dict[str, Any]:
+    samples = [sample() for _ in range(repeat)]
+    stages = {
+        stage: {
+            "p50": statistics.median(s[stage] for s in samples),
+            "min": min(s[stage] for s in samples),
+            "max": max(s[stage] for s in samples),
+        }
+        for stage in STAGES + ["process"]
+    }
+    return {"stages": stages, "modules": samples[-1]["modules"]}
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    lines = []
+    for stage, stats in current["stages"].items():
+        before = baseline["stages"].get(stage, {}).get("p50")
+        if not before:
+            continue
+        ratio = stats["p50"] / before
+        marker = "REGRESSION" if ratio > 1 + tolerance else ""
+        lines.append(
+            f"{stage:<10} {before * 1e3:>9.1f}ms -> {stats['p50'] * 1e3:>9.1f}ms  x{ratio:.2f} {marker}".rstrip()
+        )
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default="bench_startup.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        **bench(args.repeat),
+    }
+    for stage, stats in report["stages"].items():
+        print(
+            f"{stage:<10} p50 {stats['p50'] * 1e3:>9.1f}ms min {stats['min'] * 1e3:>9.1f}ms max {stats['max'] * 1e3:>9.1f}ms"
+        )
+    print(f"heavy modules loaded: {', '.join(report['modules']) or 'none'}")
+
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        lines = compare(
+            report, json.loads(Path(args.baseline).read_text()), args.tolerance
+        )
+        print("\n".join(lines))
+        if any(line.endswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,100 @@
+import importlib
+import importlib.util
 import logging
+from typing import TYPE_CHECKING, Any, List
 
-from learn_to_pick.base import (
-    AutoSelectionScorer,
-    BasedOn,
-    Embed,
-    Featurizer,
-    ModelRepository,
-    Policy,
-    SelectionScorer,
-    ToSelectFrom,
-    VwPolicy,
-    VwLogger,
-    embed,
-)
-from learn_to_pick.pick_best import (
-    PickBest,
-    PickBestEvent,
-    PickBestFeaturizer,
-    PickBestRandomPolicy,
-    PickBestSelected,
-)
+if TYPE_CHECKING:
+    from learn_to_pick.base import (
+        AutoSelectionScorer,
+        BasedOn,
+        BatchedAutoSelectionScorer,
+        Embed,
+        Featurizer,
+        InMemoryModelBackend,
+        LazyEncoder,
+        LocalModelBackend,
+        ModelBackend,
+        ModelRepository,
+        Policy,
+        ScoreCache,
+        ScoringCircuitBreaker,
+        ScoringStats,
+        SelectionScorer,
+        ToSelectFrom,
+        VwPolicy,
+        VwLogger,
+        embed,
+    )
+    from learn_to_pick.encoders import HashingEncoder
+    from learn_to_pick.pick_best import (
+        PickBest,
+        PickBestEvent,
+        PickBestFeaturizer,
+        PickBestRandomPolicy,
+        PickBestSelected,
+    )
+    from learn_to_pick.policy_manager import PolicyCacheMetrics, PolicyManager
+
+# public name -> module defining it, the module is only imported when the name is first used
+_LAZY_ATTRIBUTES = {
+    **{
+        name: "learn_to_pick.base"
+        for name in [
+            "AutoSelectionScorer",
+            "BasedOn",
+            "BatchedAutoSelectionScorer",
+            "Embed",
+            "Featurizer",
+            "InMemoryModelBackend",
+            "LazyEncoder",
+            "LocalModelBackend",
+            "ModelBackend",
+            "ModelRepository",
+            "Policy",
+            "ScoreCache",
+            "ScoringCircuitBreaker",
+            "ScoringStats",
+            "SelectionScorer",
+            "ToSelectFrom",
+            "VwPolicy",
+            "VwLogger",
+            "embed",
+        ]
+    },
+    **{
+        name: "learn_to_pick.pick_best"
+        for name in [
+            "PickBest",
+            "PickBestEvent",
+            "PickBestFeaturizer",
+            "PickBestRandomPolicy",
+            "PickBestSelected",
+        ]
+    },
+    "HashingEncoder": "learn_to_pick.encoders",
+    "PolicyCacheMetrics": "learn_to_pick.policy_manager",
+    "PolicyManager": "learn_to_pick.policy_manager",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        # submodules, e.g. `learn_to_pick.base`, are imported on first access too
+        if importlib.util.find_spec(f"{__name__}.{name}") is None:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+        return importlib.import_module(f"{__name__}.{name}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
 
 
 def configure_logger() -> None:
+    """Prints the INFO logs of learn_to_pick to stderr."""
     logger = logging.getLogger(__name__)
     logger.setLevel(logging.INFO)
     ch = logging.StreamHandler()
@@ -47,10 +119,22 @@ __all__ = [
     "ToSelectFrom",
     "SelectionScorer",
     "AutoSelectionScorer",
+    "BatchedAutoSelectionScorer",
+    "ScoreCache",
+    "ScoringCircuitBreaker",
+    "ScoringStats",
     "Featurizer",
+    "LazyEncoder",
+    "HashingEncoder",
     "ModelRepository",
+    "ModelBackend",
+    "LocalModelBackend",
+    "InMemoryModelBackend",
     "Policy",
     "VwPolicy",
+    "PolicyManager",
+    "PolicyCacheMetrics",
     "VwLogger",
     "embed",
+    "configure_logger",
 ]
@@ -0,0 +1,398 @@
+"""
+Approximate nearest neighbor pre-selection of candidate actions, for catalogs too large to send every
+action to the policy.
+
+    catalog = ActionCatalog(featurizer, name="article")
+    catalog.add_many(articles)
+    picker = PickBest.create(featurizer=featurizer, candidate_selector=AnnCandidateSelector(catalog, k=100), [...])
+    picker.run(user=BasedOn("Tom"), article=catalog.to_select_from())
+
+The candidates only depend on the context, so the probability of the picked action among the
+candidates, as recorded in `PickBestSelected`, is its probability given the context.
+"""
+import logging
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from learn_to_pick.catalog import ActionCatalog, CatalogAction
+from learn_to_pick.metrics import LatencyHistogram
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """
+    Inverted file index: vectors are clustered with k-means, and a search only scans the vectors of
+    the `n_probe` clusters whose centroids are the closest to the query.
+
+    Vectors can be added and removed without retraining. The clusters are retrained by `train()`,
+    which is also done automatically when the index has doubled in size since it was last trained.
+
+    Attributes:
+        n_lists (int): Number of clusters. Default is -1, which uses the square root of the number of vectors.
+        n_probe (int): Number of clusters scanned by a search. Default is 8.
+        metric (str): "cosine" or "dot". Default is "cosine".
+        train_iterations (int): Number of k-means iterations. Default is 10.
+        min_train_size (int): Below this number of vectors, searches are exact. Default is 1000.
+        seed (int): Seed of the k-means initialization.
+    """
+
+    def __init__(
+        self,
+        n_lists: int = -1,
+        n_probe: int = 8,
+        metric: str = "cosine",
+        train_iterations: int = 10,
+        min_train_size: int = 1000,
+        seed: int = 0,
+    ):
+        if metric not in ("cosine", "dot"):
+            raise ValueError(f"Unknown metric {metric}, expected one of: cosine, dot")
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.metric = metric
+        self.train_iterations = train_iterations
+        self.min_train_size = min_train_size
+        self.seed = seed
+        self._vectors: Optional["np.ndarray"] = None
+        self._ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._centroids: Optional["np.ndarray"] = None
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional["np.ndarray"]] = []
+        self._slot_list: Dict[int, int] = {}
+        self._trained_size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, id: object) -> bool:
+        return id in self._slots
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def _normalize(self, vectors: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1)
+        return vectors
+
+    def _slot_for(self, id: str, dim: int) -> int:
+        import numpy as np
+
+        if self._vectors is None:
+            self._vectors = np.zeros((16, dim), dtype=np.float32)
+        if self._free:
+            return self._free.pop()
+        slot = len(self._ids)
+        if slot >= len(self._vectors):
+            grown = np.zeros((2 * len(self._vectors), dim), dtype=np.float32)
+            grown[:slot] = self._vectors[:slot]
+            self._vectors = grown
+        self._ids.append(None)
+        return slot
+
+    def add(self, id: str, vector: Sequence[float]) -> None:
+        """Adds a vector, or replaces the vector of `id`."""
+        vector = self._normalize(vector)
+        with self._lock:
+            self.remove(id)
+            slot = self._slot_for(id, len(vector))
+            self._vectors[slot] = vector
+            self._ids[slot] = id
+            self._slots[id] = slot
+            if self._centroids is not None:
+                self._assign(slot, int(self._nearest_lists(vector, 1)[0]))
+            if len(self._slots) >= max(self.min_train_size, 2 * self._trained_size):
+                self.train()
+
+    def add_many(self, ids: Sequence[str], vectors: "np.ndarray") -> None:
+        """Adds vectors, or replaces the vectors of the IDs already in the index. The IDs must be distinct."""
+        if len(set(ids)) != len(ids):
+            raise ValueError("IDs added together must be distinct")
+        vectors = self._normalize(vectors)
+        with self._lock:
+            centroids, self._centroids = self._centroids, None
+            for id, vector in zip(ids, vectors):
+                self.remove(id)
+                slot = self._slot_for(id, len(vector))
+                self._vectors[slot] = vector
+                self._ids[slot] = id
+                self._slots[id] = slot
+            self._centroids = centroids
+            if len(self._slots) >= max(self.min_train_size, 2 * self._trained_size):
+                self.train()
+            elif self._centroids is not None:
+                for id in ids:
+                    slot = self._slots[id]
+                    vector = self._vectors[slot]
+                    self._assign(slot, int(self._nearest_lists(vector, 1)[0]))
+
+    def remove(self, id: str) -> None:
+        with self._lock:
+            slot = self._slots.pop(id, None)
+            if slot is None:
+                return
+            self._ids[slot] = None
+            self._free.append(slot)
+            list_index = self._slot_list.pop(slot, None)
+            if list_index is not None:
+                self._lists[list_index].remove(slot)
+                self._list_arrays[list_index] = None
+
+    def _assign(self, slot: int, list_index: int) -> None:
+        self._lists[list_index].append(slot)
+        self._list_arrays[list_index] = None
+        self._slot_list[slot] = list_index
+
+    def _nearest_lists(self, query: "np.ndarray", n: int) -> "np.ndarray":
+        import numpy as np
+
+        scores = self._centroids @ query
+        n = min(n, len(scores))
+        top = np.argpartition(-scores, n - 1)[:n]
+        return top[np.argsort(-scores[top])]
+
+    def train(self) -> None:
+        """Clusters the vectors with k-means, and assigns every vector to its cluster."""
+        import numpy as np
+
+        with self._lock:
+            slots = np.fromiter(self._slots.values(), dtype=np.int64)
+            if len(slots) < self.min_train_size:
+                self._centroids = None
+                return
+            start = time.monotonic()
+            vectors = self._vectors[slots]
+            n_lists = (
+                self.n_lists if self.n_lists > 0 else max(1, int(np.sqrt(len(slots))))
+            )
+            n_lists = min(n_lists, len(slots))
+            rng = np.random.default_rng(self.seed)
+            sample = vectors[
+                rng.choice(len(vectors), min(len(vectors), 64 * n_lists), replace=False)
+            ]
+            centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+            for _ in range(self.train_iterations):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(n_lists):
+                    members = sample[assignment == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+                centroids = self._normalize(centroids)
+
+            self._centroids = centroids
+            self._lists = [[] for _ in range(n_lists)]
+            self._list_arrays = [None] * n_lists
+            self._slot_list = {}
+            for slot, list_index in zip(
+                slots.tolist(), np.argmax(vectors @ centroids.T, axis=1).tolist()
+            ):
+                self._assign(slot, list_index)
+            self._trained_size = len(slots)
+        logger.info(
+            f"trained an index of {len(slots)} vectors in {n_lists} lists in {time.monotonic() - start:.2f} seconds"
+        )
+
+    def _list_array(self, list_index: int) -> "np.ndarray":
+        import numpy as np
+
+        array = self._list_arrays[list_index]
+        if array is None:
+            array = np.array(self._lists[list_index], dtype=np.int64)
+            self._list_arrays[list_index] = array
+        return array
+
+    def _top(
+        self, slots: "np.ndarray", query: "np.ndarray", k: int
+    ) -> List[Tuple[str, float]]:
+        import numpy as np
+
+        if len(slots) == 0:
+            return []
+        scores = self._vectors[slots] @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[slots[i]], float(scores[i])) for i in top]
+
+    def search(
+        self, query: Sequence[float], k: int, n_probe: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        The (id, score) of the `k` approximate nearest neighbors of `query`, best first. If the `n_probe`
+        closest clusters hold fewer than `k` vectors, twice as many are probed until they do.
+        """
+        import numpy as np
+
+        query = self._normalize(query)
+        with self._lock:
+            if self._centroids is None:
+                return self.search_exact(query, k)
+            n_probe = n_probe or self.n_probe
+            while True:
+                lists = self._nearest_lists(query, n_probe)
+                slots = np.concatenate([self._list_array(int(i)) for i in lists])
+                # small or emptied clusters may hold fewer than k vectors, then more are probed
+                if len(slots) >= k or len(lists) == len(self._centroids):
+                    return self._top(slots, query, k)
+                n_probe *= 2
+
+    def search_exact(
+        self, query: Sequence[float], k: int, ids: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        The (id, score) of the `k` nearest neighbors of `query`, found by scanning every vector, or
+        only the vectors of `ids` when given. IDs that are not in the index are ignored.
+        """
+        import numpy as np
+
+        query = self._normalize(query)
+        with self._lock:
+            if ids is None:
+                slots = np.fromiter(self._slots.values(), dtype=np.int64)
+            else:
+                slots = np.array(
+                    [self._slots[id] for id in ids if id in self._slots], dtype=np.int64
+                )
+            return self._top(slots, query, k)
+
+    def evaluate(
+        self, queries: Sequence[Sequence[float]], k: int, n_probe: Optional[int] = None
+    ) -> Dict[str, float]:
+        """
+        Recall@k of the approximate searches of `queries` against exact searches, and the p50 and
+        p99 latencies of both, in seconds.
+        """
+        ann, exact = LatencyHistogram(), LatencyHistogram()
+        recalls = []
+        for query in queries:
+            start = time.perf_counter()
+            found = self.search(query, k, n_probe=n_probe)
+            ann.record(time.perf_counter() - start)
+            start = time.perf_counter()
+            expected = self.search_exact(query, k)
+            exact.record(time.perf_counter() - start)
+            if expected:
+                recalls.append(
+                    len({id for id, _ in found} & {id for id, _ in expected})
+                    / len(expected)
+                )
+        return {
+            "recall": sum(recalls) / len(recalls) if recalls else 0.0,
+            "p50": ann.percentile(50),
+            "p99": ann.percentile(99),
+            "exact_p50": exact.percentile(50),
+            "exact_p99": exact.percentile(99),
+        }
+
+
+def _default_context_text(based_on: Dict[str, Any]) -> str:
+    return " ".join(str(value) for value in based_on.values())
+
+
+class AnnCandidateSelector:
+    """
+    Pre-selects the `k` catalog actions closest to the context, using an `IVFIndex` over the
+    embeddings of the actions, which follows the changes of the catalog.
+
+    Only runs whose `ToSelectFrom` input holds catalog actions, and more than `k` of them, are
+    pruned. Runs over the whole catalog search the index; runs over a subset of it scan the
+    vectors of that subset only. The event then only selects from the candidates, and `event.candidate_indices` holds
+    their positions in the original `ToSelectFrom` list.
+
+    Attributes:
+        catalog (ActionCatalog): The catalog of the actions.
+        k (int): Number of candidates sent to the policy. Default is 100.
+        index (IVFIndex, optional): Index of the action embeddings. Defaults to an `IVFIndex()`.
+        encoder (Any, optional): Model with an `encode` function used to embed the actions and the
+            contexts, which embeds lists of texts too, like `SentenceTransformer.encode`. Defaults to
+            the model of the catalog's featurizer.
+        action_text (Callable[[CatalogAction], str]): Text of an action that is embedded. Default is `str`.
+        context_text (Callable[[Dict[str, Any]], str]): Text of the `BasedOn` inputs that is embedded.
+            Defaults to their values joined with spaces.
+    """
+
+    def __init__(
+        self,
+        catalog: ActionCatalog,
+        k: int = 100,
+        index: Optional[IVFIndex] = None,
+        encoder: Optional[Any] = None,
+        action_text: Callable[[CatalogAction], str] = str,
+        context_text: Callable[[Dict[str, Any]], str] = _default_context_text,
+    ):
+        self.catalog = catalog
+        self.k = k
+        self.index = index if index is not None else IVFIndex()
+        self.encoder = encoder if encoder is not None else catalog.featurizer.model
+        self.action_text = action_text
+        self.context_text = context_text
+        # runs whose candidates were fewer than `k`, which are sent to the policy unpruned
+        self.fallbacks = 0
+
+        self._add_actions(catalog.actions())
+        catalog.add_listener(self._on_catalog_change, self._add_actions)
+
+    def _add_actions(self, actions: List[CatalogAction]) -> None:
+        if actions:
+            self.index.add_many(
+                [action.id for action in actions],
+                self.encoder.encode([self.action_text(action) for action in actions]),
+            )
+
+    def _on_catalog_change(self, id: str, action: Optional[CatalogAction]) -> None:
+        if action is None:
+            self.index.remove(id)
+        else:
+            self.index.add(id, self.encoder.encode(self.action_text(action)))
+
+    def query(self, based_on: Dict[str, Any]) -> Any:
+        return self.encoder.encode(self.context_text(based_on))
+
+    def select(self, event: Any) -> None:
+        """Restricts the actions of `event` to the candidates."""
+        name, actions = next(iter(event.to_select_from.items()))
+        if len(actions) <= self.k or not isinstance(actions[0], CatalogAction):
+            return
+        positions = self.catalog.positions(actions)
+        query = self.query(event.based_on or {})
+        if len(positions) >= len(self.index):
+            found = self.index.search(query, self.k)
+        else:
+            # the nearest neighbors in the whole catalog may not be in this run's actions
+            found = self.index.search_exact(query, self.k, ids=positions)
+        indices = [positions[id] for id, _ in found if id in positions]
+        if len(indices) < self.k:
+            self.fallbacks += 1
+            logger.warning(
+                f"found {len(indices)} candidates instead of {self.k}, selecting from all {len(actions)} actions ({self.fallbacks} runs so far)"
+            )
+            return
+        event.to_select_from[name] = [actions[i] for i in indices]
+        event.candidate_indices = indices
+
+    def evaluate(self, contexts: List[Dict[str, Any]]) -> Dict[str, float]:
+        """Recall and latency of the candidates of `contexts` (the `BasedOn` values of runs)."""
+        return self.index.evaluate([self.query(c) for c in contexts], self.k)
@@ -1,7 +1,12 @@
 from __future__ import annotations
 
 import logging
+import random
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import (
     TYPE_CHECKING,
     Any,
@@ -14,10 +19,30 @@ from typing import (
     TypeVar,
     Union,
     Callable,
+    Set,
 )
 
-from learn_to_pick.metrics import MetricsTrackerAverage, MetricsTrackerRollingWindow
-from learn_to_pick.model_repository import ModelRepository
+from learn_to_pick.metrics import (
+    MemoryProfiler,
+    MetricsTrackerAverage,
+    MetricsTrackerMultiWindow,
+    MetricsTrackerRollingWindow,
+    StageLatencies,
+    time_stage,
+)
+from learn_to_pick.scoring import (
+    CompiledPrompt,
+    ScoreCache,
+    ScoringCircuitBreaker,
+    ScoringStats,
+    TokenBucket,
+)
+from learn_to_pick.model_repository import (
+    InMemoryModelBackend,
+    LocalModelBackend,
+    ModelBackend,
+    ModelRepository,
+)
 from learn_to_pick.vw_logger import VwLogger
 from learn_to_pick.features import Featurized, DenseFeatures, SparseFeatures
 
@@ -109,6 +134,92 @@ def get_to_select_from(inputs: Dict[str, Any]) -> Dict:
     }
 
 
+class _LazyInputs(dict):
+    """
+    Inputs dictionary whose values for some keys are only computed the first time they are read.
+    Iterating over it, copying it, pickling it or comparing it computes all of them.
+    """
+
+    def __init__(self, inputs: Dict[str, Any], lazy: Dict[str, Callable[[], Any]]):
+        super().__init__(inputs)
+        for key in lazy:
+            super().pop(key, None)
+        self._lazy = dict(lazy)
+        # the event outputs can be read by the scoring threads and by the caller at the same time
+        self._lock = threading.Lock()
+
+    def _resolve(self, key: str) -> Any:
+        with self._lock:
+            factory = self._lazy.pop(key, None)
+            if factory is None:
+                return super().__getitem__(key)
+            value = factory()
+            super().__setitem__(key, value)
+            return value
+
+    def _resolve_all(self) -> None:
+        for key in list(self._lazy):
+            self._resolve(key)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._lazy:
+            return self._resolve(key)
+        return super().__getitem__(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._lazy:
+            return self._resolve(key)
+        return super().get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._lazy or super().__contains__(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._lazy.pop(key, None)
+        super().__setitem__(key, value)
+
+    def __bool__(self) -> bool:
+        return bool(self._lazy) or super().__len__() > 0
+
+    def __reduce__(self) -> Any:
+        # pickled and deep-copied as a plain dictionary of the computed values, without the lock
+        self._resolve_all()
+        return (dict, (dict(super().items()),))
+
+
+def _resolving(name: str) -> Callable:
+    method = getattr(dict, name)
+
+    def resolved(self: _LazyInputs, *args: Any, **kwargs: Any) -> Any:
+        self._resolve_all()
+        return method(self, *args, **kwargs)
+
+    resolved.__name__ = name
+    return resolved
+
+
+for _name in [
+    "__iter__",
+    "__len__",
+    "__repr__",
+    "__eq__",
+    "__ne__",
+    "__reversed__",
+    "__or__",
+    "__ior__",
+    "__delitem__",
+    "keys",
+    "items",
+    "values",
+    "copy",
+    "pop",
+    "popitem",
+    "setdefault",
+    "update",
+]:
+    setattr(_LazyInputs, _name, _resolving(_name))
+
+
 # end helper functions
 
 
@@ -127,6 +238,10 @@ class Event(Generic[TSelected], ABC):
     def __init__(self, inputs: Dict[str, Any], selected: Optional[TSelected] = None):
         self.inputs = inputs
         self.selected = selected
+        # set when scoring failed and the `delayed` scoring fallback is used
+        self.awaiting_delayed_score: bool = False
+        # whether the selection scorer was to score this event, see `scoring_sample_rate`
+        self.scoring_sampled: bool = True
 
 
 TEvent = TypeVar("TEvent", bound=Event)
@@ -160,6 +275,7 @@ class VwPolicy(Policy):
         featurizer: Featurizer,
         formatter: Callable,
         vw_logger: VwLogger,
+        latencies: Optional[StageLatencies] = None,
         **kwargs: Any,
     ):
         super().__init__(**kwargs)
@@ -169,6 +285,7 @@ class VwPolicy(Policy):
         self.featurizer = featurizer
         self.formatter = formatter
         self.vw_logger = vw_logger
+        self.latencies = latencies
 
     def format(self, event):
         return self.formatter(*self.featurizer.featurize(event))
@@ -176,8 +293,11 @@ class VwPolicy(Policy):
     def predict(self, event: TEvent) -> Any:
         import vowpal_wabbit_next as vw
 
-        text_parser = vw.TextFormatParser(self.workspace)
-        return self.workspace.predict_one(_parse_lines(text_parser, self.format(event)))
+        with time_stage(self.latencies, "featurize"):
+            vw_ex = self.format(event)
+        with time_stage(self.latencies, "vw_predict"):
+            text_parser = vw.TextFormatParser(self.workspace)
+            return self.workspace.predict_one(_parse_lines(text_parser, vw_ex))
 
     def learn(self, event: TEvent) -> None:
         import vowpal_wabbit_next as vw
@@ -230,16 +350,47 @@ class SelectionScorer(Generic[TEvent], ABC):
         """
         ...
 
+    def submit(self, inputs: Dict[str, Any], picked: Any, event: TEvent) -> Future:
+        """
+        Starts scoring the selected response and returns a Future of the score.
+        Scores synchronously by default, scorers that can score several selections at once override it.
+        """
+        future: Future = Future()
+        try:
+            future.set_result(
+                self.score_response(inputs=inputs, picked=picked, event=event)
+            )
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def save(self) -> None:
+        pass
+
 
 class AutoSelectionScorer(SelectionScorer[Event]):
+    """
+    Scores the selection by asking an llm to grade it.
+
+    Attributes:
+        llm: An object with a `predict(prompt: str) -> str` function.
+        prompt (optional): The full scoring prompt. Defaults to `get_default_prompt()`.
+        scoring_criteria_template_str (str, optional): Scoring criteria appended to the default system prompt.
+        cache (ScoreCache, optional): If set, scores are cached by formatted prompt, so that identical
+            prompts do not call the llm again.
+    """
+
     def __init__(
         self,
         llm,
         prompt: Union[Any, None] = None,
         scoring_criteria_template_str: Optional[str] = None,
+        cache: Optional[ScoreCache] = None,
     ):
         self.llm = llm
+        self.cache = cache
         self.prompt = prompt
+        self._compiled_prompt: Optional[CompiledPrompt] = None
         if prompt is None and scoring_criteria_template_str is None:
             self.prompt = AutoSelectionScorer.get_default_prompt()
         elif prompt is None and scoring_criteria_template_str is not None:
@@ -274,20 +425,189 @@ class AutoSelectionScorer(SelectionScorer[Event]):
 
         return prompt.format(**relevant_inputs)
 
+    def format_prompt(self, inputs: Dict[str, Any]) -> Any:
+        """
+        Formats the scoring prompt with the inputs it references. String prompts are compiled once,
+        other prompt objects are formatted with `format_with_ignoring_extra_args`.
+        """
+        prompt = self.prompt
+        if not isinstance(prompt, str):
+            return AutoSelectionScorer.format_with_ignoring_extra_args(prompt, inputs)
+        compiled = self._compiled_prompt
+        if compiled is None or compiled.template is not prompt:
+            compiled = self._compiled_prompt = CompiledPrompt(prompt)
+        return compiled.format(inputs)
+
     def score_response(
         self, inputs: Dict[str, Any], picked: Any, event: Event
     ) -> float:
-        p = AutoSelectionScorer.format_with_ignoring_extra_args(self.prompt, inputs)
-        ranking = self.llm.predict(p)
-        ranking = ranking.strip()
+        p = self.format_prompt(inputs)
+        if self.cache is not None:
+            cached = self.cache.get(str(p))
+            if cached is not None:
+                return cached
+        resp = AutoSelectionScorer.parse_score(self.llm.predict(p))
+        if self.cache is not None:
+            self.cache.put(str(p), resp)
+        return resp
+
+    @staticmethod
+    def parse_score(ranking: Any) -> float:
+        ranking = str(getattr(ranking, "content", ranking)).strip()
         try:
-            resp = float(ranking)
-            return resp
+            return float(ranking)
         except Exception as e:
             raise RuntimeError(
                 f"The auto selection scorer did not manage to score the response, there is always the option to try again or tweak the reward prompt. Error: {e}"
             )
 
+    def save(self) -> None:
+        if self.cache is not None:
+            self.cache.save()
+
+
+class BatchedAutoSelectionScorer(AutoSelectionScorer):
+    """
+    AutoSelectionScorer that groups the prompts of concurrent selections into batched llm calls.
+
+    Prompts are queued by `submit()` (and by `score_response()`, which waits for the score), and a
+    background thread sends them to the llm when `batch_size` prompts are pending or when the oldest
+    one has waited `max_wait` seconds. Selections are batched when `run()` is called concurrently,
+    with `async_scoring`, or with `run_batch()`.
+
+    Attributes:
+        batch_size (int): Maximum number of prompts per llm call. Default is 16.
+        max_wait (float): Maximum seconds a prompt waits for its batch to fill. Default is 0.05.
+        batch_fn (Callable[[List[str]], List[str]], optional): Scores a batch of prompts. Defaults to
+            `llm.batch` if the llm has it, otherwise prompts are sent one by one with `llm.predict`.
+
+    Notes:
+        A failing batch call is retried prompt by prompt, so that one bad prompt only fails its own selection.
+    """
+
+    def __init__(
+        self,
+        llm,
+        prompt: Union[Any, None] = None,
+        scoring_criteria_template_str: Optional[str] = None,
+        cache: Optional[ScoreCache] = None,
+        batch_size: int = 16,
+        max_wait: float = 0.05,
+        batch_fn: Optional[Callable[[List[str]], List[Any]]] = None,
+    ):
+        super().__init__(
+            llm=llm,
+            prompt=prompt,
+            scoring_criteria_template_str=scoring_criteria_template_str,
+            cache=cache,
+        )
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        if batch_fn is None and hasattr(llm, "batch"):
+            batch_fn = llm.batch
+        self.batch_fn = batch_fn
+        self._queue: List[Tuple[str, Future, float]] = []
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def score_response(
+        self, inputs: Dict[str, Any], picked: Any, event: Event
+    ) -> float:
+        return self.submit(inputs=inputs, picked=picked, event=event).result()
+
+    def submit(self, inputs: Dict[str, Any], picked: Any, event: Event) -> Future:
+        future: Future = Future()
+        p = self.format_prompt(inputs)
+        if self.cache is not None:
+            cached = self.cache.get(str(p))
+            if cached is not None:
+                future.set_result(cached)
+                return future
+        with self._condition:
+            if self._worker is None or not self._worker.is_alive():
+                self._closed = False
+                self._worker = threading.Thread(
+                    target=self._flush_loop,
+                    name="learn_to_pick-batched-scorer",
+                    daemon=True,
+                )
+                self._worker.start()
+            self._queue.append((p, future, time.monotonic()))
+            self._condition.notify()
+        return future
+
+    def close(self) -> None:
+        """Scores the pending prompts and stops the background thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def _next_batch(self) -> List[Tuple[str, Future, float]]:
+        with self._condition:
+            while True:
+                if self._queue:
+                    deadline = self._queue[0][2] + self.max_wait
+                    remaining = deadline - time.monotonic()
+                    if len(self._queue) >= self.batch_size or remaining <= 0:
+                        break
+                    if self._closed:
+                        break
+                    self._condition.wait(timeout=remaining)
+                elif self._closed:
+                    return []
+                else:
+                    self._condition.wait()
+            batch = self._queue[: self.batch_size]
+            del self._queue[: self.batch_size]
+            return batch
+
+    def _flush_loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self._score_batch(batch)
+
+    def _score_batch(self, batch: List[Tuple[str, Future, float]]) -> None:
+        prompts = [p for p, _, _ in batch]
+        try:
+            if self.batch_fn is None:
+                raise NotImplementedError("the llm does not support batches")
+            rankings = list(self.batch_fn(prompts))
+            if len(rankings) != len(prompts):
+                raise RuntimeError(
+                    f"{len(rankings)} scores were returned for {len(prompts)} prompts"
+                )
+        except Exception as e:
+            if self.batch_fn is not None:
+                logger.info(f"Batched scoring failed, scoring one by one, error: {e}")
+            rankings = []
+            for p in prompts:
+                try:
+                    rankings.append(self.llm.predict(p))
+                except Exception as item_error:
+                    rankings.append(item_error)
+
+        for (p, future, _), ranking in zip(batch, rankings):
+            try:
+                if isinstance(ranking, Exception):
+                    raise ranking
+                score = AutoSelectionScorer.parse_score(ranking)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            if self.cache is not None:
+                self.cache.put(str(p), score)
+            future.set_result(score)
+
 
 class RLLoop(Generic[TEvent]):
     """
@@ -313,7 +633,25 @@ class RLLoop(Generic[TEvent]):
         - policy (Type[VwPolicy]): Policy used by the chain.
         - rl_logs (Optional[Union[str, os.PathLike]]): Path for the VW logs.
         - metrics_step (int): Step for the metrics tracker. Default is -1. If set without metrics_window_size, average metrics will be tracked, otherwise rolling window metrics will be tracked.
-        - metrics_window_size (int): Window size for the metrics tracker. Default is -1. If set, rolling window metrics will be tracked.
+        - metrics_window_size (Union[int, List[int]]): Window size for the metrics tracker. Default is -1. If set, rolling window metrics will be tracked. With a list of window sizes, every window is tracked by a `MetricsTrackerMultiWindow`, in constant memory per window.
+        - metrics_time_windows (List[float]): Time windows in seconds, tracked by a `MetricsTrackerMultiWindow`. Default is [].
+        - metrics_half_lives (List[float]): Half lives, in scores, of exponentially weighted averages tracked by a `MetricsTrackerMultiWindow`. Default is [].
+        - metrics_quantiles (List[float]): Quantiles of the scores estimated by a `MetricsTrackerMultiWindow`. Default is [].
+        - metrics_max_history (int): Maximum number of points kept in the metrics history. Default is -1 (unbounded).
+        - metrics_downsample_history (bool): When the history is full, drop every other old point instead of the oldest points. Default is False.
+        - async_scoring (bool): If set, run() returns right after the decision is made, the `selection_scorer` is called on a thread pool and the policy learns when the score arrives. Default is False.
+        - max_scoring_workers (int): Number of threads scoring concurrently when `async_scoring` is set. Default is 4.
+        - max_pending_scores (int): Maximum number of pending scores when `async_scoring` is set. Default is -1 (unbounded). When reached, run() scores synchronously.
+        - scoring_timeout (float): Seconds a `selection_scorer` call may take. Default is -1 (no timeout). Calls that time out before they started are cancelled, calls that already started keep running in the background but their score is dropped.
+        - max_inflight_scores (int): Maximum number of `selection_scorer` calls running or waiting to run at once, timed out calls included. Default is 1024, -1 means unbounded. When reached, scoring is skipped.
+        - scoring_fallback (str): What happens when scoring fails, times out or is skipped: "none" (the event is learned without a score), "default" (the event is learned with `default_score`) or "delayed" (the event is not learned until `update_with_delayed_score` is called for it, which is then allowed without force_score). Default is "none".
+        - default_score (float): Score used by the "default" `scoring_fallback`. Default is 0.
+        - circuit_breaker (ScoringCircuitBreaker, optional): Skips scoring while the `selection_scorer` keeps failing or timing out.
+        - scoring_sample_rate (float): Fraction of the decisions scored by the `selection_scorer`. Default is 1. Decisions that are not sampled are logged but neither learned nor counted in the metrics, `event.scoring_sampled` tells them apart.
+        - max_scores_per_second (float): Maximum number of decisions sampled for scoring per second, enforced by a token bucket. Default is -1 (unbounded).
+        - instrumentation (bool): If set, the latency of every stage of run() and update_with_delayed_score is recorded in `latencies` (a `StageLatencies`). Default is False.
+        - memory_profile_every (int): If set, tracemalloc is started and `memory_profiler` (a `MemoryProfiler`) samples the top allocation sites and the memory growth per run every `memory_profile_every` runs. Default is -1 (off).
+        - memory_profile_top (int): Number of allocation sites kept per memory sample. Default is 10.
 
     Notes:
         By default the class initializes the VW model using the provided arguments. If `selection_scorer` is not provided, a warning is logged, indicating that no reinforcement learning will occur unless the `update_with_delayed_score` method is called.
@@ -329,27 +667,114 @@ class RLLoop(Generic[TEvent]):
         selection_scorer: Union[SelectionScorer, None] = None,
         selection_scorer_activated: bool = True,
         metrics_step: int = -1,
-        metrics_window_size: int = -1,
+        metrics_window_size: Union[int, List[int]] = -1,
         callbacks_before_scoring: list = [],
+        metrics_max_history: int = -1,
+        metrics_downsample_history: bool = False,
+        metrics_time_windows: List[float] = [],
+        metrics_half_lives: List[float] = [],
+        metrics_quantiles: List[float] = [],
+        async_scoring: bool = False,
+        max_scoring_workers: int = 4,
+        max_pending_scores: int = -1,
+        scoring_timeout: float = -1,
+        max_inflight_scores: int = 1024,
+        scoring_fallback: str = "none",
+        default_score: float = 0.0,
+        circuit_breaker: Optional[ScoringCircuitBreaker] = None,
+        scoring_sample_rate: float = 1.0,
+        max_scores_per_second: float = -1,
+        instrumentation: bool = False,
+        memory_profile_every: int = -1,
+        memory_profile_top: int = 10,
     ):
+        if scoring_fallback not in ("none", "default", "delayed"):
+            raise ValueError(
+                f"Unknown scoring_fallback {scoring_fallback}, expected one of: none, default, delayed"
+            )
         self.selection_scorer = selection_scorer
         self.policy = policy or self._default_policy()
         self.selection_scorer_activated = selection_scorer_activated
         self.metrics_step = metrics_step
         self.metrics_window_size = metrics_window_size
         self.callbacks_before_scoring = callbacks_before_scoring
+        self.async_scoring = async_scoring
+        self.max_scoring_workers = max_scoring_workers
+        self.max_pending_scores = max_pending_scores
+        self.scoring_timeout = scoring_timeout
+        self.max_inflight_scores = max_inflight_scores
+        self.scoring_fallback = scoring_fallback
+        self.default_score = default_score
+        self.circuit_breaker = circuit_breaker
+        self.scoring_stats = ScoringStats()
+        self.scoring_sample_rate = scoring_sample_rate
+        self._scoring_budget = (
+            TokenBucket(rate=max_scores_per_second)
+            if max_scores_per_second > 0
+            else None
+        )
+        self.latencies: Optional[StageLatencies] = (
+            StageLatencies() if instrumentation else None
+        )
+        if (
+            self.latencies is not None
+            and isinstance(self.policy, VwPolicy)
+            and self.policy.latencies is None
+        ):
+            self.policy.latencies = self.latencies
+        self.memory_profiler: Optional[MemoryProfiler] = None
+        if memory_profile_every > 0:
+            self.memory_profiler = MemoryProfiler(
+                every=memory_profile_every, top=memory_profile_top
+            )
+            self.memory_profiler.start()
+
+        # the policy and the metrics are shared with the scoring threads
+        self._policy_lock = threading.RLock()
+        self._scoring_pool: Optional[ThreadPoolExecutor] = None
+        self._pending_scores: Set[Future] = set()
+        self._pending_lock = threading.Lock()
+        self._timeout_pool: Optional[ThreadPoolExecutor] = None
 
         if self.selection_scorer is None:
             logger.warning(
                 "No selection scorer provided, which means that no reinforcement learning will be done in the RL chain unless update_with_delayed_score is called."
             )
 
-        if metrics_window_size > 0:
+        if (
+            isinstance(metrics_window_size, list)
+            or metrics_time_windows
+            or metrics_half_lives
+            or metrics_quantiles
+        ):
+            self.metrics = MetricsTrackerMultiWindow(
+                step=metrics_step,
+                window_sizes=(
+                    metrics_window_size
+                    if isinstance(metrics_window_size, list)
+                    else [metrics_window_size]
+                    if metrics_window_size > 0
+                    else []
+                ),
+                time_windows=metrics_time_windows,
+                half_lives=metrics_half_lives,
+                quantiles=metrics_quantiles,
+                max_history=metrics_max_history,
+                downsample_history=metrics_downsample_history,
+            )
+        elif metrics_window_size > 0:
             self.metrics = MetricsTrackerRollingWindow(
-                step=metrics_step, window_size=metrics_window_size
+                step=metrics_step,
+                window_size=metrics_window_size,
+                max_history=metrics_max_history,
+                downsample_history=metrics_downsample_history,
             )
         else:
-            self.metrics = MetricsTrackerAverage(step=metrics_step)
+            self.metrics = MetricsTrackerAverage(
+                step=metrics_step,
+                max_history=metrics_max_history,
+                downsample_history=metrics_downsample_history,
+            )
 
     @abstractmethod
     def _default_policy(self):
@@ -362,16 +787,27 @@ class RLLoop(Generic[TEvent]):
         Updates the learned policy with the score provided.
         Will raise an error if selection_scorer is set, and force_score=True was not provided during the method call
         """
-        if self._can_use_selection_scorer() and not force_score:
+        event: TEvent = chain_response["picked_metadata"]
+        if (
+            self._can_use_selection_scorer()
+            and not force_score
+            and not event.awaiting_delayed_score
+        ):
             raise RuntimeError(
                 "The selection scorer is set, and force_score was not set to True. Please set force_score=True to use this function."
             )
-        if self.metrics:
-            self.metrics.on_feedback(score)
-        event: TEvent = chain_response["picked_metadata"]
-        self._call_after_scoring_before_learning(event=event, score=score)
-        self.policy.learn(event=event)
-        self.policy.log(event=event)
+        with time_stage(self.latencies, "delayed_score"), self._policy_lock:
+            event.awaiting_delayed_score = False
+            if self.metrics:
+                if not event.scoring_sampled:
+                    self.metrics.on_decision()
+                self.metrics.on_feedback(score)
+            event.scoring_sampled = True
+            self._call_after_scoring_before_learning(event=event, score=score)
+            with time_stage(self.latencies, "learn"):
+                self.policy.learn(event=event)
+            with time_stage(self.latencies, "log"):
+                self.policy.log(event=event)
 
     def deactivate_selection_scorer(self) -> None:
         """
@@ -390,6 +826,38 @@ class RLLoop(Generic[TEvent]):
         This function should be called to save the state of the learned policy model.
         """
         self.policy.save()
+        if self.selection_scorer is not None:
+            self.selection_scorer.save()
+
+    @property
+    def pending_scores(self) -> int:
+        """
+        Number of decisions whose score is still being computed when `async_scoring` is set.
+        """
+        return len(self._pending_scores)
+
+    def wait_for_pending_scores(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until every pending score has been computed and learned, or until `timeout` seconds have passed.
+        Returns whether all pending scores are done.
+        """
+        with self._pending_lock:
+            pending = list(self._pending_scores)
+        _, not_done = wait(pending, timeout=timeout)
+        return not not_done
+
+    def close(self) -> None:
+        """
+        Waits for pending scores, releases the scoring threads and stops memory profiling.
+        """
+        if self._scoring_pool is not None:
+            self._scoring_pool.shutdown(wait=True)
+            self._scoring_pool = None
+        if self._timeout_pool is not None:
+            self._timeout_pool.shutdown(wait=False)
+            self._timeout_pool = None
+        if self.memory_profiler is not None:
+            self.memory_profiler.stop()
 
     def _can_use_selection_scorer(self) -> bool:
         """
@@ -430,6 +898,55 @@ class RLLoop(Generic[TEvent]):
                 "Either a dictionary positional argument or keyword arguments should be provided"
             )
 
+        with time_stage(self.latencies, "run"):
+            next_inputs, picked, event = self._decide(inputs)
+            if not (
+                self.async_scoring
+                and self._can_use_selection_scorer()
+                and event.scoring_sampled
+                and self._submit_scoring(inputs=next_inputs, picked=picked, event=event)
+            ):
+                self._score_and_learn(inputs=next_inputs, picked=picked, event=event)
+
+        if self.memory_profiler is not None:
+            self.memory_profiler.on_run()
+        return {"picked": picked, "picked_metadata": event}
+
+    def run_batch(self, inputs_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Same as calling run() for every inputs dictionary, except that all the decisions are made
+        first, and then scored together, which lets scorers like `BatchedAutoSelectionScorer`
+        score them in batches.
+        """
+        decisions = [self._decide(inputs) for inputs in inputs_list]
+        if self.async_scoring:
+            for next_inputs, picked, event in decisions:
+                if not (
+                    self._can_use_selection_scorer()
+                    and event.scoring_sampled
+                    and self._submit_scoring(
+                        inputs=next_inputs, picked=picked, event=event
+                    )
+                ):
+                    self._score_and_learn(
+                        inputs=next_inputs, picked=picked, event=event
+                    )
+        else:
+            started = [
+                self._start_scoring(inputs=next_inputs, picked=picked, event=event)
+                for next_inputs, picked, event in decisions
+            ]
+            for (_, _, event), scoring in zip(decisions, started):
+                self._finish_scoring_and_learn(scoring, event=event)
+
+        if self.memory_profiler is not None:
+            self.memory_profiler.on_run(len(decisions))
+        return [
+            {"picked": picked, "picked_metadata": event}
+            for _, picked, event in decisions
+        ]
+
+    def _decide(self, inputs: Dict[str, Any]) -> Tuple[Dict[str, Any], Any, TEvent]:
         if self.selected_based_on_input_key in inputs:
             raise ValueError(
                 f"The input key {self.selected_based_on_input_key} is reserved. Please use a different key."
@@ -441,42 +958,239 @@ class RLLoop(Generic[TEvent]):
             )
 
         event: TEvent = self._call_before_predict(inputs=inputs)
-        prediction = self.policy.predict(event=event)
-        if self.metrics:
+        with time_stage(self.latencies, "predict"), self._policy_lock:
+            prediction = self.policy.predict(event=event)
+        if self._can_use_selection_scorer():
+            event.scoring_sampled = self._sample_for_scoring()
+        if self.metrics and event.scoring_sampled:
             self.metrics.on_decision()
 
-        next_inputs, picked, event = self._call_after_predict_before_scoring(
-            inputs=inputs, event=event, prediction=prediction
-        )
+        with time_stage(self.latencies, "sample"):
+            next_inputs, picked, event = self._call_after_predict_before_scoring(
+                inputs=inputs, event=event, prediction=prediction
+            )
 
-        for callback_func in self.callbacks_before_scoring:
+        with time_stage(self.latencies, "callbacks"):
+            for callback_func in self.callbacks_before_scoring:
+                try:
+                    next_inputs, event = callback_func(
+                        inputs=next_inputs, picked=picked, event=event
+                    )
+                except Exception as e:
+                    logger.info(f"Callback function {callback_func} failed, error: {e}")
+
+        event.outputs = next_inputs
+        return next_inputs, picked, event
+
+    def _sample_for_scoring(self) -> bool:
+        sampled = (
+            self.scoring_sample_rate >= 1 or random.random() < self.scoring_sample_rate
+        ) and (self._scoring_budget is None or self._scoring_budget.try_take())
+        if not sampled:
+            self.scoring_stats.increment("sampled_out")
+        return sampled
+
+    def _start_scoring(
+        self, inputs: Dict[str, Any], picked: Any, event: TEvent
+    ) -> Optional[Tuple[Future, float]]:
+        """
+        Starts scoring the decision, returns the scoring future and the time it started, or None
+        if the decision cannot be scored.
+        """
+        if not self._can_use_selection_scorer() or not event.scoring_sampled:
+            return None
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow():
+            self.scoring_stats.increment("short_circuits")
+            return None
+        if not self.scoring_stats.try_start(self.max_inflight_scores):
+            self.scoring_stats.increment("short_circuits")
+            return None
+
+        started_at = time.monotonic()
+        if self._scorer_submits_async():
+            future = self.selection_scorer.submit(
+                inputs=inputs, picked=picked, event=event
+            )
+        elif self.scoring_timeout > 0:
+            # a synchronous scorer cannot be interrupted, so it runs on a thread that is waited on
+            future = self._get_timeout_pool().submit(
+                self.selection_scorer.score_response,
+                inputs=inputs,
+                picked=picked,
+                event=event,
+            )
+        else:
+            future = Future()
             try:
-                next_inputs, event = callback_func(
-                    inputs=next_inputs, picked=picked, event=event
+                future.set_result(
+                    self.selection_scorer.score_response(
+                        inputs=inputs, picked=picked, event=event
+                    )
                 )
             except Exception as e:
-                logger.info(f"Callback function {callback_func} failed, error: {e}")
+                future.set_exception(e)
+        future.add_done_callback(self.scoring_stats.on_done)
+        return future, started_at
+
+    def _finish_scoring(
+        self, scoring: Optional[Tuple[Future, float]], event: TEvent
+    ) -> Optional[float]:
+        """
+        Waits for a score started by `_start_scoring`, within `scoring_timeout`, and applies the
+        `scoring_fallback` if there is none.
+        """
+        if scoring is None:
+            return (
+                self._fallback_score(event)
+                if self._can_use_selection_scorer()
+                else None
+            )
 
-        score = None
+        future, started_at = scoring
+        timeout = (
+            max(0.0, started_at + self.scoring_timeout - time.monotonic())
+            if self.scoring_timeout > 0
+            else None
+        )
         try:
-            if self._can_use_selection_scorer():
-                score = self.selection_scorer.score_response(
-                    inputs=next_inputs, picked=picked, event=event
-                )
+            score = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # calls still waiting for a thread never reach the scorer
+            future.cancel()
+            self.scoring_stats.increment("timeouts")
+            logger.info(
+                f"The selection scorer did not score within {self.scoring_timeout} seconds"
+            )
+            score = None
         except Exception as e:
+            self.scoring_stats.increment("failures")
             logger.info(
                 f"The selection scorer was not able to score, and the chain was not able to adjust to this response, error: {e}"
             )
+            score = None
+        else:
+            self.scoring_stats.increment("scored")
+        if self.latencies is not None:
+            self.latencies.record("scoring", time.monotonic() - started_at)
+
+        if self.circuit_breaker is not None:
+            if score is None:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+        return score if score is not None else self._fallback_score(event)
+
+    def _fallback_score(self, event: TEvent) -> Optional[float]:
+        self.scoring_stats.increment("fallbacks")
+        if self.scoring_fallback == "default":
+            return self.default_score
+        if self.scoring_fallback == "delayed":
+            event.awaiting_delayed_score = True
+        return None
+
+    def _scorer_submits_async(self) -> bool:
+        submit = getattr(type(self.selection_scorer), "submit", SelectionScorer.submit)
+        return submit is not SelectionScorer.submit
+
+    def _get_timeout_pool(self) -> ThreadPoolExecutor:
+        with self._pending_lock:
+            if self._timeout_pool is None:
+                self._timeout_pool = ThreadPoolExecutor(
+                    max_workers=self.max_scoring_workers,
+                    thread_name_prefix="learn_to_pick-scoring-timeout",
+                )
+            return self._timeout_pool
 
-        event = self._call_after_scoring_before_learning(score=score, event=event)
+    def _learn(self, event: TEvent, score: Optional[float]) -> None:
+        with self._policy_lock:
+            event = self._call_after_scoring_before_learning(score=score, event=event)
 
-        if self.metrics and event.selected.score is not None:
-            self.metrics.on_feedback(event.selected.score)
-        self.policy.learn(event=event)
-        self.policy.log(event=event)
+            if self.metrics and event.selected.score is not None:
+                self.metrics.on_feedback(event.selected.score)
+            with time_stage(self.latencies, "learn"):
+                self.policy.learn(event=event)
+            with time_stage(self.latencies, "log"):
+                self.policy.log(event=event)
 
-        event.outputs = next_inputs
-        return {"picked": picked, "picked_metadata": event}
+    def _score_and_learn(
+        self, inputs: Dict[str, Any], picked: Any, event: TEvent
+    ) -> None:
+        self._finish_scoring_and_learn(
+            self._start_scoring(inputs=inputs, picked=picked, event=event), event=event
+        )
+
+    def _finish_scoring_and_learn(
+        self, scoring: Optional[Tuple[Future, float]], event: TEvent
+    ) -> None:
+        if self._can_use_selection_scorer() and not event.scoring_sampled:
+            with time_stage(self.latencies, "log"), self._policy_lock:
+                self.policy.log(event=event)
+            return
+        score = self._finish_scoring(scoring, event=event)
+        if event.awaiting_delayed_score:
+            # learned when update_with_delayed_score is called
+            return
+        self._learn(event=event, score=score)
+
+    def _submit_scoring(
+        self, inputs: Dict[str, Any], picked: Any, event: TEvent
+    ) -> bool:
+        with self._pending_lock:
+            if (
+                self.max_pending_scores > 0
+                and len(self._pending_scores) >= self.max_pending_scores
+            ):
+                return False
+            if self._scoring_pool is None:
+                self._scoring_pool = ThreadPoolExecutor(
+                    max_workers=self.max_scoring_workers,
+                    thread_name_prefix="learn_to_pick-scoring",
+                )
+            future = self._scoring_pool.submit(
+                self._score_and_learn, inputs=inputs, picked=picked, event=event
+            )
+            self._pending_scores.add(future)
+        future.add_done_callback(self._on_scoring_done)
+        return True
+
+    def _on_scoring_done(self, future: Future) -> None:
+        with self._pending_lock:
+            self._pending_scores.discard(future)
+        if future.exception() is not None:
+            logger.info(
+                f"The policy was not able to learn from the score, error: {future.exception()}"
+            )
+
+
+class LazyEncoder:
+    """
+    Encoder created by `factory` on the first call to `encode`, so that heavy models (and their
+    dependencies, e.g. torch) are only loaded by processes that actually embed something.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self._model: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.monotonic()
+                    self._model = self.factory()
+                    logger.info(
+                        f"loaded encoder in {time.monotonic() - start:.2f} seconds"
+                    )
+        return self._model
+
+    def encode(self, *args: Any, **kwargs: Any) -> Any:
+        return self.model.encode(*args, **kwargs)
 
 
 def _embed_string_type(
@@ -0,0 +1,178 @@
+"""
+Catalog of actions registered once by ID, with their features, embeddings and VW rendering computed at
+registration rather than on every run():
+
+    catalog = ActionCatalog(picker.policy.featurizer, name="article")
+    catalog.add_many({"a1": "politics article", "a2": "sports article", ...})
+    picker.run(user=BasedOn("Tom"), article=catalog.to_select_from(["a1", "a2"]))
+    catalog.update("a2", "new sports article")
+    catalog.remove("a1")
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from learn_to_pick import base
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogAction:
+    """
+    An action of an `ActionCatalog`. The picked action of a run() is the `CatalogAction` itself.
+
+    Attributes:
+        id (str): ID of the action in the catalog.
+        value (Any): The action, as it would be passed to `ToSelectFrom`.
+        featurized (Featurized): Features of the action, with their VW rendering cached.
+        embeddings (Featurized, optional): Embeddings of the action's text, when the featurizer has `auto_embed`.
+    """
+
+    __slots__ = ("id", "value", "featurized", "embeddings")
+
+    def __init__(
+        self,
+        id: str,
+        value: Any,
+        featurized: base.Featurized,
+        embeddings: Optional[base.Featurized] = None,
+    ):
+        self.id = id
+        self.value = value
+        self.featurized = featurized
+        self.embeddings = embeddings
+
+    def __str__(self) -> str:
+        return str(self.value)
+
+    def __repr__(self) -> str:
+        return f"CatalogAction({self.id!r}, {self.value!r})"
+
+
+class ActionCatalog:
+    """
+    Actions registered once with an ID, and referenced by ID in `ToSelectFrom`.
+
+    Actions are immutable: updating an action replaces it, so that decisions being made or scored
+    keep the version they were made with.
+
+    Attributes:
+        featurizer (PickBestFeaturizer): The featurizer of the picker the catalog is used with.
+        name (str): Name of the `ToSelectFrom` input, used as the namespace of plain string actions,
+            as it is when the actions are passed directly. Default is "action".
+    """
+
+    def __init__(self, featurizer: Any, name: str = "action"):
+        self.featurizer = featurizer
+        self.name = name
+        self._actions: Dict[str, CatalogAction] = {}
+        # called with (id, action) when an action is added or updated, and (id, None) when it is removed
+        self.listeners: List[Callable[[str, Optional[CatalogAction]], None]] = []
+        # listener -> function called instead of it with all the actions added or updated by add_many()
+        self.batch_listeners: Dict[Callable, Callable[[List[CatalogAction]], None]] = {}
+        # list of all the actions and their positions by ID, built on demand and reset by every change
+        self._all: Optional[Tuple[List[CatalogAction], Dict[str, int]]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    def __contains__(self, id: object) -> bool:
+        return id in self._actions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._actions))
+
+    def __getitem__(self, id: str) -> CatalogAction:
+        return self._actions[id]
+
+    def get(self, id: str) -> Optional[CatalogAction]:
+        return self._actions.get(id)
+
+    def add_listener(
+        self,
+        listener: Callable[[str, Optional[CatalogAction]], None],
+        batch_listener: Optional[Callable[[List[CatalogAction]], None]] = None,
+    ) -> None:
+        """
+        Calls `listener` on every change of the catalog. If `batch_listener` is given, it is called
+        once with the actions of an `add_many()` instead of calling `listener` for each of them.
+        """
+        self.listeners.append(listener)
+        if batch_listener is not None:
+            self.batch_listeners[listener] = batch_listener
+
+    def _changed(self, id: str, action: Optional[CatalogAction]) -> None:
+        self._all = None
+        for listener in self.listeners:
+            listener(id, action)
+
+    def _featurize(self, id: str, value: Any) -> CatalogAction:
+        featurized, embeddings = self.featurizer.featurize_action(value, self.name)
+        return CatalogAction(id, value, featurized, embeddings)
+
+    def add(self, id: str, value: Any) -> CatalogAction:
+        if id in self._actions:
+            raise ValueError(f"Action {id} is already in the catalog, use update()")
+        return self.update(id, value)
+
+    def update(self, id: str, value: Any) -> CatalogAction:
+        """Adds the action, or replaces it if the ID is already in the catalog."""
+        action = self._featurize(id, value)
+        with self._lock:
+            self._actions[id] = action
+            self._changed(id, action)
+        return action
+
+    def add_many(self, actions: Dict[str, Any]) -> None:
+        featurized = [self._featurize(id, value) for id, value in actions.items()]
+        with self._lock:
+            for action in featurized:
+                self._actions[action.id] = action
+            self._all = None
+            for listener in self.listeners:
+                batch_listener = self.batch_listeners.get(listener)
+                if batch_listener is not None:
+                    batch_listener(featurized)
+                else:
+                    for action in featurized:
+                        listener(action.id, action)
+        logger.info(f"added {len(featurized)} actions to the catalog")
+
+    def remove(self, id: str) -> None:
+        with self._lock:
+            del self._actions[id]
+            self._changed(id, None)
+
+    def actions(self, ids: Optional[Iterable[str]] = None) -> List[CatalogAction]:
+        """
+        The actions with the given IDs, in order, or all the actions. The list of all the actions
+        is shared by the calls made between two changes of the catalog, and must not be modified.
+        """
+        actions = self._actions
+        if ids is None:
+            return self._all_actions()
+        try:
+            return [actions[id] for id in ids]
+        except KeyError as e:
+            raise KeyError(f"Action {e.args[0]} is not in the catalog") from None
+
+    def _all_actions(self) -> List[CatalogAction]:
+        all = self._all
+        if all is None:
+            with self._lock:
+                actions = list(self._actions.values())
+                all = (actions, {action.id: i for i, action in enumerate(actions)})
+                self._all = all
+        return all[0]
+
+    def positions(self, actions: List[CatalogAction]) -> Dict[str, int]:
+        """Position of every action in `actions`, by ID."""
+        all = self._all
+        if all is not None and actions is all[0]:
+            return all[1]
+        return {action.id: i for i, action in enumerate(actions)}
+
+    def to_select_from(self, ids: Optional[Iterable[str]] = None) -> Any:
+        """`ToSelectFrom` input of the actions with the given IDs, or of all the actions."""
+        return base.ToSelectFrom(self.actions(ids))
@@ -0,0 +1,197 @@
+"""
+Encoders that can be used as the `model` of `PickBestFeaturizer` instead of a SentenceTransformer,
+for `Embed` inputs and `auto_embed`:
+
+    encoder = HashingEncoder(n_features=256).fit(corpus)
+    picker = PickBest.create(featurizer=PickBestFeaturizer(auto_embed=True, model=encoder), ...)
+"""
+import logging
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# words are split on underscores too, since `auto_embed` renders spaces as underscores
+_WORD = re.compile(r"[^\W_]+")
+
+
+class HashingEncoder:
+    """
+    Encodes texts into fixed size float32 vectors by hashing their word or character n-grams, with
+    no model to download or load. Similar texts share n-grams, so their vectors have a high cosine
+    similarity, but the encodings carry no meaning beyond the text itself.
+
+    Without `fit()` every n-gram has weight 1; after it, n-grams are weighted by their inverse
+    document frequency in the corpus, so that n-grams common to most texts weigh less.
+
+    Attributes:
+        n_features (int): Size of the vectors. Default is 256.
+        analyzer (str): "word" for word n-grams, "char" for character n-grams of the whole text,
+            or "char_wb" for character n-grams within words. Default is "char_wb".
+        ngram_range (Tuple[int, int]): Smallest and largest n of the n-grams. Default is (3, 5).
+        lowercase (bool): If set, texts are lowercased before hashing. Default is True.
+        norm (bool): If set, the vectors are scaled to unit length, so that dot products are cosine
+            similarities. Default is True.
+        seed (int): Seed of the hash function. Default is 0.
+        cache_size (int): Maximum number of words whose n-gram hashes are cached with "char_wb", since
+            the same words come up again and again. The cache is emptied when full, and 0 disables it.
+            Default is 100000.
+    """
+
+    def __init__(
+        self,
+        n_features: int = 256,
+        analyzer: str = "char_wb",
+        ngram_range: Tuple[int, int] = (3, 5),
+        lowercase: bool = True,
+        norm: bool = True,
+        seed: int = 0,
+        cache_size: int = 100_000,
+    ):
+        if analyzer not in ("word", "char", "char_wb"):
+            raise ValueError(f"Unsupported analyzer {analyzer}")
+        if n_features <= 0 or not 0 < ngram_range[0] <= ngram_range[1]:
+            raise ValueError("n_features and ngram_range must be positive")
+        self.n_features = n_features
+        self.analyzer = analyzer
+        self.ngram_range = ngram_range
+        self.lowercase = lowercase
+        self.norm = norm
+        self.seed = seed
+        self.cache_size = cache_size
+        # inverse document frequency of every bucket, set by fit()
+        self.idf: Optional[Any] = None
+        # word -> hashes of its n-grams, for "char_wb"
+        self._cache: Dict[str, List[int]] = {}
+
+    def _char_hashes(self, text: str) -> List[int]:
+        # texts shorter than the smallest n are kept whole
+        low, high = self.ngram_range
+        crc32, seed = zlib.crc32, self.seed
+        # the n-grams of ASCII texts are sliced from their bytes, instead of encoding every n-gram
+        data = text.encode("utf-8") if text.isascii() else None
+        return [
+            crc32(
+                data[i : i + n]
+                if data is not None
+                else text[i : i + n].encode("utf-8"),
+                seed,
+            )
+            for n in range(low, high + 1)
+            for i in range(max(len(text) - n + 1, 1 if n == low else 0))
+        ]
+
+    def _hashes(self, text: str) -> List[int]:
+        """crc32 hashes of the n-grams of `text`."""
+        if self.lowercase:
+            text = text.lower()
+        words = _WORD.findall(text)
+        if self.analyzer == "word":
+            low, high = self.ngram_range
+            crc32, seed = zlib.crc32, self.seed
+            return [
+                crc32(" ".join(words[i : i + n]).encode("utf-8"), seed)
+                for n in range(low, high + 1)
+                for i in range(len(words) - n + 1)
+            ]
+        if self.analyzer == "char":
+            return self._char_hashes(" ".join(words)) if words else []
+        # words repeat across texts, so the hashes of their n-grams are cached
+        cache = self._cache
+        hashes: List[int] = []
+        for word in words:
+            word_hashes = cache.get(word)
+            if word_hashes is None:
+                word_hashes = self._char_hashes(f" {word} ")
+                if self.cache_size > 0:
+                    if len(cache) >= self.cache_size:
+                        cache.clear()
+                    cache[word] = word_hashes
+            hashes.extend(word_hashes)
+        return hashes
+
+    def _buckets(self, hashes: List[int]) -> Tuple[Any, Any]:
+        """Buckets of the hashes, and their signs, which keep collisions from adding up."""
+        import numpy as np
+
+        hashes = np.asarray(hashes, dtype=np.int64)
+        return hashes % self.n_features, 1.0 - 2.0 * (hashes >> 31)
+
+    def fit(self, corpus: Iterable[str]) -> "HashingEncoder":
+        """Weights the n-grams by their inverse document frequency in `corpus`, smoothed as if one more text had them all."""
+        import numpy as np
+
+        df = np.zeros(self.n_features, dtype=np.float64)
+        n_texts = 0
+        for text in corpus:
+            buckets, _ = self._buckets(self._hashes(text))
+            df[np.unique(buckets)] += 1
+            n_texts += 1
+        self.idf = (np.log((1 + n_texts) / (1 + df)) + 1).astype(np.float32)
+        logger.info(f"fitted hashing encoder on {n_texts} texts")
+        return self
+
+    def encode(self, to_encode: Union[str, List[str]], **kwargs: Any) -> Any:
+        """
+        The vector of a text, or the matrix of the vectors of a list of texts, one per row. Other keyword
+        arguments of `SentenceTransformer.encode` are accepted and ignored.
+        """
+        import numpy as np
+
+        texts = [to_encode] if isinstance(to_encode, str) else list(to_encode)
+        hashes: List[int] = []
+        counts = []
+        for text in texts:
+            text_hashes = self._hashes(text)
+            hashes.extend(text_hashes)
+            counts.append(len(text_hashes))
+        # the buckets and signs of the whole list are computed at once
+        buckets, signs = self._buckets(hashes)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), counts)
+        vectors = (
+            np.bincount(
+                rows * self.n_features + buckets,
+                weights=signs,
+                minlength=len(texts) * self.n_features,
+            )
+            .astype(np.float64)
+            .reshape(len(texts), self.n_features)
+        )
+        if self.idf is not None:
+            vectors *= self.idf
+        if self.norm:
+            lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(lengths > 0, lengths, 1)
+        vectors = vectors.astype(np.float32)
+        return vectors[0] if isinstance(to_encode, str) else vectors
+
+    def get_state(self) -> Dict[str, Any]:
+        """Settings and weights of the encoder, to create the same encoder with `from_state()`."""
+        return {
+            "n_features": self.n_features,
+            "analyzer": self.analyzer,
+            "ngram_range": list(self.ngram_range),
+            "lowercase": self.lowercase,
+            "norm": self.norm,
+            "seed": self.seed,
+            "cache_size": self.cache_size,
+            "idf": None if self.idf is None else [float(w) for w in self.idf],
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "HashingEncoder":
+        encoder = cls(
+            n_features=state["n_features"],
+            analyzer=state["analyzer"],
+            ngram_range=tuple(state["ngram_range"]),
+            lowercase=state["lowercase"],
+            norm=state["norm"],
+            seed=state["seed"],
+            cache_size=state.get("cache_size", 100_000),
+        )
+        if state.get("idf") is not None:
+            import numpy as np
+
+            encoder.idf = np.asarray(state["idf"], dtype=np.float32)
+        return encoder
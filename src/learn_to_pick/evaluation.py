@@ -0,0 +1,237 @@
+import logging
+import os
+from statistics import NormalDist
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from learn_to_pick import base
+from learn_to_pick.vw_logger import parse_cb_label, read_vw_log_chunks
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    import vowpal_wabbit_next as vw
+
+logger = logging.getLogger(__name__)
+
+LogPaths = Union[str, os.PathLike, Iterable[Union[str, os.PathLike]]]
+
+
+class Estimate(NamedTuple):
+    value: float
+    lower: float
+    upper: float
+
+
+class OffPolicyEvaluation(NamedTuple):
+    """
+    Estimates of the average score a candidate policy would have gotten on logged events.
+
+    Attributes:
+        count (int): Number of scored events the estimates are based on.
+        logged (Estimate): Average score of the logging (production) policy.
+        ips (Estimate): Inverse propensity score estimate.
+        snips (Estimate): Self normalized inverse propensity score estimate.
+        dr (Estimate): Doubly robust estimate, None if no reward estimates were available.
+    """
+
+    count: int
+    logged: Estimate
+    ips: Estimate
+    snips: Estimate
+    dr: Optional[Estimate]
+
+    def to_pandas(self) -> "pd.DataFrame":
+        import pandas as pd
+
+        rows = {
+            name: estimate._asdict()
+            for name, estimate in self._asdict().items()
+            if isinstance(estimate, Estimate)
+        }
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def _mean_estimate(values: "np.ndarray", z: float) -> Estimate:
+    import numpy as np
+
+    mean = float(np.mean(values))
+    half = (
+        z * float(np.std(values, ddof=1)) / np.sqrt(len(values))
+        if len(values) > 1
+        else 0
+    )
+    return Estimate(mean, mean - half, mean + half)
+
+
+def estimate(
+    logged_probability: "np.ndarray",
+    score: "np.ndarray",
+    target_probability: "np.ndarray",
+    score_hat_logged: Optional["np.ndarray"] = None,
+    score_hat_target: Optional["np.ndarray"] = None,
+    confidence: float = 0.95,
+) -> OffPolicyEvaluation:
+    """
+    Computes off-policy estimates from per-event arrays, with normal approximation confidence intervals.
+
+    Attributes:
+        logged_probability: Probability the logging policy gave to the logged action.
+        score: Observed score of the logged action.
+        target_probability: Probability the candidate policy gives to the logged action.
+        score_hat_logged (optional): Estimated score of the logged action, needed for the doubly robust estimate.
+        score_hat_target (optional): Estimated score of the candidate policy, i.e. the estimated scores
+            of all actions weighted by the candidate's probabilities.
+        confidence (float): Confidence level of the intervals. Default is 0.95.
+    """
+    import numpy as np
+
+    p = np.asarray(logged_probability, dtype=np.float64)
+    r = np.asarray(score, dtype=np.float64)
+    w = np.asarray(target_probability, dtype=np.float64) / p
+    n = len(r)
+    if n == 0:
+        raise ValueError("At least one scored event is needed for an estimate")
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    ips = _mean_estimate(w * r, z)
+
+    w_sum = float(np.sum(w))
+    snips_value = float(np.dot(w, r)) / w_sum if w_sum > 0 else 0.0
+    snips_half = (
+        z * float(np.sqrt(np.sum((w * (r - snips_value)) ** 2))) / w_sum
+        if w_sum > 0
+        else 0.0
+    )
+    snips = Estimate(snips_value, snips_value - snips_half, snips_value + snips_half)
+
+    dr = None
+    if score_hat_logged is not None and score_hat_target is not None:
+        dm = np.asarray(score_hat_target, dtype=np.float64)
+        q = np.asarray(score_hat_logged, dtype=np.float64)
+        dr = _mean_estimate(dm + w * (r - q), z)
+
+    return OffPolicyEvaluation(
+        count=n, logged=_mean_estimate(r, z), ips=ips, snips=snips, dr=dr
+    )
+
+
+def evaluate(
+    logs: LogPaths,
+    policy: base.VwPolicy,
+    learn: bool = True,
+    reward_model_cmd: Optional[List[str]] = None,
+    chunk_size: int = 10000,
+    confidence: float = 0.95,
+) -> OffPolicyEvaluation:
+    """
+    Evaluates a candidate policy on `VwLogger` logs, without deploying it.
+
+    For every scored event of the logs, the candidate policy predicts a distribution over the
+    logged actions, which is compared with the logged action, score and probability. Logs hold the
+    featurized examples, so the candidate has to use the same featurization as the logging policy;
+    a different `vw_cmd` can be evaluated as is.
+
+    Attributes:
+        logs: A log path (rotated segments are picked up) or an explicit list of log files.
+        policy (VwPolicy): Candidate policy, typically built by `PickBest.create_policy`.
+        learn (bool): Learn every event after predicting it (progressive validation), which is how the
+            candidate would behave online. If False, the candidate is evaluated as is. Default is True.
+        reward_model_cmd (List[str], optional): VW arguments of the score regressor used by the
+            doubly robust estimate, it is trained progressively on the same logs.
+            Default is `["--cb_adf", "--quiet"]`.
+        chunk_size (int): Number of events streamed at once.
+        confidence (float): Confidence level of the intervals. Default is 0.95.
+    """
+    columns = score_examples(
+        (
+            [
+                (ex, label)
+                for ex, label in zip(chunk, map(parse_cb_label, chunk))
+                if label
+            ]
+            for chunk in read_vw_log_chunks(logs, chunk_size)
+        ),
+        policy.workspace,
+        learn=learn,
+        reward_model_cmd=reward_model_cmd,
+    )
+    if len(columns["score"]) == 0:
+        raise ValueError("No scored events found in the logs")
+    return estimate(
+        logged_probability=columns["logged_probability"],
+        score=columns["score"],
+        target_probability=columns["target_probability"],
+        score_hat_logged=columns["score_hat_logged"],
+        score_hat_target=columns["score_hat_target"],
+        confidence=confidence,
+    )
+
+
+def score_examples(
+    chunks: Iterable[List[Tuple[str, Tuple[int, float, float]]]],
+    workspace: "vw.Workspace",
+    learn: bool = True,
+    reward_model_cmd: Optional[List[str]] = None,
+) -> Dict[str, "np.ndarray"]:
+    """
+    Runs the workspace on chunks of `(example, label)` pairs and returns the per-event arrays
+    `estimate` needs, plus `greedy`: whether the logged action is the workspace's most likely action.
+    """
+    import numpy as np
+    import vowpal_wabbit_next as vw
+
+    reward_model = vw.Workspace(reward_model_cmd or ["--cb_adf", "--quiet"])
+    parser = vw.TextFormatParser(workspace)
+    reward_parser = vw.TextFormatParser(reward_model)
+
+    names = [
+        "logged_probability",
+        "score",
+        "target_probability",
+        "score_hat_logged",
+        "score_hat_target",
+        "greedy",
+    ]
+    columns: List[List["np.ndarray"]] = [[] for _ in names]
+    for chunk in chunks:
+        values = []
+        for vw_ex, (index, cost, probability) in chunk:
+            multi_ex = base._parse_lines(parser, vw_ex)
+            prediction = (
+                workspace.predict_then_learn_one(multi_ex)
+                if learn
+                else workspace.predict_one(multi_ex)
+            )
+            pmf = dict(prediction)
+            costs = dict(
+                reward_model.predict_then_learn_one(
+                    base._parse_lines(reward_parser, vw_ex)
+                )
+            )
+            values.append(
+                (
+                    probability,
+                    -cost,
+                    pmf.get(index, 0.0),
+                    -costs.get(index, 0.0),
+                    -sum(prob * costs.get(a, 0.0) for a, prob in pmf.items()),
+                    max(prediction, key=lambda ap: ap[1])[0] == index,
+                )
+            )
+        if values:
+            for column, array in zip(columns, np.array(values, dtype=np.float64).T):
+                column.append(array)
+
+    return {
+        name: np.concatenate(column) if column else np.zeros(0)
+        for name, column in zip(names, columns)
+    }
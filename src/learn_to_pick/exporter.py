@@ -0,0 +1,311 @@
+"""
+Exposes the metrics of an `RLLoop` in the Prometheus text exposition format.
+
+Metrics are collected when they are scraped or written, so the exporter adds nothing to the run() path.
+
+    exporter = MetricsExporter(picker, port=9464)  # serves http://127.0.0.1:9464/metrics
+    exporter = MetricsExporter(picker, path="metrics.prom", interval=15)  # e.g. for the node exporter textfile collector
+"""
+import logging
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from learn_to_pick import base
+from learn_to_pick.metrics import MetricsTrackerMultiWindow, StageLatencies
+from learn_to_pick.policy_manager import PolicyCacheMetrics
+from learn_to_pick.scoring import ScoreCache, ScoringStats
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_QUANTILES = [(0.5, 50), (0.9, 90), (0.99, 99)]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    """A sample value as the text format spells it, which differs from `repr` for infinities and NaN."""
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class _Metrics:
+    """Collects the samples of one exposition, grouped by metric name."""
+
+    def __init__(self, prefix: str, labels: Dict[str, str]):
+        self.prefix = prefix
+        self.labels = labels
+        # name -> (type, help, [(suffix, labels, value)])
+        self.families: Dict[str, Tuple[str, str, List[Tuple[str, str, float]]]] = {}
+
+    def add(
+        self,
+        name: str,
+        kind: str,
+        help: str,
+        value: float,
+        suffix: str = "",
+        **labels: str,
+    ) -> None:
+        name = f"{self.prefix}_{name}"
+        all_labels = {**self.labels, **labels}
+        rendered = ",".join(f'{k}="{_escape(str(v))}"' for k, v in all_labels.items())
+        family = self.families.setdefault(name, (kind, help, []))
+        family[2].append((suffix, f"{{{rendered}}}" if rendered else "", value))
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help, samples) in self.families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{labels} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _add_latencies(metrics: _Metrics, latencies: StageLatencies) -> None:
+    for stage, histogram in list(latencies.histograms.items()):
+        for quantile, percentile in _QUANTILES:
+            metrics.add(
+                "stage_latency_seconds",
+                "summary",
+                "Latency of the stages of run().",
+                histogram.percentile(percentile),
+                stage=stage,
+                quantile=str(quantile),
+            )
+        metrics.add(
+            "stage_latency_seconds",
+            "summary",
+            "Latency of the stages of run().",
+            histogram.total_ns / 1e9,
+            suffix="_sum",
+            stage=stage,
+        )
+        metrics.add(
+            "stage_latency_seconds",
+            "summary",
+            "Latency of the stages of run().",
+            histogram.count,
+            suffix="_count",
+            stage=stage,
+        )
+        metrics.add(
+            "stage_latency_max_seconds",
+            "gauge",
+            "Maximum latency of the stages of run().",
+            histogram.max,
+            stage=stage,
+        )
+
+
+def _add_scoring_stats(metrics: _Metrics, stats: ScoringStats) -> None:
+    for outcome in [
+        "scored",
+        "failures",
+        "timeouts",
+        "short_circuits",
+        "fallbacks",
+        "sampled_out",
+    ]:
+        metrics.add(
+            "scoring_total",
+            "counter",
+            "Selection scorer calls by outcome.",
+            getattr(stats, outcome),
+            outcome=outcome,
+        )
+    metrics.add(
+        "scoring_in_flight",
+        "gauge",
+        "Selection scorer calls in flight.",
+        stats.in_flight,
+    )
+
+
+def _add_cache(
+    metrics: _Metrics, cache: Union[ScoreCache, PolicyCacheMetrics], name: str
+) -> None:
+    metrics.add("cache_hits_total", "counter", "Cache hits.", cache.hits, cache=name)
+    metrics.add(
+        "cache_misses_total", "counter", "Cache misses.", cache.misses, cache=name
+    )
+    metrics.add(
+        "cache_hit_rate", "gauge", "Cache hit rate.", cache.hit_rate, cache=name
+    )
+
+
+def collect(
+    loop: base.RLLoop, prefix: str = "learn_to_pick", labels: Dict[str, str] = {}
+) -> str:
+    """Returns the metrics of `loop` in the Prometheus text exposition format."""
+    metrics = _Metrics(prefix, labels)
+    tracker = loop.metrics
+    if tracker is not None:
+        metrics.add(
+            "decisions_total",
+            "counter",
+            "Decisions made.",
+            tracker.decision_count,
+        )
+        metrics.add(
+            "feedback_total",
+            "counter",
+            "Scores received.",
+            tracker.feedback_count,
+        )
+        metrics.add(
+            "score",
+            "gauge",
+            "Average score, over the rolling window if there is one.",
+            tracker.score,
+        )
+    if isinstance(tracker, MetricsTrackerMultiWindow):
+        for horizon, value in tracker.stats().items():
+            metrics.add(
+                "score_horizon",
+                "gauge",
+                "Score statistics over several horizons.",
+                value,
+                horizon=horizon,
+            )
+
+    _add_scoring_stats(metrics, loop.scoring_stats)
+    if loop.latencies is not None:
+        _add_latencies(metrics, loop.latencies)
+
+    scorer_cache = getattr(loop.selection_scorer, "cache", None)
+    if isinstance(scorer_cache, ScoreCache):
+        _add_cache(metrics, scorer_cache, "score")
+    policy_cache = getattr(loop.policy, "metrics", None)
+    if isinstance(policy_cache, PolicyCacheMetrics):
+        _add_cache(metrics, policy_cache, "policy")
+
+    metrics.add(
+        "queue_depth",
+        "gauge",
+        "Items waiting in the loop queues.",
+        loop.pending_scores,
+        queue="pending_scores",
+    )
+    if isinstance(loop.selection_scorer, base.BatchedAutoSelectionScorer):
+        metrics.add(
+            "queue_depth",
+            "gauge",
+            "Items waiting in the loop queues.",
+            loop.selection_scorer.queue_depth,
+            queue="scoring_batch",
+        )
+    return metrics.render()
+
+
+class MetricsExporter:
+    """
+    Publishes the metrics of an `RLLoop` on a local HTTP port, or to a file, or both.
+
+    Attributes:
+        loop (RLLoop): The loop whose metrics are exported, e.g. a `PickBest` picker.
+        port (int, optional): If set, the metrics are served on http://<host>:<port>/metrics. 0 picks a free port.
+        host (str): Interface the server listens on. Default is "127.0.0.1".
+        path (str, optional): If set, the metrics are written to this file every `interval` seconds.
+        interval (float): Seconds between two writes of `path`. Default is 15.
+        prefix (str): Prefix of the metric names. Default is "learn_to_pick".
+        labels (Dict[str, str]): Labels added to every sample, e.g. {"picker": "recommendations"}.
+    """
+
+    def __init__(
+        self,
+        loop: base.RLLoop,
+        port: Optional[int] = None,
+        host: str = "127.0.0.1",
+        path: Optional[Union[str, os.PathLike]] = None,
+        interval: float = 15.0,
+        prefix: str = "learn_to_pick",
+        labels: Dict[str, str] = {},
+    ):
+        self.loop = loop
+        self.path = Path(path) if path else None
+        self.interval = interval
+        self.prefix = prefix
+        self.labels = labels
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+        if port is not None:
+            self._server = ThreadingHTTPServer((host, port), self._handler())
+            self._server.daemon_threads = True
+            self._start(self._server.serve_forever, "learn_to_pick-exporter-http")
+        if self.path is not None:
+            self._start(self._write_periodically, "learn_to_pick-exporter-file")
+
+    @property
+    def server_address(self) -> Optional[Tuple[str, int]]:
+        return self._server.server_address if self._server is not None else None
+
+    def render(self) -> str:
+        return collect(self.loop, prefix=self.prefix, labels=self.labels)
+
+    def write(self) -> None:
+        """Writes the metrics to `path`, atomically so that readers never see a partial file."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.path)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.path is not None:
+            self.write()
+
+    def _start(self, target: Any, name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _write_periodically(self) -> None:
+        while True:
+            try:
+                self.write()
+            except Exception as e:
+                logger.warning(f"Failed to write metrics to {self.path}, error: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def _handler(self) -> type:
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(format % args)
+
+        return Handler
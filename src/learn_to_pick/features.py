@@ -1,5 +1,11 @@
-from typing import Union, Optional, Dict, List
-import numpy as np
+import sys
+from typing import Union, Optional, Dict, List, Tuple
+
+
+def _is_ndarray(value) -> bool:
+    # numpy is only imported when it is first needed, and no value can be an array before that
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(value, np.ndarray)
 
 
 class SparseFeatures(dict):
@@ -9,6 +15,8 @@ class SparseFeatures(dict):
 
 class DenseFeatures(list):
     def __init__(self, *args, **kwargs):
+        import numpy as np
+
         super().__init__(np.array(*args, **kwargs))
 
 
@@ -20,12 +28,17 @@ class Featurized:
     ):
         self.sparse = sparse or {}
         self.dense = dense or {}
+        # (kind, namespace) -> rendered namespace, filled when `cache_rendering` is set
+        self.rendered: Dict[Tuple[str, str], str] = {}
+        self.cache_rendering = False
 
     def __setitem__(self, key, value):
         if isinstance(value, Dict):
             self.sparse[key] = SparseFeatures(value)
-        elif isinstance(value, List) or isinstance(value, np.ndarray):
+            self.rendered.pop(("sparse", key), None)
+        elif isinstance(value, List) or _is_ndarray(value):
             self.dense[key] = DenseFeatures(value)
+            self.rendered.pop(("dense", key), None)
         else:
             raise ValueError(
                 f"Cannot convert {type(value)} to either DenseFeatures or SparseFeatures"
@@ -34,3 +47,14 @@ class Featurized:
     def merge(self, other):
         self.sparse.update(other.sparse)
         self.dense.update(other.dense)
+        for key in other.sparse:
+            self.rendered.pop(("sparse", key), None)
+        for key in other.dense:
+            self.rendered.pop(("dense", key), None)
+        self.rendered.update(other.rendered)
+
+    def copy(self) -> "Featurized":
+        """A copy that can be extended without changing this one, and reuses its rendered namespaces."""
+        result = Featurized(sparse=dict(self.sparse), dense=dict(self.dense))
+        result.rendered = dict(self.rendered)
+        return result
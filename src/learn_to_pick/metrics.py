@@ -1,13 +1,182 @@
-from collections import deque
-from typing import TYPE_CHECKING, Dict, List, Union
+import contextlib
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import abc, deque
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Union,
+)
 
 if TYPE_CHECKING:
+    import numpy as np
     import pandas as pd
 
+logger = logging.getLogger(__name__)
+
+
+class MetricsHistory:
+    """
+    (step, score) points, or (step, *values) points with several `columns`, stored in growable NumPy arrays.
+
+    With `max_length`, the history never holds more than `max_length` points: once full, either the
+    oldest quarter of the points is dropped, or, with `downsample`, every other point of the oldest
+    half is dropped, so that old points are kept at a coarser resolution.
+
+    Arrays are only ever written past the points already stored, and replaced when they grow or are
+    compacted, so the views returned by `steps`, `scores` and `to_pandas()` never change.
+    """
+
+    def __init__(
+        self,
+        max_length: int = -1,
+        downsample: bool = False,
+        columns: Sequence[str] = ("score",),
+    ):
+        import numpy as np
+
+        if 0 < max_length < 4:
+            raise ValueError("max_length must be at least 4")
+        self.max_length = max_length
+        self.downsample = downsample
+        self.columns = list(columns)
+        capacity = min(64, max_length) if max_length > 0 else 64
+        self._steps = np.zeros(capacity, dtype=np.int64)
+        # column-major, so that every column is a contiguous array
+        self._values = np.zeros((capacity, len(self.columns)), order="F")
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def steps(self) -> "np.ndarray":
+        return self._steps[: self._length]
+
+    @property
+    def scores(self) -> "np.ndarray":
+        return self._values[: self._length, 0]
+
+    def column(self, name: str) -> "np.ndarray":
+        return self._values[: self._length, self.columns.index(name)]
+
+    def append(self, step: int, *values: float) -> None:
+        if self._length == len(self._steps):
+            self._make_room()
+        self._steps[self._length] = step
+        self._values[self._length] = values
+        self._length += 1
+
+    def _make_room(self) -> None:
+        import numpy as np
+
+        n = self._length
+        if self.max_length > 0 and n >= self.max_length:
+            if self.downsample:
+                keep = np.concatenate([np.arange(0, n // 2, 2), np.arange(n // 2, n)])
+            else:
+                keep = np.arange(n // 4, n)
+            self._resize(self.max_length, keep)
+        else:
+            capacity = 2 * n
+            if self.max_length > 0:
+                capacity = min(capacity, self.max_length)
+            self._resize(capacity, np.arange(n))
+
+    def _resize(self, capacity: int, keep: "np.ndarray") -> None:
+        import numpy as np
+
+        steps = np.zeros(capacity, dtype=np.int64)
+        values = np.zeros((capacity, len(self.columns)), order="F")
+        steps[: len(keep)] = self._steps[keep]
+        values[: len(keep)] = self._values[keep]
+        self._steps, self._values, self._length = steps, values, len(keep)
+
+    def records(self) -> "MetricsRecords":
+        return MetricsRecords(self)
+
+    def to_list(self) -> List[Dict[str, Union[int, float]]]:
+        return [
+            {"step": step, **dict(zip(self.columns, values))}
+            for step, values in zip(
+                self.steps.tolist(), self._values[: self._length].tolist()
+            )
+        ]
+
+    def to_pandas(self) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "step": self.steps,
+                **{
+                    name: self._values[: self._length, i]
+                    for i, name in enumerate(self.columns)
+                },
+            },
+            copy=False,
+        )
+
+
+class MetricsRecords(abc.Sequence):
+    """
+    Read-only view of the points of a `MetricsHistory`, as {"step": ..., <column>: ...} mappings built
+    on access. It follows the history as points are added or dropped. Use `MetricsHistory.to_list()`
+    for a list that can be modified.
+    """
+
+    def __init__(self, points: MetricsHistory):
+        self._points = points
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("metrics history index out of range")
+        points = self._points
+        return MappingProxyType(
+            {
+                "step": int(points.steps[index]),
+                **{
+                    name: float(points._values[index, i])
+                    for i, name in enumerate(points.columns)
+                },
+            }
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, abc.Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(
+                dict(a) == b for a, b in zip(self, other)
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(self._points.to_list())
+
 
 class MetricsTrackerAverage:
-    def __init__(self, step: int):
-        self.history: List[Dict[str, Union[int, float]]] = [{"step": 0, "score": 0}]
+    def __init__(
+        self, step: int, max_history: int = -1, downsample_history: bool = False
+    ):
+        self.points = MetricsHistory(max_history, downsample_history)
+        self.points.append(0, 0)
         self.step: int = step
         self.feedback_count: int = 0
         self.score_sum: float = 0
@@ -24,29 +193,40 @@ class MetricsTrackerAverage:
         self.score_sum += score or 0
         self.feedback_count += 1
         if self.step > 0 and self.feedback_count % self.step == 0:
-            self.history.append({"step": self.feedback_count, "score": self.score})
+            self.points.append(self.feedback_count, self.score)
 
-    def to_pandas(self) -> "pd.DataFrame":
-        import pandas as pd
+    @property
+    def history(self) -> MetricsRecords:
+        """Read-only view of the points, see `MetricsRecords`."""
+        return self.points.records()
 
-        return pd.DataFrame(self.history)
+    def to_pandas(self) -> "pd.DataFrame":
+        return self.points.to_pandas()
 
 
 class MetricsTrackerRollingWindow:
-    def __init__(self, window_size: int, step: int):
-        self.history: List[Dict[str, Union[int, float]]] = [{"step": 0, "score": 0}]
+    def __init__(
+        self,
+        window_size: int,
+        step: int,
+        max_history: int = -1,
+        downsample_history: bool = False,
+    ):
+        self.points = MetricsHistory(max_history, downsample_history)
+        self.points.append(0, 0)
         self.step: int = step
         self.feedback_count: int = 0
         self.window_size: int = window_size
         self.queue: deque = deque()
         self.sum: float = 0.0
+        self.decision_count: int = 0
 
     @property
     def score(self) -> float:
         return self.sum / len(self.queue) if len(self.queue) > 0 else 0
 
     def on_decision(self) -> None:
-        pass
+        self.decision_count += 1
 
     def on_feedback(self, value: float) -> None:
         self.sum += value
@@ -58,11 +238,601 @@ class MetricsTrackerRollingWindow:
             self.sum -= old_val
 
         if self.step > 0 and self.feedback_count % self.step == 0:
-            self.history.append(
-                {"step": self.feedback_count, "score": self.sum / len(self.queue)}
+            self.points.append(self.feedback_count, self.sum / len(self.queue))
+
+    @property
+    def history(self) -> MetricsRecords:
+        """Read-only view of the points, see `MetricsRecords`."""
+        return self.points.records()
+
+    def to_pandas(self) -> "pd.DataFrame":
+        return self.points.to_pandas()
+
+
+class _Window:
+    """Sum, sum of squares and count of values, in a ring of buckets."""
+
+    def __init__(self, buckets: int):
+        self._sums = [0.0] * buckets
+        self._squares = [0.0] * buckets
+        self._counts = [0] * buckets
+        self._current = 0
+        self.sum = 0.0
+        self.square_sum = 0.0
+        self.count = 0
+
+    def _add(self, value: float) -> None:
+        c = self._current
+        self._sums[c] += value
+        self._squares[c] += value * value
+        self._counts[c] += 1
+        self.sum += value
+        self.square_sum += value * value
+        self.count += 1
+
+    def _advance(self, buckets: int) -> None:
+        """Moves to the next bucket `buckets` times, dropping the values of the buckets reused."""
+        for _ in range(min(buckets, len(self._sums))):
+            self._current = c = (self._current + 1) % len(self._sums)
+            if c == 0:
+                # recompute the totals once per lap, so that rounding errors do not accumulate
+                self.sum = sum(self._sums[1:])
+                self.square_sum = sum(self._squares[1:])
+                self.count = sum(self._counts[1:])
+            else:
+                self.sum -= self._sums[c]
+                self.square_sum -= self._squares[c]
+                self.count -= self._counts[c]
+            self._sums[c] = self._squares[c] = 0.0
+            self._counts[c] = 0
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count > 0 else 0.0
+
+    @property
+    def std(self) -> float:
+        if self.count < 2:
+            return 0.0
+        variance = (self.square_sum - self.sum * self.sum / self.count) / (
+            self.count - 1
+        )
+        return max(variance, 0.0) ** 0.5
+
+
+class _CountWindow(_Window):
+    """
+    Approximately the last `size` values: between `size - ceil(size / buckets)` and `size` of them.
+    The capacities of the buckets differ by at most one value and add up to exactly `size`.
+    """
+
+    def __init__(self, size: int, buckets: int):
+        buckets = max(1, min(buckets, size))
+        super().__init__(buckets)
+        self.capacities = [
+            size // buckets + (1 if i < size % buckets else 0) for i in range(buckets)
+        ]
+
+    def add(self, value: float) -> None:
+        if self._counts[self._current] == self.capacities[self._current]:
+            self._advance(1)
+        self._add(value)
+
+
+class _TimeWindow(_Window):
+    """The values of approximately the last `seconds` seconds, with a resolution of `seconds / buckets`."""
+
+    def __init__(self, seconds: float, buckets: int, clock: Callable[[], float]):
+        super().__init__(buckets)
+        self.width = seconds / buckets
+        self.clock = clock
+        self._bucket = int(clock() / self.width)
+
+    def expire(self) -> None:
+        bucket = int(self.clock() / self.width)
+        if bucket > self._bucket:
+            self._advance(bucket - self._bucket)
+            self._bucket = bucket
+
+    def add(self, value: float) -> None:
+        self.expire()
+        self._add(value)
+
+    @property
+    def mean(self) -> float:
+        self.expire()
+        return super().mean
+
+
+class _Ewma:
+    """Exponentially weighted moving average, the weight of a value halves every `half_life` values."""
+
+    def __init__(self, half_life: float):
+        self.alpha = 1 - 0.5 ** (1 / half_life)
+        self.value: Optional[float] = None
+
+    def add(self, value: float) -> None:
+        self.value = (
+            value
+            if self.value is None
+            else self.value + self.alpha * (value - self.value)
+        )
+
+    @property
+    def mean(self) -> float:
+        return self.value if self.value is not None else 0.0
+
+
+class P2Quantile:
+    """
+    Streaming estimate of the `q` quantile with the P-square algorithm (Jain and Chlamtac, 1985),
+    in constant memory: five markers are adjusted as values arrive.
+    """
+
+    def __init__(self, q: float):
+        self.q = q
+        self.count = 0
+        self._heights: List[float] = []
+        self._positions = [0.0, 1.0, 2.0, 3.0, 4.0]
+        self._desired = [0.0, 2 * q, 4 * q, 2 + 2 * q, 4.0]
+        self._increments = [0.0, q / 2, q, (1 + q) / 2, 1.0]
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        h = self._heights
+        if self.count <= 5:
+            h.append(value)
+            h.sort()
+            return
+
+        if value < h[0]:
+            h[0] = value
+            k = 0
+        elif value >= h[4]:
+            h[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= h[k + 1]:
+                k += 1
+        n = self._positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+                )
+                if h[i - 1] < parabolic < h[i + 1]:
+                    h[i] = parabolic
+                else:
+                    h[i] += d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    @property
+    def value(self) -> float:
+        if self.count == 0:
+            return 0.0
+        if self.count <= 5:
+            return self._heights[min(int(self.q * self.count), self.count - 1)]
+        return self._heights[2]
+
+
+class MetricsTrackerMultiWindow:
+    """
+    Tracks the score over several horizons at once, in constant memory per horizon.
+
+    Attributes:
+        step (int): A point is added to the history every `step` scores.
+        window_sizes (List[int]): Rolling windows over approximately the last N scores, e.g. [1000, 100000].
+        time_windows (List[float]): Rolling windows over the scores of the last N seconds, e.g. [60, 3600].
+        half_lives (List[float]): Exponentially weighted averages, whose weights halve every N scores.
+        quantiles (List[float]): Streaming (P-square) estimates of these quantiles of all the scores.
+        buckets (int): Number of buckets per window, the windows are accurate within 1 / buckets of their size.
+        max_history, downsample_history: See `MetricsHistory`.
+
+    `score` is the average of the first window (count windows first, then time windows), or the
+    average of all the scores if there is no window. `stats()` returns every horizon, plus the mean
+    and standard deviation of all the scores (Welford), and the history has one column per horizon.
+    """
+
+    def __init__(
+        self,
+        step: int,
+        window_sizes: List[int] = [],
+        time_windows: List[float] = [],
+        half_lives: List[float] = [],
+        quantiles: List[float] = [],
+        buckets: int = 64,
+        max_history: int = -1,
+        downsample_history: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.step: int = step
+        self.feedback_count: int = 0
+        self.decision_count: int = 0
+        self.windows: Dict[str, Union[_CountWindow, _TimeWindow]] = {}
+        for size in window_sizes:
+            self.windows[f"window_{size}"] = _CountWindow(size, buckets)
+        for seconds in time_windows:
+            self.windows[f"window_{seconds:g}s"] = _TimeWindow(seconds, buckets, clock)
+        self.ewmas = {f"ewm_{h:g}": _Ewma(h) for h in half_lives}
+        self.quantiles = {f"q{q:g}": P2Quantile(q) for q in quantiles}
+        self.count: int = 0
+        self.mean: float = 0.0
+        self._m2: float = 0.0
+        self.points = MetricsHistory(
+            max_history, downsample_history, columns=["score", *self.stats()]
+        )
+        self.points.append(0, *[0.0] * len(self.points.columns))
+
+    @property
+    def score(self) -> float:
+        for window in self.windows.values():
+            return window.mean
+        return self.mean
+
+    @property
+    def std(self) -> float:
+        return (self._m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        stats = {name: window.mean for name, window in self.windows.items()}
+        stats.update((name, ewma.mean) for name, ewma in self.ewmas.items())
+        stats.update((name, q.value) for name, q in self.quantiles.items())
+        stats["mean"] = self.mean
+        stats["std"] = self.std
+        return stats
+
+    def on_decision(self) -> None:
+        self.decision_count += 1
+
+    def on_feedback(self, value: float) -> None:
+        value = value or 0
+        for window in self.windows.values():
+            window.add(value)
+        for ewma in self.ewmas.values():
+            ewma.add(value)
+        for quantile in self.quantiles.values():
+            quantile.add(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.feedback_count += 1
+
+        if self.step > 0 and self.feedback_count % self.step == 0:
+            self.points.append(self.feedback_count, self.score, *self.stats().values())
+
+    @property
+    def history(self) -> MetricsRecords:
+        """Read-only view of the points, see `MetricsRecords`."""
+        return self.points.records()
+
+    def to_pandas(self) -> "pd.DataFrame":
+        return self.points.to_pandas()
+
+
+class LatencyHistogram:
+    """
+    Latency histogram in the spirit of HdrHistogram.
+
+    Latencies are recorded in nanoseconds into log-linear buckets: exact below 128ns, and 64 buckets
+    per power of two above, so that percentiles are accurate within 1% over any range, with a few
+    kilobytes of memory and O(1) recording.
+    """
+
+    def __init__(self):
+        self.counts: List[int] = []
+        self.count: int = 0
+        self.total_ns: int = 0
+        self.max_ns: int = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index(ns: int) -> int:
+        if ns < 128:
+            return ns
+        shift = ns.bit_length() - 7
+        return 64 * shift + (ns >> shift)
+
+    @staticmethod
+    def _value(index: int) -> int:
+        """Middle of the bucket."""
+        if index < 128:
+            return index
+        shift = index // 64 - 1
+        return ((index - 64 * shift) << shift) + (1 << (shift - 1))
+
+    def record(self, seconds: float) -> None:
+        ns = max(0, int(seconds * 1e9))
+        index = self._index(ns)
+        with self._lock:
+            if index >= len(self.counts):
+                self.counts.extend([0] * (index + 1 - len(self.counts)))
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ns += ns
+            if ns > self.max_ns:
+                self.max_ns = ns
+
+    def percentile(self, q: float) -> float:
+        """The `q`-th percentile (0 to 100) in seconds."""
+        if self.count == 0:
+            return 0.0
+        target = max(1, int(q / 100 * self.count + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._value(index), self.max_ns) / 1e9
+        return self.max_ns / 1e9
+
+    @property
+    def mean(self) -> float:
+        return self.total_ns / self.count / 1e9 if self.count > 0 else 0.0
+
+    @property
+    def max(self) -> float:
+        return self.max_ns / 1e9
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class _StageTimer:
+    __slots__ = ("latencies", "stage", "start")
+
+    def __init__(self, latencies: "StageLatencies", stage: str):
+        self.latencies = latencies
+        self.stage = stage
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.latencies.record(self.stage, time.perf_counter() - self.start)
+
+
+class StageLatencies:
+    """
+    Latency histograms of the stages of a loop, e.g. featurize, predict, scoring or learn.
+
+    Hooks are called with `(stage, seconds)` for every recorded latency, to forward them to other
+    telemetry systems.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.hooks: List[Callable[[str, float], None]] = []
+
+    def add_hook(self, hook: Callable[[str, float], None]) -> None:
+        self.hooks.append(hook)
+
+    def record(self, stage: str, seconds: float) -> None:
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        histogram.record(seconds)
+        for hook in self.hooks:
+            try:
+                hook(stage, seconds)
+            except Exception as e:
+                logger.info(f"Latency hook {hook} failed, error: {e}")
+
+    def time(self, stage: str) -> ContextManager[None]:
+        return _StageTimer(self, stage)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {stage: h.summary() for stage, h in self.histograms.items()}
+
+    def to_pandas(self) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.DataFrame.from_dict(self.summary(), orient="index")
+
+
+_NOT_TIMED = contextlib.nullcontext()
+
+
+def time_stage(latencies: Optional[StageLatencies], stage: str) -> ContextManager:
+    """Times a stage if latencies are tracked, and costs next to nothing otherwise."""
+    return _NOT_TIMED if latencies is None else _StageTimer(latencies, stage)
+
+
+class AllocationSite(NamedTuple):
+    """Python memory allocated at a source line, and its growth since the previous sample."""
+
+    location: str
+    size: int
+    size_diff: int
+    count_diff: int
+
+
+class MemoryReport(NamedTuple):
+    """
+    Attributes:
+        run (int): Number of runs when the sample was taken.
+        traced_bytes (int): Python memory traced by tracemalloc.
+        peak_bytes (int): Peak of the traced memory since the previous sample (since tracing started on Python 3.8).
+        bytes_per_run (float): Growth of the traced memory per run since the previous sample.
+        rss_bytes (int): Resident set size of the process, which includes native allocations such as VW's. -1 if unknown.
+        top (List[AllocationSite]): Allocation sites that grew the most since the previous sample.
+    """
+
+    run: int
+    traced_bytes: int
+    peak_bytes: int
+    bytes_per_run: float
+    rss_bytes: int
+    top: List[AllocationSite]
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return -1
+
+
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+class MemoryProfiler:
+    """
+    Samples tracemalloc snapshots every `every` runs, and reports the allocation sites that grew the
+    most and the memory growth per run since the previous sample.
+
+    tracemalloc slows down every allocation, so profiling is meant for diagnosis rather than to stay
+    on in production. Tracing is started by `start()`, and stopped by `stop()` unless it was already on.
+
+    Attributes:
+        every (int): Runs between two samples. Default is 1000.
+        top (int): Number of allocation sites kept per sample. Default is 10.
+        frames (int): Frames stored per allocation when tracing is started. Default is 1.
+        max_reports (int): Number of samples kept in `reports`. Default is 100.
+    """
+
+    def __init__(
+        self, every: int = 1000, top: int = 10, frames: int = 1, max_reports: int = 100
+    ):
+        self.every = every
+        self.top = top
+        self.frames = frames
+        self.runs: int = 0
+        self.reports: "deque[MemoryReport]" = deque(maxlen=max_reports)
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._snapshot_run: int = 0
+        self._started_tracing = False
+        self._lock = threading.Lock()
+
+    @property
+    def last(self) -> Optional[MemoryReport]:
+        return self.reports[-1] if self.reports else None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        with self._lock:
+            self._snapshot = self._take_snapshot()
+            self._snapshot_run = self.runs
+
+    def stop(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._snapshot = None
+
+    def on_run(self, runs: int = 1) -> None:
+        self.runs += runs
+        if self.runs - self._snapshot_run >= self.every:
+            self.sample()
+
+    def sample(self) -> Optional[MemoryReport]:
+        """Takes a snapshot now, and compares it with the previous one."""
+        if self._snapshot is None or not tracemalloc.is_tracing():
+            return None
+        with self._lock:
+            snapshot = self._take_snapshot()
+            stats = snapshot.compare_to(self._snapshot, "lineno")
+            runs = self.runs - self._snapshot_run
+            growth = sum(stat.size_diff for stat in stats)
+            _, peak = tracemalloc.get_traced_memory()
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            report = MemoryReport(
+                run=self.runs,
+                traced_bytes=sum(stat.size for stat in stats),
+                peak_bytes=peak,
+                bytes_per_run=growth / runs if runs > 0 else 0.0,
+                rss_bytes=_rss_bytes(),
+                top=[
+                    AllocationSite(
+                        location=str(stat.traceback),
+                        size=stat.size,
+                        size_diff=stat.size_diff,
+                        count_diff=stat.count_diff,
+                    )
+                    for stat in stats[: self.top]
+                ],
             )
+            self.reports.append(report)
+            self._snapshot = snapshot
+            self._snapshot_run = self.runs
+        logger.info(
+            f"memory after {report.run} runs: {report.traced_bytes} traced bytes, "
+            f"{report.bytes_per_run:.1f} bytes per run, top site {report.top[0].location if report.top else None}"
+        )
+        return report
+
+    def summary(self) -> Dict[str, float]:
+        report = self.last
+        if report is None:
+            return {}
+        return {
+            "run": report.run,
+            "traced_bytes": report.traced_bytes,
+            "peak_bytes": report.peak_bytes,
+            "bytes_per_run": report.bytes_per_run,
+            "rss_bytes": report.rss_bytes,
+        }
 
     def to_pandas(self) -> "pd.DataFrame":
+        """The top allocation sites of the last sample."""
         import pandas as pd
 
-        return pd.DataFrame(self.history)
+        report = self.last
+        return pd.DataFrame(
+            report.top if report else [], columns=AllocationSite._fields
+        )
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+
+def measure_allocations(
+    fn: Callable[[], Any], runs: int, warmup: int = 0
+) -> Dict[str, float]:
+    """
+    Calls `fn` `warmup` times and then `runs` times under tracemalloc, and returns the traced memory
+    retained per run and the peak traced memory above the starting point, in bytes.
+    """
+    for _ in range(warmup):
+        fn()
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        for _ in range(runs):
+            fn()
+        end, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return {
+        "retained_bytes_per_run": (end - start) / runs if runs > 0 else 0.0,
+        "peak_bytes": peak - start,
+    }
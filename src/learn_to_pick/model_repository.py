@@ -1,49 +1,256 @@
 import datetime
 import glob
+import hashlib
+import json
 import logging
 import os
 import shutil
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from pathlib import Path
-from typing import TYPE_CHECKING, List, Union
+from typing import IO, TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Optional, Union
 
 if TYPE_CHECKING:
     import vowpal_wabbit_next as vw
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
 logger = logging.getLogger(__name__)
 
 
+@contextmanager
+def _file_lock(f: IO, exclusive: bool) -> Iterator[None]:
+    """POSIX record lock of a whole file, honored across the clients of NFS (with lockd, or NFSv4)."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.lockf(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield
+    finally:
+        fcntl.lockf(f, fcntl.LOCK_UN)
+
+
+class ModelVersion(NamedTuple):
+    """A single entry of a model manifest: a tag pointing at a content-addressed blob."""
+
+    tag: str
+    digest: str
+    size: int
+
+
+class ModelBackend(ABC):
+    """
+    Storage for model snapshots.
+
+    Blobs are addressed by the sha256 digest of their content, so storing a model that
+    is already present is a no-op. A manifest of `ModelVersion` entries (oldest first)
+    records which blob every saved version points to.
+    """
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool:
+        ...
+
+    @abstractmethod
+    def put(self, digest: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, digest: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def list(self) -> List[ModelVersion]:
+        ...
+
+    @abstractmethod
+    def publish(self, version: ModelVersion) -> None:
+        """Appends a version to the manifest."""
+        ...
+
+    def latest(self) -> Optional[ModelVersion]:
+        versions = self.list()
+        return versions[-1] if versions else None
+
+
+class LocalModelBackend(ModelBackend):
+    """
+    Filesystem backend, for a folder shared by the workers of one or several hosts.
+
+    Layout:
+        - `blobs/<digest[:2]>/<digest>.vw`: model blobs, written to a temporary file and
+          atomically renamed into place.
+        - `manifest.jsonl`: one json line per version. Every line is appended and synced under an
+          exclusive POSIX lock of the manifest, and read under a shared one, so concurrent writers
+          do not clobber each other, including on NFS when locking is available (lockd for NFSv3,
+          built into NFSv4). Where POSIX locks are not available (Windows, or NFS mounted with
+          `nolock`), only the workers of a single host can share the folder.
+    """
+
+    def __init__(self, folder: Union[str, os.PathLike]):
+        self.folder = Path(folder)
+        self.blobs = self.folder / "blobs"
+        self.manifest_path = self.folder / "manifest.jsonl"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blobs / digest[:2] / f"{digest}.vw"
+
+    def exists(self, digest: str) -> bool:
+        return self._blob_path(digest).exists()
+
+    def put(self, digest: str, data: bytes) -> None:
+        path = self._blob_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, digest: str) -> bytes:
+        with open(self._blob_path(digest), "rb") as f:
+            return f.read()
+
+    def list(self) -> List[ModelVersion]:
+        if not self.manifest_path.exists():
+            return []
+        versions = []
+        # readers never see a line that is being appended
+        with open(self.manifest_path, "r", encoding="utf-8") as f, _file_lock(
+            f, exclusive=False
+        ):
+            for line in f:
+                line = line.strip()
+                if line:
+                    versions.append(ModelVersion(**json.loads(line)))
+        return versions
+
+    def publish(self, version: ModelVersion) -> None:
+        line = json.dumps(version._asdict()) + "\n"
+        with open(self.manifest_path, "a", encoding="utf-8") as f, _file_lock(
+            f, exclusive=True
+        ):
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class InMemoryModelBackend(ModelBackend):
+    """Backend that keeps everything in process memory, mostly useful for tests."""
+
+    def __init__(self):
+        self.blobs: Dict[str, bytes] = {}
+        self.versions: List[ModelVersion] = []
+        self.lock = threading.Lock()
+
+    def exists(self, digest: str) -> bool:
+        return digest in self.blobs
+
+    def put(self, digest: str, data: bytes) -> None:
+        with self.lock:
+            self.blobs[digest] = bytes(data)
+
+    def get(self, digest: str) -> bytes:
+        return self.blobs[digest]
+
+    def list(self) -> List[ModelVersion]:
+        with self.lock:
+            return list(self.versions)
+
+    def publish(self, version: ModelVersion) -> None:
+        with self.lock:
+            self.versions.append(version)
+
+
 class ModelRepository:
+    """
+    Saves and loads the policy's VW model.
+
+    By default models are stored in `folder` as `latest.vw`, with timestamped copies
+    when `with_history` is set. If a `backend` is provided, snapshots are stored there
+    instead: blobs are content-addressed, so a model that did not change since the
+    last save is neither re-uploaded nor re-published, and the backend's manifest
+    always keeps the version history, so `with_history` cannot be disabled.
+    """
+
     def __init__(
         self,
         folder: Union[str, os.PathLike],
         with_history: bool = True,
         reset: bool = False,
+        backend: Optional[ModelBackend] = None,
     ):
+        if backend is not None and not with_history:
+            raise ValueError(
+                "A model backend always keeps the version history, with_history=False is not supported with a backend"
+            )
         self.folder = Path(folder)
         self.model_path = self.folder / "latest.vw"
         self.with_history = with_history
-        if reset and self.has_history():
+        self.backend = backend
+        # with a backend, shared history is never deleted and no local file is used: reset
+        # only means that the current snapshot is not loaded
+        self.reset = reset and backend is not None
+        if reset and backend is None and self.has_history():
             logger.warning(
                 "There is non empty history which is recommended to be cleaned up"
             )
             if self.model_path.exists():
                 os.remove(self.model_path)
 
-        self.folder.mkdir(parents=True, exist_ok=True)
+        if self.backend is None:
+            self.folder.mkdir(parents=True, exist_ok=True)
 
     def get_tag(self) -> str:
         return datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
 
     def has_history(self) -> bool:
+        if self.backend is not None:
+            return self.backend.latest() is not None
         return len(glob.glob(str(self.folder / "model-????????-??????.vw"))) > 0
 
     def save(self, workspace: "vw.Workspace") -> None:
+        if self.backend is not None:
+            self._save_to_backend(workspace.serialize())
+            return
         with open(self.model_path, "wb") as f:
             logger.info(f"storing learn_to_pick model in: {self.model_path}")
             f.write(workspace.serialize())
         if self.with_history:  # write history
             shutil.copyfile(self.model_path, self.folder / f"model-{self.get_tag()}.vw")
 
+    def _save_to_backend(self, model_data: bytes) -> None:
+        digest = hashlib.sha256(model_data).hexdigest()
+        latest = self.backend.latest()
+        self.reset = False
+        if latest is not None and latest.digest == digest:
+            logger.info(f"learn_to_pick model {digest} is unchanged, skipping save")
+            return
+        if not self.backend.exists(digest):
+            logger.info(f"storing learn_to_pick model blob: {digest}")
+            self.backend.put(digest, model_data)
+        self.backend.publish(
+            ModelVersion(tag=self.get_tag(), digest=digest, size=len(model_data))
+        )
+
+    def _read_model_data(self) -> Optional[bytes]:
+        if self.backend is not None:
+            latest = None if self.reset else self.backend.latest()
+            if latest is None:
+                return None
+            logger.info(f"learn_to_pick model is loaded from version: {latest.tag}")
+            return self.backend.get(latest.digest)
+        if self.model_path.exists():
+            logger.info(f"learn_to_pick model is loaded from: {self.model_path}")
+            with open(self.model_path, "rb") as f:
+                return f.read()
+        return None
+
     def load(self, commandline: List[str]) -> "vw.Workspace":
         try:
             import vowpal_wabbit_next as vw
@@ -53,11 +260,7 @@ class ModelRepository:
                 "`pip install vowpal_wabbit_next`."
             ) from e
 
-        model_data = None
-        if self.model_path.exists():
-            with open(self.model_path, "rb") as f:
-                model_data = f.read()
+        model_data = self._read_model_data()
         if model_data:
-            logger.info(f"learn_to_pick model is loaded from: {self.model_path}")
             return vw.Workspace(commandline, model_data=model_data)
         return vw.Workspace(commandline)
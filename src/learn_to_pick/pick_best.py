@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, List, Optional, Tuple, Type, Union, Callable
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Type, Union, Callable
 from itertools import chain
 import os
-import numpy as np
 
 from learn_to_pick import base
+from learn_to_pick.catalog import CatalogAction
+from learn_to_pick.metrics import time_stage
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +43,10 @@ class PickBestEvent(base.Event[PickBestSelected]):
         super().__init__(inputs=inputs, selected=selected or PickBestSelected())
         self.to_select_from = base.get_to_select_from(inputs)
         self.based_on = base.get_based_on(inputs)
+        # positions of the actions selected from in the `ToSelectFrom` input, when they were pre-selected
+        self.candidate_indices: Optional[List[int]] = None
+        # positions of all the duplicates of each action selected from, when duplicates were collapsed
+        self.duplicate_indices: Optional[List[List[int]]] = None
         if not self.to_select_from:
             raise ValueError(
                 "No variables using 'ToSelectFrom' found in the inputs. Please include at least one variable containing a list to select from."
@@ -66,20 +73,121 @@ class VwTxt:
 
     @staticmethod
     def featurized_2_str(obj: base.Featurized) -> str:
-        return " ".join(
-            chain.from_iterable(
-                [
-                    map(
-                        lambda kv: f"|{kv[0]}_dense {VwTxt._dense_2_str(kv[1])}",
-                        obj.dense.items(),
-                    ),
-                    map(
-                        lambda kv: f"|{kv[0]}_sparse {VwTxt._sparse_2_str(kv[1])}",
-                        obj.sparse.items(),
-                    ),
-                ]
+        if not obj.rendered and not obj.cache_rendering:
+            return " ".join(
+                chain.from_iterable(
+                    [
+                        map(
+                            lambda kv: f"|{kv[0]}_dense {VwTxt._dense_2_str(kv[1])}",
+                            obj.dense.items(),
+                        ),
+                        map(
+                            lambda kv: f"|{kv[0]}_sparse {VwTxt._sparse_2_str(kv[1])}",
+                            obj.sparse.items(),
+                        ),
+                    ]
+                )
             )
-        )
+        parts = []
+        for ns, dense in obj.dense.items():
+            rendered = obj.rendered.get(("dense", ns))
+            if rendered is None:
+                rendered = f"|{ns}_dense {VwTxt._dense_2_str(dense)}"
+                if obj.cache_rendering:
+                    obj.rendered[("dense", ns)] = rendered
+            parts.append(rendered)
+        for ns, sparse in obj.sparse.items():
+            rendered = obj.rendered.get(("sparse", ns))
+            if rendered is None:
+                rendered = f"|{ns}_sparse {VwTxt._sparse_2_str(sparse)}"
+                if obj.cache_rendering:
+                    obj.rendered[("sparse", ns)] = rendered
+            parts.append(rendered)
+        return " ".join(parts)
+
+
+def _is_catalog_selection(to_select_from: Any) -> bool:
+    return (
+        isinstance(to_select_from, list)
+        and len(to_select_from) > 0
+        and all(isinstance(action, CatalogAction) for action in to_select_from)
+    )
+
+
+def _default_sentence_transformer() -> Any:
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer("all-mpnet-base-v2")
+
+
+class _LruCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class _MemoEncoder:
+    """Memoizes the encodings of strings by the featurizer's model."""
+
+    def __init__(self, featurizer: "PickBestFeaturizer", max_size: int):
+        self.featurizer = featurizer
+        self.cache = _LruCache(max_size)
+
+    def encode(self, to_encode: Any) -> Any:
+        if not isinstance(to_encode, str):
+            return self.featurizer.model.encode(to_encode)
+        encoded = self.cache.get(to_encode)
+        if encoded is None:
+            encoded = self.featurizer.model.encode(to_encode)
+            self.cache.put(to_encode, encoded)
+        return encoded
+
+
+def _rendered_picked(picked: Dict[str, Any]) -> Dict[str, Any]:
+    """The picked actions as shown to scorers, with catalog actions shown as their value, without their ID."""
+    return {
+        k: v.value if isinstance(v, CatalogAction) else v for k, v in picked.items()
+    }
+
+
+def _content_key(value: Any) -> Optional[Hashable]:
+    """Hashable key of a `BasedOn` or `ToSelectFrom` value, or None if it cannot be cached."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, base._Embed) and isinstance(value.value, str):
+        return ("embed", value.value, value.keep)
+    if isinstance(value, list):
+        keys = tuple(_content_key(v) for v in value)
+        return None if None in keys else ("list", keys)
+    if isinstance(value, dict):
+        keys = tuple((k, _content_key(v)) for k, v in value.items())
+        return None if any(key is None for _, key in keys) else ("dict", keys)
+    if isinstance(value, CatalogAction):
+        return _content_key(value.value)
+    return None
 
 
 class PickBestFeaturizer(base.Featurizer[PickBestEvent]):
@@ -87,33 +195,70 @@ class PickBestFeaturizer(base.Featurizer[PickBestEvent]):
     Text Featurizer class that embeds the `BasedOn` and `ToSelectFrom` inputs into a format that can be used by the learning policy
 
     Attributes:
-        model name (Any, optional): The type of embeddings to be used for feature representation. Defaults to BERT SentenceTransformer.
+        model name (Any, optional): The type of embeddings to be used for feature representation. Defaults to BERT SentenceTransformer, which is only loaded when something is first embedded.
+        context_cache_size (int): Number of `BasedOn` namespaces whose features, and their VW rendering, are cached by content, so that runs sharing most of their context only featurize what changed. Default is 0, which disables the cache.
+        encode_cache_size (int): Number of texts whose encodings by `model` are cached. Default is 0, which disables the cache.
     """
 
     def __init__(
-        self, auto_embed: bool, model: Optional[Any] = None, *args: Any, **kwargs: Any
+        self,
+        auto_embed: bool,
+        model: Optional[Any] = None,
+        *args: Any,
+        context_cache_size: int = 0,
+        encode_cache_size: int = 0,
+        **kwargs: Any,
     ):
         super().__init__(*args, **kwargs)
 
         if model is None:
-            from sentence_transformers import SentenceTransformer
-
-            model = SentenceTransformer("all-mpnet-base-v2")
+            model = base.LazyEncoder(_default_sentence_transformer)
 
         self.model = model
         self.auto_embed = auto_embed
+        self.context_cache = (
+            _LruCache(context_cache_size) if context_cache_size > 0 else None
+        )
+        self.encoder: Any = (
+            _MemoEncoder(self, encode_cache_size) if encode_cache_size > 0 else None
+        )
 
-    def _dotproducts(self, context, actions):
-        _context_dense = base.Featurized()
-        for ns in context.sparse.keys():
-            if "default_ft" in context.sparse[ns]:
-                _context_dense[ns] = self.model.encode(context.sparse[ns]["default_ft"])
+    @property
+    def _encoder(self) -> Any:
+        return self.encoder if self.encoder is not None else self.model
+
+    def _featurize_context(self, based_on: Dict[str, Any]) -> base.Featurized:
+        if self.context_cache is None:
+            return base.embed(based_on, self._encoder)
+        context = base.Featurized()
+        for ns, value in based_on.items():
+            content = _content_key(value)
+            key = (ns, content)
+            fragment = self.context_cache.get(key) if content is not None else None
+            if fragment is None:
+                fragment = base.embed({ns: value}, self._encoder)
+                fragment.cache_rendering = True
+                VwTxt.featurized_2_str(fragment)
+                if content is not None:
+                    self.context_cache.put(key, fragment)
+            context.merge(fragment)
+        return context
+
+    def _encode_default_ft(self, featurized: base.Featurized) -> base.Featurized:
+        result = base.Featurized()
+        for ns in featurized.sparse.keys():
+            if "default_ft" in featurized.sparse[ns]:
+                result[ns] = self._encoder.encode(featurized.sparse[ns]["default_ft"])
+        return result
 
-        _actions_dense = [base.Featurized() for _ in range(len(actions))]
-        for _action, action in zip(_actions_dense, actions):
-            for ns in action.sparse.keys():
-                if "default_ft" in action.sparse[ns]:
-                    _action[ns] = self.model.encode(action.sparse[ns]["default_ft"])
+    def _dotproducts(self, context, actions, actions_dense=None):
+        import numpy as np
+
+        _context_dense = self._encode_default_ft(context)
+        _actions_dense = [
+            self._encode_default_ft(action) if dense is None else dense
+            for action, dense in zip(actions, actions_dense or [None] * len(actions))
+        ]
 
         context_names = list(_context_dense.dense.keys())
         context_matrix = np.stack(list(_context_dense.dense.values()))
@@ -126,6 +271,19 @@ class PickBestFeaturizer(base.Featurizer[PickBestEvent]):
                 for j in range(len(action_names))
             }
 
+    def featurize_action(
+        self, action: Any, namespace: Optional[str] = None
+    ) -> Tuple[base.Featurized, Optional[base.Featurized]]:
+        """
+        Featurizes a single action once, for `ActionCatalog`: returns its features, with their VW
+        rendering cached, and with `auto_embed` the embeddings of its text.
+        """
+        featurized = base.embed([action], self._encoder, namespace)[0]
+        featurized.cache_rendering = True
+        VwTxt.featurized_2_str(featurized)
+        embeddings = self._encode_default_ft(featurized) if self.auto_embed else None
+        return featurized, embeddings
+
     @staticmethod
     def _generic_namespace(featurized):
         result = base.SparseFeatures()
@@ -143,14 +301,16 @@ class PickBestFeaturizer(base.Featurizer[PickBestEvent]):
     def get_context_and_actions(
         self, event
     ) -> Tuple[base.Featurized, List[base.Featurized]]:
-        context = base.embed(event.based_on or {}, self.model)
+        context = self._featurize_context(event.based_on or {})
         to_select_from_var_name, to_select_from = next(
             iter(event.to_select_from.items()), (None, None)
         )
+        if _is_catalog_selection(to_select_from):
+            return context, [action.featurized.copy() for action in to_select_from]
 
         actions = (
             (
-                base.embed(to_select_from, self.model, to_select_from_var_name)
+                self._featurize_actions(to_select_from, to_select_from_var_name)
                 if event.to_select_from
                 else None
             )
@@ -159,13 +319,49 @@ class PickBestFeaturizer(base.Featurizer[PickBestEvent]):
         )
         return context, actions
 
+    def _featurize_actions(
+        self, actions: Any, namespace: Optional[str]
+    ) -> List[base.Featurized]:
+        """Identical actions are featurized and rendered once, and get a copy of the same features each."""
+        if not isinstance(actions, list):
+            return base.embed(actions, self._encoder, namespace)
+        keys = [_content_key(action) for action in actions]
+        counts: Dict[Hashable, int] = {}
+        for key in keys:
+            if key is not None:
+                counts[key] = counts.get(key, 0) + 1
+        if all(count == 1 for count in counts.values()):
+            return base.embed(actions, self._encoder, namespace)
+
+        shared: Dict[Hashable, base.Featurized] = {}
+        result = []
+        for action, key in zip(actions, keys):
+            if key is None or counts[key] == 1:
+                result.append(base.embed([action], self._encoder, namespace)[0])
+                continue
+            featurized = shared.get(key)
+            if featurized is None:
+                featurized = base.embed([action], self._encoder, namespace)[0]
+                featurized.cache_rendering = True
+                VwTxt.featurized_2_str(featurized)
+                shared[key] = featurized
+            result.append(featurized.copy())
+        return result
+
     def featurize(
         self, event: PickBestEvent
     ) -> Tuple[base.Featurized, List[base.Featurized], PickBestSelected]:
         context, actions = self.get_context_and_actions(event)
 
         if self.auto_embed:
-            self._dotproducts(context, actions)
+            to_select_from = next(iter(event.to_select_from.values()), None)
+            self._dotproducts(
+                context,
+                actions,
+                [action.embeddings for action in to_select_from]
+                if _is_catalog_selection(to_select_from)
+                else None,
+            )
             PickBestFeaturizer._generic_namespaces(context, actions)
 
         return context, actions, event.selected
@@ -222,10 +418,54 @@ class PickBest(base.RLLoop[PickBestEvent]):
 
     Attributes:
         featurizer (PickBestFeaturizer, optional): Is an advanced attribute. Responsible for embedding the `BasedOn` and `ToSelectFrom` inputs. If omitted, a default embedder is utilized.
+        candidate_selector (AnnCandidateSelector, optional): Pre-selects the actions sent to the policy, e.g. the nearest neighbors of the context among the actions of a large `ActionCatalog`. The positions of the candidates in the `ToSelectFrom` input are stored in `event.candidate_indices`.
+        dedupe_actions (bool): If set, identical actions are collapsed into one before prediction. The selected probability is then the probability of the picked payload, `event.candidate_indices` holds the position of the first occurrence of every remaining action in the `ToSelectFrom` input, and `event.duplicate_indices` the positions of all of its occurrences. Default is False.
     """
 
+    def __init__(
+        self,
+        *args: Any,
+        candidate_selector: Optional[Any] = None,
+        dedupe_actions: bool = False,
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        self.candidate_selector = candidate_selector
+        self.dedupe_actions = dedupe_actions
+
     def _call_before_predict(self, inputs: Dict[str, Any]) -> PickBestEvent:
-        return PickBestEvent(inputs=inputs)
+        event = PickBestEvent(inputs=inputs)
+        if self.candidate_selector is not None:
+            with time_stage(self.latencies, "candidates"):
+                self.candidate_selector.select(event)
+        if self.dedupe_actions:
+            PickBest._dedupe_actions(event)
+        return event
+
+    @staticmethod
+    def _dedupe_actions(event: PickBestEvent) -> None:
+        name, actions = next(iter(event.to_select_from.items()))
+        groups: Dict[Hashable, List[int]] = {}
+        unique: List[List[int]] = []
+        for i, action in enumerate(actions):
+            key = _content_key(action)
+            group = groups.get(key) if key is not None else None
+            if group is None:
+                group = [i]
+                unique.append(group)
+                if key is not None:
+                    groups[key] = group
+            else:
+                group.append(i)
+        if len(unique) == len(actions):
+            return
+        event.to_select_from[name] = [actions[group[0]] for group in unique]
+        # positions in the `ToSelectFrom` input, through the candidates pre-selection if any
+        positions = event.candidate_indices
+        if positions is not None:
+            unique = [[positions[i] for i in group] for group in unique]
+        event.candidate_indices = [group[0] for group in unique]
+        event.duplicate_indices = unique
 
     def _call_after_predict_before_scoring(
         self,
@@ -246,14 +486,19 @@ class PickBest(base.RLLoop[PickBestEvent]):
             index=sampled_action, probability=sampled_prob
         )
 
-        next_inputs = inputs.copy()
-
         picked = {}
         for k, v in event.to_select_from.items():
             picked[k] = v[event.selected.index]
 
-        next_inputs[self.selected_based_on_input_key] = str(event.based_on)
-        next_inputs[self.selected_input_key] = str(picked)
+        # only rendered if a scorer or a callback reads them
+        based_on = event.based_on
+        next_inputs = base._LazyInputs(
+            inputs,
+            {
+                self.selected_based_on_input_key: lambda: str(based_on),
+                self.selected_input_key: lambda: str(_rendered_picked(picked)),
+            },
+        )
 
         return next_inputs, picked, event
 
@@ -283,6 +528,8 @@ class PickBest(base.RLLoop[PickBestEvent]):
             "model_save_dir": kwargs.pop("model_save_dir", None),
             "reset_model": kwargs.pop("reset_model", None),
             "rl_logs": kwargs.pop("rl_logs", None),
+            "model_backend": kwargs.pop("model_backend", None),
+            "model_repo": kwargs.pop("model_repo", None),
         }
 
         if policy and any(policy_args.values()):
@@ -309,6 +556,8 @@ class PickBest(base.RLLoop[PickBestEvent]):
         model_save_dir: str = "./",
         reset_model: bool = False,
         rl_logs: Optional[Union[str, os.PathLike]] = None,
+        model_backend: Optional[base.ModelBackend] = None,
+        model_repo: Optional[base.ModelRepository] = None,
     ):
         featurizer = featurizer or PickBestFeaturizer(auto_embed=False)
         formatter = formatter or vw_cb_formatter
@@ -334,8 +583,12 @@ class PickBest(base.RLLoop[PickBestEvent]):
         vw_cmd = interactions + vw_cmd
 
         return base.VwPolicy(
-            model_repo=base.ModelRepository(
-                model_save_dir, with_history=True, reset=reset_model
+            model_repo=model_repo
+            or base.ModelRepository(
+                model_save_dir,
+                with_history=True,
+                reset=reset_model,
+                backend=model_backend,
             ),
             vw_cmd=vw_cmd,
             featurizer=featurizer,
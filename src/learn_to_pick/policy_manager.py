@@ -0,0 +1,186 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Union
+
+from learn_to_pick import base
+
+logger = logging.getLogger(__name__)
+
+# keys name subfolders of the root folder, so "." and ".." are not valid keys
+_VALID_KEY = re.compile(r"^(?!\.+$)[A-Za-z0-9_.\-]+$")
+
+
+def _default_size_estimator(policy: base.Policy) -> int:
+    workspace = getattr(policy, "workspace", None)
+    return len(workspace.serialize()) if workspace is not None else 0
+
+
+class PolicyCacheMetrics:
+    def __init__(self):
+        self.hits: int = 0
+        self.misses: int = 0
+        self.loads: int = 0
+        self.evictions: int = 0
+        self.checkpoints: int = 0
+        self.load_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0
+
+    @property
+    def avg_load_latency(self) -> float:
+        return self.load_seconds / self.loads if self.loads > 0 else 0
+
+
+class _CachedPolicy:
+    def __init__(self, policy: base.Policy, size: int):
+        self.policy = policy
+        self.size = size
+        self.dirty = False
+
+
+class PolicyManager(base.Policy):
+    """
+    Policy that routes every event to a per-key policy, e.g. one model per customer segment.
+
+    Policies are created lazily with `create_policy(model_save_dir=<model_save_dir>/<key>, **policy_kwargs)`
+    (`PickBest.create_policy` by default), so each key has its own `ModelRepository` subfolder.
+    At most `max_policies` policies, or `max_bytes` of estimated model size, are kept in memory.
+    The least recently used policies are evicted, and saved first if they learned anything since
+    their last checkpoint.
+
+    Attributes:
+        key_fn (Callable[[Event], str]): Returns the routing key of an event.
+        model_save_dir (str): Root folder, one subfolder per key.
+        max_policies (int): Maximum number of resident policies. Default is -1 (unbounded).
+        max_bytes (int): Maximum estimated size of resident policies. Default is -1 (unbounded).
+            The size of a policy is measured when it is loaded and when `save()` checkpoints it,
+            so policies that keep learning may grow beyond their measured size until the next `save()`.
+        size_estimator (Callable[[Policy], int], optional): Estimates the memory footprint of a
+            policy. Defaults to the size of the serialized VW model.
+        metrics (PolicyCacheMetrics): hits, misses, evictions, checkpoints and load latency.
+    """
+
+    def __init__(
+        self,
+        key_fn: Callable[[base.Event], str],
+        model_save_dir: Union[str, os.PathLike] = "./",
+        max_policies: int = -1,
+        max_bytes: int = -1,
+        create_policy: Optional[Callable[..., base.Policy]] = None,
+        size_estimator: Optional[Callable[[base.Policy], int]] = None,
+        **policy_kwargs: Any,
+    ):
+        super().__init__()
+        if create_policy is None:
+            from learn_to_pick.pick_best import PickBest
+
+            create_policy = PickBest.create_policy
+
+        self.key_fn = key_fn
+        self.model_save_dir = Path(model_save_dir)
+        self.max_policies = max_policies
+        self.max_bytes = max_bytes
+        self.create_policy = create_policy
+        self.size_estimator = size_estimator or _default_size_estimator
+        self.policy_kwargs = policy_kwargs
+        self.metrics = PolicyCacheMetrics()
+        self.resident_bytes: int = 0
+        self._policies: "OrderedDict[str, _CachedPolicy]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def resident_keys(self) -> List[str]:
+        """Keys of the policies currently in memory, least recently used first."""
+        with self._lock:
+            return list(self._policies.keys())
+
+    def _get(self, key: str, record: bool = False) -> _CachedPolicy:
+        # hits and misses are only recorded for predictions, learning and logging of the
+        # same event would otherwise always count as hits
+        with self._lock:
+            cached = self._policies.get(key)
+            if record:
+                if cached is not None:
+                    self.metrics.hits += 1
+                else:
+                    self.metrics.misses += 1
+            if cached is not None:
+                self._policies.move_to_end(key)
+                return cached
+
+            if not _VALID_KEY.match(key):
+                raise ValueError(
+                    f"Policy key {key!r} can only contain letters, digits, '_', '-' and '.', and not only '.'"
+                )
+            self.metrics.loads += 1
+            start = time.perf_counter()
+            policy = self.create_policy(
+                model_save_dir=str(self.model_save_dir / key), **self.policy_kwargs
+            )
+            cached = _CachedPolicy(policy, self.size_estimator(policy))
+            self.metrics.load_seconds += time.perf_counter() - start
+            self._policies[key] = cached
+            self.resident_bytes += cached.size
+            self._evict()
+            return cached
+
+    def _over_capacity(self) -> bool:
+        return (self.max_policies > 0 and len(self._policies) > self.max_policies) or (
+            self.max_bytes > 0 and self.resident_bytes > self.max_bytes
+        )
+
+    def _evict(self) -> None:
+        # the most recently used policy always stays resident
+        while len(self._policies) > 1 and self._over_capacity():
+            key, cached = self._policies.popitem(last=False)
+            self.resident_bytes -= cached.size
+            self.metrics.evictions += 1
+            if cached.dirty:
+                self._checkpoint(key, cached)
+            logger.debug(f"evicted policy {key}")
+
+    def _checkpoint(self, key: str, cached: _CachedPolicy) -> None:
+        cached.policy.save()
+        cached.dirty = False
+        self.metrics.checkpoints += 1
+        logger.debug(f"checkpointed policy {key}")
+
+    def policy_for(self, event: base.Event) -> base.Policy:
+        return self._get(self.key_fn(event)).policy
+
+    # a policy is used under the lock, so that it cannot be evicted, and saved or dropped as
+    # clean, by another thread while it predicts or learns
+
+    def predict(self, event: base.Event) -> Any:
+        key = self.key_fn(event)
+        with self._lock:
+            return self._get(key, record=True).policy.predict(event=event)
+
+    def learn(self, event: base.Event) -> None:
+        key = self.key_fn(event)
+        with self._lock:
+            cached = self._get(key)
+            cached.policy.learn(event=event)
+            # events without a score do not change the model
+            if getattr(event.selected, "score", None) is not None:
+                cached.dirty = True
+
+    def log(self, event: base.Event) -> None:
+        self.policy_for(event).log(event=event)
+
+    def save(self) -> None:
+        with self._lock:
+            for key, cached in self._policies.items():
+                if cached.dirty:
+                    self._checkpoint(key, cached)
+                    size = self.size_estimator(cached.policy)
+                    self.resident_bytes += size - cached.size
+                    cached.size = size
+            self._evict()
@@ -0,0 +1,184 @@
+"""
+Offline replay of `VwLogger` logs into a VW policy.
+
+Usage from the command line:
+
+    python -m learn_to_pick.replay rl_logs.txt --model-save-dir ./model --vw-cmd "--cb_explore_adf --squarecb --quiet"
+"""
+import argparse
+import logging
+import os
+import queue
+import shlex
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Union
+
+from learn_to_pick import base
+from learn_to_pick.vw_logger import parse_cb_label, read_vw_log_chunks
+
+logger = logging.getLogger(__name__)
+
+LogPaths = Union[str, os.PathLike, Iterable[Union[str, os.PathLike]]]
+
+_END_OF_LOG = object()
+
+
+class ReplayStats:
+    def __init__(self):
+        self.examples: int = 0
+        self.skipped: int = 0
+        self.seconds: float = 0.0
+
+    @property
+    def examples_per_second(self) -> float:
+        return self.examples / self.seconds if self.seconds > 0 else 0
+
+    def __repr__(self) -> str:
+        return (
+            f"ReplayStats(examples={self.examples}, skipped={self.skipped}, "
+            f"seconds={self.seconds:.3f}, examples_per_second={self.examples_per_second:.1f})"
+        )
+
+
+def _labeled_chunks(
+    logs: LogPaths, chunk_size: int, skip_unlabeled: bool, stats: ReplayStats
+) -> Iterator[List[str]]:
+    for chunk in read_vw_log_chunks(logs, chunk_size):
+        if skip_unlabeled:
+            labeled = [ex for ex in chunk if parse_cb_label(ex) is not None]
+            stats.skipped += len(chunk) - len(labeled)
+            chunk = labeled
+        if chunk:
+            yield chunk
+
+
+def _in_background(chunks: Iterator[List[str]], max_chunks: int) -> Iterator[List[str]]:
+    """Produces the chunks on a worker thread, so that reading and parsing the log overlaps learning."""
+    pending: "queue.Queue[Any]" = queue.Queue(maxsize=max_chunks)
+
+    def produce() -> None:
+        try:
+            for chunk in chunks:
+                pending.put(chunk)
+            pending.put(_END_OF_LOG)
+        except BaseException as e:
+            pending.put(e)
+
+    worker = threading.Thread(target=produce, name="learn_to_pick-replay", daemon=True)
+    worker.start()
+    while True:
+        item = pending.get()
+        if item is _END_OF_LOG:
+            break
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+    worker.join()
+
+
+def replay(
+    logs: LogPaths,
+    policy: base.VwPolicy,
+    chunk_size: int = 1000,
+    background_parsing: bool = True,
+    skip_unlabeled: bool = True,
+    save: bool = True,
+    on_progress: Optional[Callable[[ReplayStats], None]] = None,
+) -> ReplayStats:
+    """
+    Learns every example of a `VwLogger` log into the workspace of `policy`.
+
+    The log is streamed in chunks of `chunk_size` examples, rotated and compressed segments
+    included (see `learn_to_pick.vw_logger.read_vw_log`). With `background_parsing`, reading,
+    decompressing and splitting the log happen on a worker thread while VW learns.
+
+    Attributes:
+        logs: A log path (rotated segments are picked up) or an explicit list of log files.
+        policy (VwPolicy): Policy to train, typically built by `PickBest.create_policy`.
+        skip_unlabeled (bool): Skip examples that were logged without a score, since they
+            do not update the model. Default is True.
+        save (bool): Save the trained model through the policy's `ModelRepository`. Default is True.
+        on_progress (Callable[[ReplayStats], None], optional): Called after every chunk.
+    Returns:
+        ReplayStats: number of learned and skipped examples, and throughput.
+    """
+    import vowpal_wabbit_next as vw
+
+    stats = ReplayStats()
+    chunks = _labeled_chunks(logs, chunk_size, skip_unlabeled, stats)
+    if background_parsing:
+        chunks = _in_background(chunks, max_chunks=4)
+
+    parser = vw.TextFormatParser(policy.workspace)
+    start = time.perf_counter()
+    for chunk in chunks:
+        for vw_ex in chunk:
+            policy.workspace.learn_one(base._parse_lines(parser, vw_ex))
+        stats.examples += len(chunk)
+        stats.seconds = time.perf_counter() - start
+        if on_progress:
+            on_progress(stats)
+    stats.seconds = time.perf_counter() - start
+
+    logger.info(f"replayed {stats}")
+    if save:
+        policy.save()
+    return stats
+
+
+class _NoEncoder:
+    def encode(self, to_encode: Any) -> Any:
+        raise RuntimeError("Logged examples are already featurized")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from learn_to_pick.pick_best import PickBest, PickBestFeaturizer
+
+    parser = argparse.ArgumentParser(
+        prog="python -m learn_to_pick.replay",
+        description="Learn a VW model from learn_to_pick logs (rl_logs).",
+    )
+    parser.add_argument(
+        "logs",
+        nargs="+",
+        help="log file(s), rotated segments of a single log are picked up",
+    )
+    parser.add_argument("--model-save-dir", default="./")
+    parser.add_argument(
+        "--vw-cmd", default=None, help="VW arguments, must include --cb_explore_adf"
+    )
+    parser.add_argument(
+        "--auto-embed",
+        action="store_true",
+        help="logs were written with auto_embed=True",
+    )
+    parser.add_argument(
+        "--reset-model",
+        action="store_true",
+        help="start from scratch instead of latest.vw",
+    )
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--no-background-parsing", action="store_true")
+    args = parser.parse_args(argv)
+
+    policy = PickBest.create_policy(
+        featurizer=PickBestFeaturizer(auto_embed=args.auto_embed, model=_NoEncoder()),
+        vw_cmd=shlex.split(args.vw_cmd) if args.vw_cmd else None,
+        model_save_dir=args.model_save_dir,
+        reset_model=args.reset_model,
+    )
+    stats = replay(
+        args.logs[0] if len(args.logs) == 1 else args.logs,
+        policy,
+        chunk_size=args.chunk_size,
+        background_parsing=not args.no_background_parsing,
+        on_progress=lambda s: logger.info(
+            f"{s.examples} examples, {s.examples_per_second:.1f} examples/s"
+        ),
+    )
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
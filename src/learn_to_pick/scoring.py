@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import string
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, List, Mapping, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class ScoreCache:
+    """
+    LRU cache of scores keyed by the fully formatted scoring prompt.
+
+    Attributes:
+        max_size (int): Maximum number of cached scores. Default is 10000, -1 means unbounded.
+        ttl (float): Seconds a score stays valid. Default is -1 (forever).
+        path (str, optional): If set, the cache is loaded from this json file, and written to it by `save()`.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl: float = -1,
+        path: Optional[Union[str, os.PathLike]] = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        # prompt -> (score, time it was stored)
+        self._entries: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - stored_at > self.ttl
+
+    def get(self, prompt: str) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get(prompt)
+            if entry is not None and self._expired(entry[1], time.time()):
+                del self._entries[prompt]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(prompt)
+            return entry[0]
+
+    def put(self, prompt: str, score: float) -> None:
+        with self._lock:
+            self._entries[prompt] = (score, time.time())
+            self._entries.move_to_end(prompt)
+            while self.max_size > 0 and len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        now = time.time()
+        with self._lock:
+            for prompt, score, stored_at in entries:
+                if not self._expired(stored_at, now):
+                    self._entries[prompt] = (score, stored_at)
+        logger.info(f"loaded {len(self._entries)} cached scores from: {self.path}")
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[p, s, t] for p, (s, t) in self._entries.items()]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+
+class CompiledPrompt:
+    """
+    A `str.format` template parsed once into literal chunks and placeholders.
+
+    `format(inputs)` only reads the inputs that have a placeholder, and ignores the others.
+    """
+
+    _formatter = string.Formatter()
+
+    def __init__(self, template: str):
+        self.template = template
+        # (literal text, field name, conversion, format spec), the field name is None after the last literal
+        self.chunks: List[Tuple[str, Optional[str], Optional[str], str]] = []
+        self.placeholders: List[str] = []
+        # positional or nested fields are left to str.format
+        self.simple = True
+        for literal, field_name, format_spec, conversion in self._formatter.parse(
+            template
+        ):
+            self.chunks.append((literal, field_name, conversion, format_spec or ""))
+            if field_name is None:
+                continue
+            name = field_name.partition(".")[0].partition("[")[0]
+            if not name or name.isdigit() or "{" in (format_spec or ""):
+                self.simple = False
+            if name and not name.isdigit() and name not in self.placeholders:
+                self.placeholders.append(name)
+
+    def format(self, inputs: Mapping[str, Any]) -> str:
+        if not self.simple:
+            return self.template.format_map(inputs)
+        parts = []
+        for literal, field_name, conversion, format_spec in self.chunks:
+            parts.append(literal)
+            if field_name is None:
+                continue
+            if field_name.isidentifier():
+                value = inputs[field_name]
+            else:
+                value, _ = self._formatter.get_field(field_name, (), inputs)
+            if conversion:
+                value = self._formatter.convert_field(value, conversion)
+            parts.append(format(value, format_spec))
+        return "".join(parts)
+
+
+class ScoringStats:
+    """Counters of the selection scorer calls made by an `RLLoop`."""
+
+    def __init__(self):
+        self.scored: int = 0
+        self.failures: int = 0
+        self.timeouts: int = 0
+        self.short_circuits: int = 0
+        self.fallbacks: int = 0
+        self.sampled_out: int = 0
+        self.in_flight: int = 0
+        self._lock = threading.Lock()
+
+    def increment(self, counter: str) -> None:
+        # counters are updated by the scoring threads and the caller of run() at the same time
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def try_start(self, max_in_flight: int) -> bool:
+        with self._lock:
+            if 0 < max_in_flight <= self.in_flight:
+                return False
+            self.in_flight += 1
+            return True
+
+    def on_done(self, _: object = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+class ScoringCircuitBreaker:
+    """
+    Stops scoring while the scorer is unhealthy.
+
+    After `failure_threshold` consecutive failures (errors or timeouts) the breaker opens and scoring
+    is skipped. After `reset_timeout` seconds a single trial call is let through: the breaker closes
+    if it succeeds and opens again if it fails. Time is read from `clock`, `time.monotonic` by default.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = ScoringCircuitBreaker.CLOSED
+        self.consecutive_failures: int = 0
+        self.opened_at: float = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == ScoringCircuitBreaker.CLOSED:
+                return True
+            if (
+                self.state == ScoringCircuitBreaker.OPEN
+                and self.clock() - self.opened_at >= self.reset_timeout
+            ):
+                self.state = ScoringCircuitBreaker.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self.state = ScoringCircuitBreaker.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if (
+                self.state == ScoringCircuitBreaker.HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state != ScoringCircuitBreaker.OPEN:
+                    logger.warning("selection scoring is failing, pausing it")
+                self.state = ScoringCircuitBreaker.OPEN
+                self.opened_at = self.clock()
+
+
+class TokenBucket:
+    """
+    Allows at most `rate` operations per second on average, and bursts of up to `capacity` operations.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float, optional): Maximum number of tokens, defaults to `max(1, rate)`.
+        clock (Callable[[], float]): Current time in seconds. Default is `time.monotonic`.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def try_take(self) -> bool:
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
@@ -0,0 +1,287 @@
+"""
+Simulated contextual bandit environments, to measure how fast pickers learn and at what compute cost.
+
+    env = Environment(contexts={"user": ["Tom", "Anna"], "time_of_day": ["morning", "afternoon"]},
+                      actions=["politics", "sports", "music", "food"])
+    results = compare(
+        {
+            "squarecb": lambda env: PickBest.create(selection_scorer=env.scorer(), featurizer=..., vw_cmd=[...]),
+            "random": lambda env: PickBest.create(selection_scorer=env.scorer(), policy=PickBestRandomPolicy()),
+        },
+        env,
+        steps=5000,
+    )
+"""
+import copy
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from learn_to_pick import base
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+Context = Dict[str, str]
+
+
+class Environment:
+    """
+    Synthetic users and actions with a hidden expected reward per (context, action).
+
+    Every combination of context feature values prefers one action, whose expected reward is 1,
+    while the other actions get a random expected reward below `base_reward`. Observed rewards add
+    gaussian noise to the expected reward.
+
+    Attributes:
+        contexts (Dict[str, List[str]]): Context features and their values, e.g. {"user": ["Tom", "Anna"]}.
+            Contexts are drawn uniformly.
+        actions (List[str]): The actions to pick from.
+        action_key (str): Name of the `ToSelectFrom` input. Default is "action".
+        reward_fn (Callable[[Context, str], float], optional): Expected reward of an action in a context,
+            replaces the random preferences.
+        base_reward (float): Upper bound of the expected reward of non preferred actions. Default is 0.3.
+        noise (float): Standard deviation of the reward noise. Default is 0.1.
+        drift_every (int): Every `drift_every` decisions, the preferences of a `drift_fraction` of the
+            contexts are drawn again. Default is -1 (no drift).
+        drift_fraction (float): Fraction of the contexts whose preferences drift. Default is 0.5.
+        seed (int): Seed of the preferences, contexts and noise. The noise is drawn from its own random
+            generator, so that the contexts and the drift do not depend on how many rewards were observed.
+    """
+
+    def __init__(
+        self,
+        contexts: Dict[str, List[str]],
+        actions: List[str],
+        action_key: str = "action",
+        reward_fn: Optional[Callable[[Context, str], float]] = None,
+        base_reward: float = 0.3,
+        noise: float = 0.1,
+        drift_every: int = -1,
+        drift_fraction: float = 0.5,
+        seed: int = 0,
+    ):
+        self.contexts = contexts
+        self.actions = actions
+        self.action_key = action_key
+        self.reward_fn = reward_fn
+        self.base_reward = base_reward
+        self.noise = noise
+        self.drift_every = drift_every
+        self.drift_fraction = drift_fraction
+        # preferences, contexts and drift
+        self.rng = random.Random(seed)
+        # reward noise, drawn by the scoring threads of async pickers too
+        self.noise_rng = random.Random(f"noise-{seed}")
+        self._noise_lock = threading.Lock()
+        self.decisions = 0
+        self.preferences: Dict[Tuple[str, ...], Dict[str, float]] = {
+            values: self._draw_preferences()
+            for values in itertools.product(*contexts.values())
+        }
+
+    @staticmethod
+    def random(
+        n_features: int = 2,
+        n_values: int = 4,
+        n_actions: int = 10,
+        **kwargs: Any,
+    ) -> "Environment":
+        """An environment with `n_features` context features of `n_values` values each, and `n_actions` actions."""
+        return Environment(
+            contexts={
+                f"feature{f}": [f"value{f}_{v}" for v in range(n_values)]
+                for f in range(n_features)
+            },
+            actions=[f"action{a}" for a in range(n_actions)],
+            **kwargs,
+        )
+
+    def _draw_preferences(self) -> Dict[str, float]:
+        preferred = self.rng.choice(self.actions)
+        return {
+            action: 1.0
+            if action == preferred
+            else self.rng.uniform(0, self.base_reward)
+            for action in self.actions
+        }
+
+    def _key(self, context: Context) -> Tuple[str, ...]:
+        return tuple(context[feature] for feature in self.contexts)
+
+    def sample_context(self) -> Context:
+        return {
+            feature: self.rng.choice(values)
+            for feature, values in self.contexts.items()
+        }
+
+    def expected_reward(self, context: Context, action: str) -> float:
+        if self.reward_fn is not None:
+            return self.reward_fn(context, action)
+        return self.preferences[self._key(context)][action]
+
+    def best_reward(self, context: Context) -> float:
+        return max(self.expected_reward(context, action) for action in self.actions)
+
+    def reward(self, context: Context, action: str) -> float:
+        with self._noise_lock:
+            noise = self.noise_rng.gauss(0, self.noise)
+        return self.expected_reward(context, action) + noise
+
+    def inputs(self, context: Context) -> Dict[str, Any]:
+        inputs: Dict[str, Any] = {k: base.BasedOn(v) for k, v in context.items()}
+        inputs[self.action_key] = base.ToSelectFrom(self.actions)
+        return inputs
+
+    def step(self) -> None:
+        """Called once per decision, makes the preferences drift."""
+        self.decisions += 1
+        if self.drift_every > 0 and self.decisions % self.drift_every == 0:
+            keys = list(self.preferences)
+            for key in self.rng.sample(keys, int(len(keys) * self.drift_fraction)):
+                self.preferences[key] = self._draw_preferences()
+
+    def scorer(self) -> "EnvironmentScorer":
+        return EnvironmentScorer(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "Environment":
+        copied = copy.copy(self)
+        memo[id(self)] = copied
+        for name, value in self.__dict__.items():
+            if name != "_noise_lock":
+                setattr(copied, name, copy.deepcopy(value, memo))
+        copied._noise_lock = threading.Lock()
+        return copied
+
+
+class EnvironmentScorer(base.SelectionScorer[base.Event]):
+    """Scores selections with the (noisy) reward of the environment."""
+
+    def __init__(self, environment: Environment):
+        self.environment = environment
+
+    def score_response(self, inputs: Dict[str, Any], picked: Any, event: Any) -> float:
+        return self.environment.reward(
+            dict(event.based_on), picked[self.environment.action_key]
+        )
+
+
+class SimulationResult(NamedTuple):
+    """
+    Attributes:
+        steps (int): Number of decisions.
+        average_reward (float): Average expected reward of the picked actions.
+        regret (float): Sum over the decisions of the best expected reward minus the expected reward of the picked action.
+        wall_seconds (float): Duration of the simulation.
+        cpu_seconds (float): CPU time of the process during the simulation, all threads included.
+        decisions_per_second (float): Decisions per wall clock second.
+        curve (pd.DataFrame): Average reward and cumulative regret every `report_every` decisions.
+        metrics (pd.DataFrame): History of the picker's metrics tracker.
+    """
+
+    steps: int
+    average_reward: float
+    regret: float
+    wall_seconds: float
+    cpu_seconds: float
+    decisions_per_second: float
+    curve: "pd.DataFrame"
+    metrics: "pd.DataFrame"
+
+    @property
+    def reward_per_cpu_second(self) -> float:
+        """Total expected reward per CPU second, i.e. learning quality per compute."""
+        return (
+            self.average_reward * self.steps / self.cpu_seconds
+            if self.cpu_seconds > 0
+            else 0.0
+        )
+
+
+def simulate(
+    picker: base.RLLoop,
+    environment: Environment,
+    steps: int,
+    report_every: int = 100,
+) -> SimulationResult:
+    """
+    Runs `picker` on `steps` contexts of `environment`. The picker should be created with
+    `selection_scorer=environment.scorer()`.
+    """
+    import pandas as pd
+
+    reward_sum = 0.0
+    regret = 0.0
+    curve = []
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for step in range(1, steps + 1):
+        context = environment.sample_context()
+        response = picker.run(environment.inputs(context))
+        action = response["picked"][environment.action_key]
+        expected = environment.expected_reward(context, action)
+        reward_sum += expected
+        regret += environment.best_reward(context) - expected
+        environment.step()
+        if step % report_every == 0 or step == steps:
+            curve.append(
+                {"step": step, "average_reward": reward_sum / step, "regret": regret}
+            )
+    picker.wait_for_pending_scores()
+    wall_seconds = time.perf_counter() - wall_start
+    cpu_seconds = time.process_time() - cpu_start
+
+    return SimulationResult(
+        steps=steps,
+        average_reward=reward_sum / steps if steps else 0.0,
+        regret=regret,
+        wall_seconds=wall_seconds,
+        cpu_seconds=cpu_seconds,
+        decisions_per_second=steps / wall_seconds if wall_seconds > 0 else 0.0,
+        curve=pd.DataFrame(curve),
+        metrics=picker.metrics.to_pandas() if picker.metrics else pd.DataFrame(),
+    )
+
+
+def compare(
+    pickers: Dict[str, Callable[[Environment], base.RLLoop]],
+    environment: Environment,
+    steps: int,
+    report_every: int = 100,
+) -> "pd.DataFrame":
+    """
+    Simulates every picker on its own copy of `environment`, with its own copy of the random generators,
+    so that they all see the same contexts and drift whether or not their scoring is sampled, fails
+    or is asynchronous, and returns one row of results per picker.
+    """
+    import pandas as pd
+
+    rows = {}
+    for name, make_picker in pickers.items():
+        env = copy.deepcopy(environment)
+        result = simulate(make_picker(env), env, steps, report_every=report_every)
+        logger.info(
+            f"{name}: average reward {result.average_reward:.3f}, {result.decisions_per_second:.1f} decisions/s"
+        )
+        rows[name] = {
+            "average_reward": result.average_reward,
+            "regret": result.regret,
+            "decisions_per_second": result.decisions_per_second,
+            "cpu_seconds": result.cpu_seconds,
+            "reward_per_cpu_second": result.reward_per_cpu_second,
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
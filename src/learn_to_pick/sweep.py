@@ -0,0 +1,165 @@
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from learn_to_pick.evaluation import LogPaths, estimate, score_examples
+from learn_to_pick.model_repository import ModelRepository
+from learn_to_pick.vw_logger import parse_cb_label, read_vw_log
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+LabeledExample = Tuple[str, Tuple[int, float, float]]
+
+# examples shared by the sweep workers, set once per worker process
+_examples: List[LabeledExample] = []
+
+
+class SweepResult(NamedTuple):
+    """
+    Attributes:
+        table (pd.DataFrame): One row per `vw_cmd` variant, best first.
+        best_vw_cmd (List[str]): The best variant.
+    """
+
+    table: "pd.DataFrame"
+    best_vw_cmd: List[str]
+
+
+def expand_grid(
+    base_cmd: List[str], options: Dict[str, List[List[str]]]
+) -> List[List[str]]:
+    """
+    Returns every combination of `options` appended to `base_cmd`.
+
+    Each option maps a name to its alternatives, every alternative being a list of VW arguments, e.g.
+    `{"exploration": [["--squarecb"], ["--epsilon=0.1"]], "learning_rate": [["-l", "0.1"], ["-l", "0.5"]]}`
+    """
+    return [
+        base_cmd + list(itertools.chain.from_iterable(combination))
+        for combination in itertools.product(*options.values())
+    ]
+
+
+def _init_worker(examples: List[LabeledExample]) -> None:
+    global _examples
+    _examples = examples
+
+
+def _run_variant(
+    vw_cmd: List[str], reward_model_cmd: Optional[List[str]], confidence: float
+) -> Tuple[Dict[str, Any], bytes]:
+    import numpy as np
+    import vowpal_wabbit_next as vw
+
+    start = time.perf_counter()
+    workspace = vw.Workspace(vw_cmd)
+    columns = score_examples(
+        [_examples], workspace, learn=True, reward_model_cmd=reward_model_cmd
+    )
+    result = estimate(
+        logged_probability=columns["logged_probability"],
+        score=columns["score"],
+        target_probability=columns["target_probability"],
+        score_hat_logged=columns["score_hat_logged"],
+        score_hat_target=columns["score_hat_target"],
+        confidence=confidence,
+    )
+    # progressive validation loss: ips estimate of the cost of the greedy action, before learning
+    pv_loss = float(
+        np.mean(-columns["score"] * columns["greedy"] / columns["logged_probability"])
+    )
+    row = {
+        "vw_cmd": " ".join(vw_cmd),
+        "pv_loss": pv_loss,
+        "ips": result.ips.value,
+        "snips": result.snips.value,
+        "snips_lower": result.snips.lower,
+        "snips_upper": result.snips.upper,
+        "dr": result.dr.value,
+        "dr_lower": result.dr.lower,
+        "dr_upper": result.dr.upper,
+        "seconds": time.perf_counter() - start,
+    }
+    return row, workspace.serialize()
+
+
+def sweep(
+    logs: LogPaths,
+    vw_cmds: List[List[str]],
+    model_save_dir: Optional[Union[str, os.PathLike]] = None,
+    processes: Optional[int] = None,
+    rank_by: str = "dr",
+    reward_model_cmd: Optional[List[str]] = None,
+    confidence: float = 0.95,
+) -> SweepResult:
+    """
+    Replays the same logs into one workspace per `vw_cmd` variant and ranks the variants.
+
+    The logs are read once, in this process, and shared with a pool of worker processes that each
+    learn a variant progressively. Variants are scored by progressive validation loss and by
+    off-policy estimates of their average score (see `learn_to_pick.evaluation`).
+
+    Attributes:
+        logs: A log path (rotated segments are picked up) or an explicit list of log files.
+        vw_cmds (List[List[str]]): The variants, see `expand_grid`. Each must include --cb_explore_adf.
+        model_save_dir (str, optional): If set, the best model is saved there through `ModelRepository`.
+        processes (int, optional): Size of the process pool, defaults to the number of CPUs.
+            With 1, variants are run in this process.
+        rank_by (str): Column the variants are ranked by: "dr", "snips", "ips" (higher is better)
+            or "pv_loss" (lower is better). Default is "dr".
+        reward_model_cmd (List[str], optional): VW arguments of the doubly robust score regressor.
+        confidence (float): Confidence level of the intervals. Default is 0.95.
+    """
+    import pandas as pd
+    import vowpal_wabbit_next as vw
+
+    if not vw_cmds:
+        raise ValueError("At least one vw_cmd variant is needed")
+    for vw_cmd in vw_cmds:
+        if "--cb_explore_adf" not in vw_cmd:
+            raise ValueError(f"vw_cmd {vw_cmd} must include --cb_explore_adf")
+
+    examples = [
+        (ex, label)
+        for ex in read_vw_log(logs)
+        for label in [parse_cb_label(ex)]
+        if label
+    ]
+    if not examples:
+        raise ValueError("No scored events found in the logs")
+    logger.info(f"sweeping {len(vw_cmds)} variants over {len(examples)} events")
+
+    if processes == 1:
+        _init_worker(examples)
+        results = [_run_variant(c, reward_model_cmd, confidence) for c in vw_cmds]
+        _init_worker([])
+    else:
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=_init_worker, initargs=(examples,)
+        ) as pool:
+            results = list(
+                pool.map(
+                    _run_variant,
+                    vw_cmds,
+                    itertools.repeat(reward_model_cmd),
+                    itertools.repeat(confidence),
+                )
+            )
+
+    table = pd.DataFrame([row for row, _ in results])
+    table["model"] = range(len(results))
+    table = table.sort_values(rank_by, ascending=rank_by == "pv_loss")
+    best = int(table["model"].iloc[0])
+    table = table.drop(columns="model").reset_index(drop=True)
+
+    if model_save_dir is not None:
+        ModelRepository(model_save_dir).save(
+            vw.Workspace(vw_cmds[best], model_data=results[best][1])
+        )
+    return SweepResult(table=table, best_vw_cmd=vw_cmds[best])
@@ -1,6 +1,14 @@
+import bz2
+import glob
+import gzip
+import lzma
+import re
 from os import PathLike
 from pathlib import Path
-from typing import Optional, Union
+from typing import IO, Iterable, Iterator, List, Optional, Tuple, Union
+
+_COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+_LABEL = re.compile(r"^(\d+):([^:\s]+):([^:\s]+)$")
 
 
 class VwLogger:
@@ -16,3 +24,83 @@ class VwLogger:
 
     def logging_enabled(self) -> bool:
         return bool(self.path)
+
+
+def _open_log(path: Union[str, PathLike]) -> IO[str]:
+    opener = _COMPRESSED_OPENERS.get(Path(path).suffix, open)
+    return opener(path, "rt", encoding="utf-8")
+
+
+def log_segments(path: Union[str, PathLike]) -> List[Path]:
+    """
+    Returns the segments of a (possibly rotated) log, oldest first.
+
+    Rotated segments follow the logrotate naming convention: `<path>.1` is more recent than
+    `<path>.2`, and any segment can be compressed with gzip, bzip2 or xz (e.g. `<path>.2.gz`).
+    The live log `<path>` comes last.
+    """
+    path = Path(path)
+    rotated = []
+    for candidate in glob.glob(f"{glob.escape(str(path))}.*"):
+        suffix = Path(candidate).name[len(path.name) + 1 :]
+        number = suffix.split(".", 1)[0]
+        if number.isdigit():
+            rotated.append((int(number), Path(candidate)))
+    segments = [p for _, p in sorted(rotated, reverse=True)]
+    if path.exists():
+        segments.append(path)
+    return segments
+
+
+def read_vw_log(
+    paths: Union[str, PathLike, Iterable[Union[str, PathLike]]]
+) -> Iterator[str]:
+    """
+    Streams the multi-line examples written by `VwLogger`, one example string at a time.
+
+    `paths` is either a single log, whose rotated segments are read as well (see `log_segments`),
+    or an explicit list of files read in the given order. Files are read line by line, so
+    memory usage does not depend on the size of the log.
+    """
+    if isinstance(paths, (str, PathLike)):
+        paths = log_segments(paths)
+    for path in paths:
+        with _open_log(path) as f:
+            lines: List[str] = []
+            for line in f:
+                line = line.rstrip("\n")
+                if line.strip():
+                    lines.append(line)
+                elif lines:
+                    yield "\n".join(lines)
+                    lines = []
+            if lines:
+                yield "\n".join(lines)
+
+
+def read_vw_log_chunks(
+    paths: Union[str, PathLike, Iterable[Union[str, PathLike]]], chunk_size: int
+) -> Iterator[List[str]]:
+    """Same as `read_vw_log`, but yields lists of up to `chunk_size` examples."""
+    chunk: List[str] = []
+    for example in read_vw_log(paths):
+        chunk.append(example)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_cb_label(vw_ex: str) -> Optional[Tuple[int, float, float]]:
+    """
+    Returns the `(index, cost, probability)` label of a logged contextual bandit example,
+    or None if the example was logged without a score.
+    """
+    for line in vw_ex.split("\n"):
+        if line.startswith("shared") or line.startswith("|"):
+            continue
+        match = _LABEL.match(line.split(" ", 1)[0])
+        if match:
+            return int(match[1]), float(match[2]), float(match[3])
+    return None
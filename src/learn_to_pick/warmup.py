@@ -0,0 +1,139 @@
+"""
+Pre-warmed startup for pre-forking servers (e.g. gunicorn with `preload_app = True`).
+
+The encoder and the model bytes are loaded once in the parent, and shared copy-on-write with the
+workers forked from it. Every worker then only creates its own VW workspace from the shared bytes:
+
+    preloader = Preloader(model_save_dir="models", featurizer=PickBestFeaturizer(auto_embed=True),
+                          warmup_inputs=[{"user": BasedOn("Tom"), "article": ToSelectFrom(articles)}])
+    preloader.preload()  # in the parent, e.g. when the app module is imported
+
+    def post_fork(server, worker):  # in every worker
+        app.picker = preloader.create(selection_scorer=...)
+"""
+import gc
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from learn_to_pick import base
+
+logger = logging.getLogger(__name__)
+
+
+class PreloadedModelRepository(base.ModelRepository):
+    """
+    A `ModelRepository` that reads the model bytes once, by `preload()`, and creates every workspace
+    from them, instead of reading the model again for each workspace.
+
+    Saving a model drops the preloaded bytes, so that later workspaces start from the saved model.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.model_data: Optional[bytes] = None
+        self.preloaded = False
+
+    def preload(self) -> Optional[bytes]:
+        self.model_data = super()._read_model_data()
+        self.preloaded = True
+        return self.model_data
+
+    def _read_model_data(self) -> Optional[bytes]:
+        if self.preloaded:
+            return self.model_data
+        return super()._read_model_data()
+
+    def save(self, workspace: Any) -> None:
+        super().save(workspace)
+        self.model_data = None
+        self.preloaded = False
+
+
+def preload_encoder(featurizer: base.Featurizer) -> None:
+    """Loads the featurizer's encoder, if it has a deferred one."""
+    model = getattr(featurizer, "model", None)
+    if isinstance(model, base.LazyEncoder):
+        model.model
+
+
+def warm_up(picker: base.RLLoop, inputs_list: List[Dict[str, Any]]) -> None:
+    """
+    Makes a prediction for every inputs dictionary, without sampling, scoring, learning, logging or
+    updating the metrics, so that lazy imports, encoders and caches are loaded before real traffic.
+    """
+    for inputs in inputs_list:
+        event = picker._call_before_predict(inputs=inputs)
+        # the picker may already be serving runs, which use its policy under the same lock
+        with picker._policy_lock:
+            picker.policy.predict(event=event)
+
+
+class Preloader:
+    """
+    Loads what every `PickBest` worker needs once, so that it is done in the parent of pre-forked workers.
+
+    Attributes:
+        model_save_dir (str): Directory of the VW model. Default is the current directory.
+        featurizer (Featurizer, optional): Featurizer shared by the workers, whose encoder is loaded by `preload()`.
+            Defaults to the `PickBest` default featurizer.
+        vw_cmd (List[str], optional): Command line arguments for the VW model.
+        model_backend (ModelBackend, optional): Backend the model is loaded from instead of `model_save_dir`.
+        warmup_inputs (List[Dict[str, Any]]): Inputs of the dummy predictions made by `preload()`.
+        freeze (bool): If set, `preload()` ends with `gc.freeze()`, so that the garbage collector never
+            writes to the preloaded objects and their memory pages stay shared with the workers. Default is True.
+    """
+
+    def __init__(
+        self,
+        model_save_dir: Union[str, os.PathLike] = "./",
+        featurizer: Optional[base.Featurizer] = None,
+        vw_cmd: Optional[List[str]] = None,
+        model_backend: Optional[base.ModelBackend] = None,
+        warmup_inputs: List[Dict[str, Any]] = [],
+        freeze: bool = True,
+    ):
+        from learn_to_pick.pick_best import PickBestFeaturizer
+
+        self.featurizer = featurizer or PickBestFeaturizer(auto_embed=False)
+        self.vw_cmd = vw_cmd
+        self.model_repo = PreloadedModelRepository(
+            model_save_dir, with_history=True, backend=model_backend
+        )
+        self.warmup_inputs = warmup_inputs
+        self.freeze = freeze
+        self.preload_seconds: float = -1
+
+    def preload(self) -> "Preloader":
+        start = time.monotonic()
+        preload_encoder(self.featurizer)
+        self.model_repo.preload()
+        if self.warmup_inputs:
+            from learn_to_pick.pick_best import PickBest, PickBestEvent
+
+            policy = PickBest.create_policy(
+                featurizer=self.featurizer,
+                vw_cmd=self.vw_cmd,
+                model_repo=self.model_repo,
+            )
+            for inputs in self.warmup_inputs:
+                policy.predict(event=PickBestEvent(inputs=inputs))
+            del policy
+        gc.collect()
+        if self.freeze and hasattr(gc, "freeze"):
+            gc.freeze()
+        self.preload_seconds = time.monotonic() - start
+        logger.info(f"preloaded learn_to_pick in {self.preload_seconds:.2f} seconds")
+        return self
+
+    def create(self, **kwargs: Any) -> Any:
+        """Creates a `PickBest` picker with its own workspace, loaded from the preloaded model."""
+        from learn_to_pick.pick_best import PickBest
+
+        return PickBest.create(
+            featurizer=self.featurizer,
+            vw_cmd=self.vw_cmd,
+            model_repo=self.model_repo,
+            **kwargs,
+        )
@@ -0,0 +1,150 @@
+import zlib
+from typing import List, Union
+
+import numpy as np
+import pytest
+from test_utils import ConstantScorer
+
+import learn_to_pick
+from learn_to_pick.ann import AnnCandidateSelector, IVFIndex
+from learn_to_pick.catalog import ActionCatalog
+
+
+class HashEncoder:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def encode(self, text: Union[str, List[str]]) -> np.ndarray:
+        self.calls += 1
+        if isinstance(text, list):
+            return np.array([self._encode(t) for t in text])
+        return self._encode(text)
+
+    def _encode(self, text: str) -> np.ndarray:
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        return rng.standard_normal(8)
+
+
+def _clustered(n: int, dim: int = 16, clusters: int = 20) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, dim))
+    return centers[rng.integers(clusters, size=n)] + 0.3 * rng.standard_normal((n, dim))
+
+
+def test_ivf_index_recall() -> None:
+    vectors = _clustered(5000)
+    index = IVFIndex(n_probe=8)
+    index.add_many([str(i) for i in range(len(vectors))], vectors)
+    assert index.trained and len(index) == 5000
+
+    found = index.search(vectors[42], 10)
+    assert found[0][0] == "42"
+    assert [score for _, score in found] == sorted(
+        (score for _, score in found), reverse=True
+    )
+    report = index.evaluate(_clustered(100) + 0.01, k=10)
+    assert report["recall"] > 0.9
+    assert set(report) == {"recall", "p50", "p99", "exact_p50", "exact_p99"}
+
+
+def test_ivf_index_incremental() -> None:
+    vectors = _clustered(2000)
+    index = IVFIndex(min_train_size=1000)
+    for i in range(999):
+        index.add(str(i), vectors[i])
+    assert not index.trained
+    index.add("999", vectors[999])
+    assert index.trained
+
+    index.remove("5")
+    assert "5" not in index
+    assert "5" not in [id for id, _ in index.search(vectors[5], 50)]
+    index.add("5", vectors[1500])
+    assert index.search(vectors[1500], 1)[0][0] in ("5", "1500")
+    index.add_many([str(i) for i in range(1000, 2000)], vectors[1000:])
+    assert len(index) == 2000
+    assert index.search_exact(vectors[1234], 1)[0][0] == "1234"
+
+
+def test_ivf_index_rejects_duplicate_ids() -> None:
+    index = IVFIndex()
+    with pytest.raises(ValueError):
+        index.add_many(["a", "b", "a"], _clustered(3))
+    assert len(index) == 0
+
+
+def test_ivf_index_probes_more_lists_when_short() -> None:
+    vectors = _clustered(1000)
+    index = IVFIndex(n_lists=50, n_probe=1, min_train_size=1000)
+    index.add_many([str(i) for i in range(len(vectors))], vectors)
+    assert index.trained
+    # a probed cluster is emptied
+    list_index = int(index._nearest_lists(index._normalize(vectors[0]), 1)[0])
+    for slot in list(index._lists[list_index]):
+        index.remove(index._ids[slot])
+    found = index.search(vectors[0], 10)
+    assert len(found) == 10
+    assert len({id for id, _ in found}) == 10
+
+
+def test_candidate_selection() -> None:
+    featurizer = learn_to_pick.PickBestFeaturizer(auto_embed=False, model=HashEncoder())
+    catalog = ActionCatalog(featurizer, name="article")
+    catalog.add_many({f"id{i}": f"article {i}" for i in range(300)})
+    selector = AnnCandidateSelector(
+        catalog, k=10, index=IVFIndex(min_train_size=100, n_probe=4)
+    )
+    assert selector.index.trained
+    # the actions are embedded in one batch
+    assert featurizer.model.calls == 1
+
+    picker = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(),
+        featurizer=featurizer,
+        candidate_selector=selector,
+        instrumentation=True,
+    )
+    actions = catalog.to_select_from()
+    response = picker.run(user=learn_to_pick.BasedOn("Tom"), article=actions)
+    event = response["picked_metadata"]
+    assert len(event.candidate_indices) == 10
+    assert len(event.to_select_from["article"]) == 10
+    picked = response["picked"]["article"]
+    assert picked is actions.value[event.candidate_indices[event.selected.index]]
+    assert 0 < event.selected.probability <= 1
+    assert len(picker.policy.format(event).split("\n")) == 11
+    assert picker.latencies.histograms["candidates"].count == 1
+
+    # small action sets are left alone
+    response = picker.run(
+        user=learn_to_pick.BasedOn("Tom"),
+        article=catalog.to_select_from(["id1", "id2"]),
+    )
+    assert response["picked_metadata"].candidate_indices is None
+
+    # a subset larger than k but much smaller than the catalog is pruned to its own nearest actions
+    ids = [f"id{i}" for i in range(100, 300, 8)]
+    subset = catalog.to_select_from(ids)
+    response = picker.run(user=learn_to_pick.BasedOn("Tom"), article=subset)
+    event = response["picked_metadata"]
+    assert len(event.to_select_from["article"]) == 10
+    expected = selector.index.search_exact(selector.query(event.based_on), 10, ids)
+    assert [ids[i] for i in event.candidate_indices] == [id for id, _ in expected]
+    assert response["picked"]["article"].id in ids
+
+    # the index follows the catalog
+    catalog.remove("id0")
+    catalog.add("new", "brand new article")
+    assert "id0" not in selector.index and "new" in selector.index
+    calls = featurizer.model.calls
+    catalog.add_many({f"more{i}": f"more article {i}" for i in range(20)})
+    assert featurizer.model.calls == calls + 1
+    assert all(f"more{i}" in selector.index for i in range(20))
+
+    # fewer distinct candidates than k are counted, and the actions are left alone
+    repeated = catalog.to_select_from(["id1", "id2", "id3"] * 5)
+    response = picker.run(user=learn_to_pick.BasedOn("Tom"), article=repeated)
+    assert response["picked_metadata"].candidate_indices is None
+    assert selector.fallbacks == 1
+    report = selector.evaluate([{"user": "Tom"}, {"user": "Anna"}])
+    assert 0 <= report["recall"] <= 1
@@ -0,0 +1,112 @@
+from typing import Any, Dict, List
+
+import pytest
+from test_utils import ConstantScorer, CountingEncoder, MockEncoder, assert_vw_ex_equals
+
+import learn_to_pick
+from learn_to_pick.catalog import ActionCatalog, CatalogAction
+
+
+def _format(featurizer: Any, inputs: Dict[str, Any]) -> str:
+    policy = learn_to_pick.PickBest.create_policy(featurizer=featurizer)
+    return policy.format(learn_to_pick.PickBestEvent(inputs=inputs))
+
+
+@pytest.mark.parametrize("auto_embed", [False, True])
+@pytest.mark.parametrize(
+    "actions",
+    [
+        ["0", "1 one", "2"],
+        [{"a": "0", "b": "x"}, {"a": "1", "b": "y"}],
+        learn_to_pick.Embed(["0", "1 one"]),
+    ],
+)
+def test_catalog_features_match_plain_actions(auto_embed: bool, actions: Any) -> None:
+    featurizer = learn_to_pick.PickBestFeaturizer(
+        auto_embed=auto_embed, model=MockEncoder()
+    )
+    if auto_embed and not isinstance(actions[0], str):
+        pytest.skip("auto_embed needs plain string actions")
+    catalog = ActionCatalog(featurizer, name="action")
+    catalog.add_many({str(i): action for i, action in enumerate(actions)})
+    context = {"User": learn_to_pick.BasedOn("Context")}
+
+    expected = _format(
+        featurizer, {**context, "action": learn_to_pick.ToSelectFrom(actions)}
+    )
+    for _ in range(2):
+        assert_vw_ex_equals(
+            _format(featurizer, {**context, "action": catalog.to_select_from()}),
+            expected,
+        )
+    # featurizing a run does not change the catalog actions
+    assert all("dotprod" not in a.featurized.sparse for a in catalog.actions())
+
+
+def test_catalog_actions_are_featurized_once() -> None:
+    encoder = CountingEncoder()
+    featurizer = learn_to_pick.PickBestFeaturizer(auto_embed=True, model=encoder)
+    catalog = ActionCatalog(featurizer, name="article")
+    catalog.add_many({f"id{i}": f"article {i}" for i in range(5)})
+    assert len(encoder.encoded) == 5
+
+    picker = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(), featurizer=featurizer
+    )
+    response = picker.run(
+        user=learn_to_pick.BasedOn("Tom"),
+        article=catalog.to_select_from(["id1", "id3"]),
+    )
+    # only the context was encoded
+    assert set(encoder.encoded[5:]) == {"Tom"}
+    picked = response["picked"]["article"]
+    assert isinstance(picked, CatalogAction)
+    assert picked.id in ("id1", "id3")
+    assert str(picked) == catalog[picked.id].value
+
+
+def test_catalog_incremental_changes() -> None:
+    catalog = ActionCatalog(
+        learn_to_pick.PickBestFeaturizer(auto_embed=False, model=MockEncoder())
+    )
+    catalog.add("a", "first")
+    catalog.add("b", "second")
+    with pytest.raises(ValueError):
+        catalog.add("a", "again")
+
+    before = catalog["a"]
+    catalog.update("a", "changed")
+    assert catalog["a"] is not before
+    assert before.value == "first"
+    assert catalog["a"].featurized.sparse["action"]["default_ft"] == "changed"
+
+    catalog.remove("b")
+    assert "b" not in catalog and len(catalog) == 1
+    assert list(catalog) == ["a"]
+    with pytest.raises(KeyError):
+        catalog.to_select_from(["a", "b"])
+
+
+def test_catalog_actions_prompt() -> None:
+    class recording_llm:
+        def __init__(self) -> None:
+            self.prompts: List[str] = []
+
+        def predict(self, prompt: str) -> str:
+            self.prompts.append(prompt)
+            return "1"
+
+    featurizer = learn_to_pick.PickBestFeaturizer(auto_embed=False, model=MockEncoder())
+    catalog = ActionCatalog(featurizer, name="article")
+    catalog.add("id1", "article 1")
+    llm = recording_llm()
+    picker = learn_to_pick.PickBest.create(
+        selection_scorer=learn_to_pick.AutoSelectionScorer(
+            llm=llm, prompt="{selected_based_on} -> {picked}"
+        ),
+        featurizer=featurizer,
+    )
+    user = learn_to_pick.BasedOn("Tom")
+    picker.run(user=user, article=catalog.to_select_from(["id1"]))
+    picker.run(user=user, article=learn_to_pick.ToSelectFrom(["article 1"]))
+    assert llm.prompts == ["{'user': 'Tom'} -> {'article': 'article 1'}"] * 2
@@ -0,0 +1,83 @@
+import zlib
+
+import numpy as np
+import pytest
+from test_utils import ConstantScorer
+
+import learn_to_pick
+from learn_to_pick.encoders import HashingEncoder
+
+
+@pytest.mark.parametrize("analyzer", ["word", "char", "char_wb"])
+def test_hashing_encoder(analyzer: str) -> None:
+    ngram_range = (1, 2) if analyzer == "word" else (3, 5)
+    encoder = HashingEncoder(n_features=64, analyzer=analyzer, ngram_range=ngram_range)
+    texts = ["article about politics", "article about sports", "recipe for cake"]
+
+    vector = encoder.encode(texts[0])
+    assert vector.shape == (64,) and vector.dtype == np.float32
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    np.testing.assert_array_equal(vector, encoder.encode("Article_About_Politics"))
+
+    matrix = encoder.encode(texts)
+    assert matrix.shape == (3, 64) and matrix.dtype == np.float32
+    for text, row in zip(texts, matrix):
+        np.testing.assert_array_equal(encoder.encode(text), row)
+    assert matrix[0] @ matrix[1] > matrix[0] @ matrix[2]
+
+    assert not encoder.encode("").any()
+    assert encoder.encode([]).shape == (0, 64)
+
+
+@pytest.mark.parametrize("analyzer", ["word", "char", "char_wb"])
+def test_hashing_encoder_cache(analyzer: str) -> None:
+    texts = ["crème brûlée", "the crème of the crop", "the crop", "日本語のテキスト"] * 3
+    cached = HashingEncoder(analyzer=analyzer, cache_size=3)
+    uncached = HashingEncoder(analyzer=analyzer, cache_size=0)
+    np.testing.assert_array_equal(cached.encode(texts), uncached.encode(texts))
+    # every n-gram hashes as it did before the cache and ASCII slicing
+    expected = [
+        zlib.crc32(ngram.encode("utf-8")) % 256
+        for ngram in [" cr", "crè", "rèm", "ème", "me ", " cr", "cr "]
+    ]
+    assert (
+        HashingEncoder(ngram_range=(3, 3))
+        ._buckets(HashingEncoder(ngram_range=(3, 3))._hashes("crème cr"))[0]
+        .tolist()
+        == expected
+    )
+    assert len(cached._cache) <= 3
+    assert not uncached._cache
+
+
+def test_hashing_encoder_fit() -> None:
+    corpus = [f"the article number {i}" for i in range(50)] + ["the sports page"]
+    plain = HashingEncoder(analyzer="word", ngram_range=(1, 1))
+    fitted = HashingEncoder(analyzer="word", ngram_range=(1, 1)).fit(corpus)
+    assert fitted.idf.shape == (256,) and fitted.idf.dtype == np.float32
+
+    # "the" is in every text, so it weighs less than "sports" once fitted
+    the, sports = plain.encode(["the", "sports"])
+    text = "the sports"
+    assert abs(plain.encode(text) @ the) == pytest.approx(
+        abs(plain.encode(text) @ sports)
+    )
+    assert abs(fitted.encode(text) @ the) < abs(fitted.encode(text) @ sports)
+
+    restored = HashingEncoder.from_state(fitted.get_state())
+    np.testing.assert_allclose(restored.encode(text), fitted.encode(text))
+
+
+def test_hashing_encoder_picker() -> None:
+    picker = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=True, model=learn_to_pick.HashingEncoder(n_features=16)
+        ),
+    )
+    actions = ["article about politics", "article about sports"]
+    response = picker.run(
+        user=learn_to_pick.BasedOn("Tom likes sports"),
+        article=learn_to_pick.ToSelectFrom(actions),
+    )
+    assert response["picked"]["article"] in actions
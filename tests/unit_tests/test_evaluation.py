@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import learn_to_pick
+from learn_to_pick.evaluation import estimate, evaluate
+from test_utils import MockEncoder
+
+
+def test_estimate() -> None:
+    result = estimate(
+        logged_probability=np.array([0.5, 0.5, 0.25, 1.0]),
+        score=np.array([1.0, 0.0, 1.0, 0.0]),
+        target_probability=np.array([1.0, 0.0, 0.5, 1.0]),
+        score_hat_logged=np.array([0.5, 0.5, 0.5, 0.5]),
+        score_hat_target=np.array([0.5, 0.5, 0.5, 0.5]),
+    )
+    assert result.count == 4
+    assert result.logged.value == pytest.approx(0.5)
+    # weights are [2, 0, 2, 1]
+    assert result.ips.value == pytest.approx(4 / 4)
+    assert result.snips.value == pytest.approx(4 / 5)
+    assert result.dr.value == pytest.approx((0.5 + 1 + 0.5 + 0.5 + 1 + 0) / 4)
+    for e in [result.logged, result.ips, result.snips, result.dr]:
+        assert e.lower <= e.value <= e.upper
+
+
+def test_estimate_without_reward_model() -> None:
+    result = estimate(
+        logged_probability=np.array([0.5, 0.5]),
+        score=np.array([1.0, 0.0]),
+        target_probability=np.array([0.5, 0.5]),
+    )
+    assert result.dr is None
+    assert result.ips.value == pytest.approx(result.logged.value)
+
+
+def test_evaluate_logs(tmp_path) -> None:
+    class Scorer(learn_to_pick.SelectionScorer):
+        def score_response(self, inputs, picked, event) -> float:
+            return 1.0 if picked["action"] == inputs["User"] else 0.0
+
+    log = tmp_path / "rl_logs.txt"
+    pick = learn_to_pick.PickBest.create(
+        policy=learn_to_pick.PickBest.create_policy(
+            featurizer=learn_to_pick.PickBestFeaturizer(
+                auto_embed=False, model=MockEncoder()
+            ),
+            rl_logs=log,
+            model_save_dir=str(tmp_path / "production"),
+        ),
+        selection_scorer=Scorer(),
+    )
+    actions = ["0", "1", "2"]
+    for i in range(60):
+        pick.run(
+            User=learn_to_pick.BasedOn(actions[i % 3]),
+            action=learn_to_pick.ToSelectFrom(actions),
+        )
+
+    candidate = learn_to_pick.PickBest.create_policy(
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        vw_cmd=["--cb_explore_adf", "--epsilon=0.2", "--quiet"],
+        model_save_dir=str(tmp_path / "candidate"),
+    )
+    result = evaluate(log, candidate, chunk_size=7)
+    assert result.count == 60
+    assert result.dr is not None
+    assert 0.0 <= result.logged.value <= 1.0
+    assert list(result.to_pandas().index) == ["logged", "ips", "snips", "dr"]
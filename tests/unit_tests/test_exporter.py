@@ -0,0 +1,81 @@
+import urllib.request
+
+import learn_to_pick
+from learn_to_pick.exporter import CONTENT_TYPE, MetricsExporter, _Metrics, collect
+from test_utils import ConstantScorer, MockEncoder
+
+
+def _pick(**kwargs):
+    pick = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        **kwargs,
+    )
+    for _ in range(3):
+        pick.run(
+            User=learn_to_pick.BasedOn("Context"),
+            action=learn_to_pick.ToSelectFrom(["0", "1"]),
+        )
+    return pick
+
+
+def _samples(text: str):
+    return dict(
+        line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#")
+    )
+
+
+def test_collect() -> None:
+    text = collect(
+        _pick(instrumentation=True, metrics_window_size=10),
+        labels={"picker": "test"},
+    )
+    samples = _samples(text)
+    assert samples['learn_to_pick_decisions_total{picker="test"}'] == "3.0"
+    assert samples['learn_to_pick_feedback_total{picker="test"}'] == "3.0"
+    assert samples['learn_to_pick_score{picker="test"}'] == "1.0"
+    assert (
+        samples['learn_to_pick_scoring_total{picker="test",outcome="scored"}'] == "3.0"
+    )
+    assert (
+        samples['learn_to_pick_stage_latency_seconds_count{picker="test",stage="run"}']
+        == "3.0"
+    )
+    assert (
+        'learn_to_pick_stage_latency_seconds{picker="test",stage="run",quantile="0.99"}'
+        in samples
+    )
+    assert text.count("# TYPE learn_to_pick_stage_latency_seconds summary") == 1
+
+
+def test_special_values() -> None:
+    metrics = _Metrics("test", {})
+    for name, value in [
+        ("pos", float("inf")),
+        ("neg", float("-inf")),
+        ("nan", float("nan")),
+        ("num", 2),
+    ]:
+        metrics.add(name, "gauge", name, value)
+    samples = _samples(metrics.render())
+    assert samples == {
+        "test_pos": "+Inf",
+        "test_neg": "-Inf",
+        "test_nan": "NaN",
+        "test_num": "2.0",
+    }
+
+
+def test_http_and_file_export(tmp_path) -> None:
+    exporter = MetricsExporter(
+        _pick(), port=0, path=tmp_path / "metrics.prom", interval=60
+    )
+    host, port = exporter.server_address
+    with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+        assert response.headers["Content-Type"] == CONTENT_TYPE
+        body = response.read().decode("utf-8")
+    assert _samples(body)["learn_to_pick_decisions_total"] == "3.0"
+    exporter.close()
+    assert (tmp_path / "metrics.prom").read_text() == exporter.render()
@@ -0,0 +1,53 @@
+"""
+Allocation budgets of run() on fixed workloads, measured with tracemalloc.
+
+The budgets were recorded with some headroom over the measured values (about 4 bytes retained and
+11KB peak per run for the plain workload). When a change legitimately needs more memory, measure
+again with `measure_allocations` and update the budget.
+"""
+import itertools
+from typing import Any, Callable, Dict
+
+import pytest
+
+import learn_to_pick
+from learn_to_pick.metrics import measure_allocations
+from test_utils import ConstantScorer, MockEncoder
+
+RETAINED_BYTES_PER_RUN_BUDGET = 64
+PEAK_BYTES_BUDGET = 64 * 1024
+
+
+def _workload(tmp_path: Any, **kwargs: Any) -> Callable[[], Any]:
+    picker = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        model_save_dir=str(tmp_path),
+        **kwargs,
+    )
+    inputs = [
+        {
+            "user": learn_to_pick.BasedOn(f"user{u}"),
+            "action": learn_to_pick.ToSelectFrom([f"action{a}" for a in range(10)]),
+        }
+        for u in range(20)
+    ]
+    cycle = itertools.cycle(inputs)
+    return lambda: picker.run(next(cycle))
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"metrics_step": 1, "metrics_max_history": 100},
+        {"metrics_step": 1, "metrics_window_size": 10, "metrics_max_history": 100},
+    ],
+)
+def test_run_allocation_budget(tmp_path: Any, kwargs: Dict[str, Any]) -> None:
+    run = _workload(tmp_path, **kwargs)
+    allocations = measure_allocations(run, runs=500, warmup=200)
+    assert allocations["retained_bytes_per_run"] <= RETAINED_BYTES_PER_RUN_BUDGET
+    assert allocations["peak_bytes"] <= PEAK_BYTES_BUDGET
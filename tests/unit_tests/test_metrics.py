@@ -0,0 +1,292 @@
+import random
+import tracemalloc
+
+import pytest
+
+import learn_to_pick
+from learn_to_pick.metrics import (
+    _CountWindow,
+    LatencyHistogram,
+    MemoryProfiler,
+    MetricsHistory,
+    MetricsTrackerAverage,
+    MetricsTrackerMultiWindow,
+    MetricsTrackerRollingWindow,
+    P2Quantile,
+    StageLatencies,
+    time_stage,
+)
+from test_utils import ConstantScorer, MockEncoder
+
+
+def test_latency_histogram_percentiles() -> None:
+    histogram = LatencyHistogram()
+    values = [random.uniform(1e-6, 1e-1) for _ in range(10000)]
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    for q in [50, 90, 99]:
+        exact = values[int(q / 100 * len(values)) - 1]
+        assert abs(histogram.percentile(q) - exact) <= 0.01 * exact
+    assert histogram.max == int(values[-1] * 1e9) / 1e9
+    assert histogram.count == 10000
+    assert LatencyHistogram().percentile(99) == 0
+
+
+def test_stage_latencies_hooks() -> None:
+    latencies = StageLatencies()
+    forwarded = []
+    latencies.add_hook(lambda stage, seconds: forwarded.append(stage))
+    latencies.add_hook(lambda stage, seconds: 1 / 0)
+    with time_stage(latencies, "a"):
+        pass
+    latencies.record("b", 0.5)
+    assert forwarded == ["a", "b"]
+    assert latencies.summary()["b"]["p99"] == 0.5
+    assert list(latencies.to_pandas().index) == ["a", "b"]
+
+    with time_stage(None, "a"):
+        pass
+
+
+def test_rl_loop_stage_latencies() -> None:
+    pick = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        instrumentation=True,
+    )
+    for _ in range(3):
+        pick.run(
+            User=learn_to_pick.BasedOn("Context"),
+            action=learn_to_pick.ToSelectFrom(["0", "1"]),
+        )
+    summary = pick.latencies.summary()
+    for stage in [
+        "run",
+        "predict",
+        "featurize",
+        "vw_predict",
+        "sample",
+        "callbacks",
+        "scoring",
+        "learn",
+        "log",
+    ]:
+        assert summary[stage]["count"] == 3, stage
+    assert summary["run"]["max"] >= summary["predict"]["max"]
+
+    disabled = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+    )
+    assert disabled.latencies is None
+
+
+def test_metrics_history_is_bounded() -> None:
+    history = MetricsHistory(max_length=100)
+    for step in range(1000):
+        history.append(step, step / 10)
+    assert len(history) <= 100
+    assert history.steps[-1] == 999
+    assert list(history.steps) == list(range(history.steps[0], 1000))
+
+    downsampled = MetricsHistory(max_length=100, downsample=True)
+    for step in range(1000):
+        downsampled.append(step, step / 10)
+    steps = list(downsampled.steps)
+    assert len(steps) <= 100
+    assert steps[0] == 0 and steps[-1] == 999
+    assert steps == sorted(steps)
+    assert steps[1] - steps[0] > 1
+
+
+def test_metrics_history_views_do_not_change() -> None:
+    history = MetricsHistory(max_length=8)
+    for step in range(8):
+        history.append(step, 1.0)
+    df = history.to_pandas()
+    for step in range(8, 20):
+        history.append(step, 2.0)
+    assert list(df["step"]) == list(range(8))
+    assert list(df["score"]) == [1.0] * 8
+
+
+def test_trackers_history() -> None:
+    for tracker in [
+        MetricsTrackerAverage(step=2, max_history=10),
+        MetricsTrackerRollingWindow(window_size=3, step=2, max_history=10),
+    ]:
+        for _ in range(100):
+            tracker.on_decision()
+            tracker.on_feedback(1.0)
+        df = tracker.to_pandas()
+        assert list(df.columns) == ["step", "score"]
+        assert len(df) <= 10
+        assert df["step"].iloc[-1] == 100
+        assert tracker.history[-1] == {"step": 100, "score": 1.0}
+
+
+def test_history_is_read_only() -> None:
+    tracker = MetricsTrackerAverage(step=1)
+    for score in [1.0, 0.0]:
+        tracker.on_decision()
+        tracker.on_feedback(score)
+    history = tracker.history
+    assert history == [
+        {"step": 0, "score": 0.0},
+        {"step": 1, "score": 1.0},
+        {"step": 2, "score": 0.5},
+    ]
+    with pytest.raises(AttributeError):
+        history.append({"step": 3, "score": 1.0})
+    with pytest.raises(TypeError):
+        history[-1]["score"] = 0.0
+    # the view follows the tracker
+    tracker.on_feedback(1.0)
+    assert len(history) == 4 and history[-1]["step"] == 3
+    assert tracker.points.to_list()[1:2] == [{"step": 1, "score": 1.0}]
+
+
+@pytest.mark.parametrize("size,buckets", [(1000, 16), (128, 16), (10, 3), (5, 16)])
+def test_count_window_bounds(size: int, buckets: int) -> None:
+    window = _CountWindow(size, buckets)
+    low = size - -(-size // buckets)
+    for i in range(1, 5 * size):
+        window.add(1.0)
+        if i <= size:
+            assert window.count == i
+        else:
+            assert low <= window.count <= size
+    # the window is full right before its oldest bucket is dropped
+    counts = set()
+    for _ in range(size):
+        window.add(1.0)
+        counts.add(window.count)
+    assert max(counts) == size
+
+
+def test_p2_quantile() -> None:
+    values = [random.gauss(0, 1) for _ in range(20000)]
+    for q in [0.5, 0.9, 0.99]:
+        estimate = P2Quantile(q)
+        for value in values:
+            estimate.add(value)
+        exact = sorted(values)[int(q * len(values))]
+        assert abs(estimate.value - exact) < 0.05
+    small = P2Quantile(0.5)
+    for value in [3, 1, 2]:
+        small.add(value)
+    assert small.value == 2
+
+
+def test_multi_window_tracker() -> None:
+    now = [0.0]
+    tracker = MetricsTrackerMultiWindow(
+        step=100,
+        window_sizes=[128, 1000],
+        time_windows=[10],
+        half_lives=[10],
+        quantiles=[0.5],
+        buckets=8,
+        clock=lambda: now[0],
+    )
+    for i in range(2000):
+        now[0] = i / 100
+        tracker.on_decision()
+        tracker.on_feedback(float(i % 2))
+    for i in range(128):
+        tracker.on_feedback(5.0)
+    stats = tracker.stats()
+    assert stats["window_128"] == 5.0
+    assert 0.5 < stats["window_1000"] < 5.0
+    assert stats["ewm_10"] > 4.9
+    assert tracker.score == stats["window_128"]
+    assert abs(tracker.std - statistics_std(tracker)) < 1e-9
+
+    now[0] = 100.0
+    assert tracker.stats()["window_10s"] == 0.0
+    df = tracker.to_pandas()
+    assert list(df.columns) == [
+        "step",
+        "score",
+        "window_128",
+        "window_1000",
+        "window_10s",
+        "ewm_10",
+        "q0.5",
+        "mean",
+        "std",
+    ]
+    assert df["step"].iloc[-1] == 2100
+
+
+def statistics_std(tracker: MetricsTrackerMultiWindow) -> float:
+    import statistics
+
+    return statistics.stdev([float(i % 2) for i in range(2000)] + [5.0] * 128)
+
+
+def test_rl_loop_multi_window_config() -> None:
+    pick = learn_to_pick.PickBest.create(
+        selection_scorer=None,
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        metrics_step=1,
+        metrics_window_size=[10, 100],
+        metrics_quantiles=[0.9],
+    )
+    assert isinstance(pick.metrics, MetricsTrackerMultiWindow)
+    assert list(pick.metrics.windows) == ["window_10", "window_100"]
+
+
+def test_memory_profiler_finds_leak() -> None:
+    profiler = MemoryProfiler(every=100, top=3)
+    profiler.start()
+    leak = []
+    try:
+        for _ in range(300):
+            leak.append(bytearray(1000))
+            profiler.on_run()
+    finally:
+        profiler.stop()
+    assert not tracemalloc.is_tracing()
+    assert [r.run for r in profiler.reports] == [100, 200, 300]
+    report = profiler.last
+    assert 1000 <= report.bytes_per_run <= 1200
+    assert "test_metrics.py" in report.top[0].location
+    assert report.top[0].count_diff >= 100
+    assert profiler.summary()["bytes_per_run"] == report.bytes_per_run
+    assert list(profiler.to_pandas().columns) == [
+        "location",
+        "size",
+        "size_diff",
+        "count_diff",
+    ]
+
+
+def test_memory_profiling_mode() -> None:
+    picker = learn_to_pick.PickBest.create(
+        selection_scorer=None,
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        memory_profile_every=20,
+        memory_profile_top=5,
+    )
+    assert tracemalloc.is_tracing()
+    actions = learn_to_pick.ToSelectFrom(["0", "1", "2"])
+    for _ in range(2):
+        picker.run_batch(
+            [{"user": learn_to_pick.BasedOn("ctx"), "action": actions}] * 10
+        )
+    picker.run(user=learn_to_pick.BasedOn("ctx"), action=actions)
+    assert picker.memory_profiler.runs == 21
+    assert len(picker.memory_profiler.reports) == 1
+    assert len(picker.memory_profiler.last.top) <= 5
+    picker.close()
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,118 @@
+import pytest
+import vowpal_wabbit_next as vw
+
+from learn_to_pick.model_repository import (
+    InMemoryModelBackend,
+    LocalModelBackend,
+    ModelRepository,
+    ModelVersion,
+)
+
+vw_cmd = ["--cb_explore_adf", "--quiet"]
+
+
+def _predict(workspace: vw.Workspace):
+    parser = vw.TextFormatParser(workspace)
+    return workspace.predict_one(
+        [parser.parse_line(l) for l in ["shared |s a", "|a x", "|a y"]]
+    )
+
+
+def _trained_workspace() -> vw.Workspace:
+    workspace = vw.Workspace(vw_cmd)
+    parser = vw.TextFormatParser(workspace)
+    workspace.learn_one(
+        [parser.parse_line(l) for l in ["shared |s a", "0:-1:0.5 |a x", "|a y"]]
+    )
+    return workspace
+
+
+@pytest.mark.parametrize("backend_type", ["memory", "local"])
+def test_backend_save_and_load(tmp_path, backend_type) -> None:
+    backend = (
+        InMemoryModelBackend()
+        if backend_type == "memory"
+        else LocalModelBackend(tmp_path / "store")
+    )
+    repo = ModelRepository(tmp_path, backend=backend)
+    assert not repo.has_history()
+
+    workspace = _trained_workspace()
+    repo.save(workspace)
+    assert repo.has_history()
+    assert backend.latest().digest in [v.digest for v in backend.list()]
+
+    loaded = ModelRepository(tmp_path, backend=backend).load(vw_cmd)
+    assert _predict(loaded) == _predict(workspace)
+    assert _predict(loaded) != _predict(vw.Workspace(vw_cmd))
+
+
+def test_unchanged_model_is_not_republished(tmp_path) -> None:
+    backend = InMemoryModelBackend()
+    repo = ModelRepository(tmp_path, backend=backend)
+    workspace = _trained_workspace()
+    repo.save(workspace)
+    repo.save(workspace)
+    assert len(backend.list()) == 1
+    assert len(backend.blobs) == 1
+
+
+def test_identical_blobs_are_shared(tmp_path) -> None:
+    backend = LocalModelBackend(tmp_path)
+    repo = ModelRepository(tmp_path, backend=backend)
+    first = _trained_workspace()
+    repo.save(first)
+    repo.save(vw.Workspace(vw_cmd))
+    repo.save(first)
+    versions = backend.list()
+    assert len(versions) == 3
+    assert versions[0].digest == versions[2].digest
+    assert len(list((tmp_path / "blobs").glob("*/*.vw"))) == 2
+
+
+def test_reset_ignores_existing_snapshot(tmp_path) -> None:
+    backend = InMemoryModelBackend()
+    ModelRepository(tmp_path, backend=backend).save(_trained_workspace())
+    repo = ModelRepository(tmp_path, backend=backend, reset=True)
+    assert _predict(repo.load(vw_cmd)) == _predict(vw.Workspace(vw_cmd))
+    assert len(backend.list()) == 1
+
+
+def test_reset_with_backend_keeps_local_files(tmp_path) -> None:
+    local = ModelRepository(tmp_path)
+    local.save(_trained_workspace())
+    backend = InMemoryModelBackend()
+    ModelRepository(tmp_path, backend=backend, reset=True)
+    assert (tmp_path / "latest.vw").exists()
+    assert local.has_history()
+
+    with pytest.raises(ValueError):
+        ModelRepository(tmp_path, with_history=False, backend=backend)
+
+
+def test_local_repository_layout_is_unchanged(tmp_path) -> None:
+    repo = ModelRepository(tmp_path, with_history=True)
+    repo.save(_trained_workspace())
+    assert (tmp_path / "latest.vw").exists()
+    assert repo.has_history()
+
+
+def _publish_versions(folder: str, worker: int, count: int) -> None:
+    backend = LocalModelBackend(folder)
+    for i in range(count):
+        backend.publish(ModelVersion(tag=f"{worker}-{i}", digest="d" * 64, size=i))
+
+
+def test_concurrent_publishers_keep_the_manifest_intact(tmp_path) -> None:
+    import multiprocessing
+
+    processes = [
+        multiprocessing.Process(target=_publish_versions, args=(str(tmp_path), w, 50))
+        for w in range(4)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    tags = {version.tag for version in LocalModelBackend(tmp_path).list()}
+    assert tags == {f"{w}-{i}" for w in range(4) for i in range(50)}
@@ -392,3 +392,177 @@ def test_activate_and_deactivate_scorer() -> None:
     )
     picked_metadata = response["picked_metadata"]  # type: ignore
     assert picked_metadata.selected.score == 3  # type: ignore
+
+
+class BlockingScorer(learn_to_pick.SelectionScorer):
+    def __init__(self, score: float = 1.0, blocked_calls: int = -1):
+        import threading
+
+        self.release = threading.Event()
+        self.score = score
+        self.blocked_calls = blocked_calls
+        self.calls = 0
+
+    def score_response(self, inputs, picked, event) -> float:
+        self.calls += 1
+        if self.blocked_calls < 0 or self.calls <= self.blocked_calls:
+            self.release.wait(timeout=10)
+        return self.score
+
+
+def test_async_scoring_returns_before_score() -> None:
+    scorer = BlockingScorer()
+    pick = learn_to_pick.PickBest.create(
+        selection_scorer=scorer,
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        async_scoring=True,
+    )
+    response = pick.run(
+        User=learn_to_pick.BasedOn("Context"),
+        action=learn_to_pick.ToSelectFrom(["0", "1", "2"]),
+    )
+    picked_metadata = response["picked_metadata"]  # type: ignore
+    assert picked_metadata.selected.score is None  # type: ignore
+    assert pick.pending_scores == 1
+    assert pick.metrics.feedback_count == 0
+
+    scorer.release.set()
+    assert pick.wait_for_pending_scores(timeout=10)
+    assert pick.pending_scores == 0
+    assert picked_metadata.selected.score == 1.0  # type: ignore
+    assert pick.metrics.feedback_count == 1
+    pick.close()
+
+
+def test_async_scoring_falls_back_to_sync_when_full() -> None:
+    scorer = BlockingScorer(blocked_calls=1)
+    pick = learn_to_pick.PickBest.create(
+        selection_scorer=scorer,
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        async_scoring=True,
+        max_pending_scores=1,
+    )
+    first = pick.run(
+        User=learn_to_pick.BasedOn("Context"),
+        action=learn_to_pick.ToSelectFrom(["0", "1", "2"]),
+    )
+    second = pick.run(
+        User=learn_to_pick.BasedOn("Context"),
+        action=learn_to_pick.ToSelectFrom(["0", "1", "2"]),
+    )
+    # the second decision was scored in run()
+    assert second["picked_metadata"].selected.score == 1.0  # type: ignore
+    assert first["picked_metadata"].selected.score is None  # type: ignore
+    scorer.release.set()
+    assert pick.wait_for_pending_scores(timeout=10)
+    assert first["picked_metadata"].selected.score == 1.0  # type: ignore
+    assert scorer.calls == 2
+    pick.close()
+
+
+def test_default_encoder_is_loaded_on_first_embed() -> None:
+    loads = []
+
+    def factory() -> MockEncoder:
+        loads.append(1)
+        return MockEncoder()
+
+    pick = learn_to_pick.PickBest.create(
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=learn_to_pick.LazyEncoder(factory)
+        ),
+        selection_scorer=None,
+    )
+    pick.run(
+        User=learn_to_pick.BasedOn("Context"),
+        action=learn_to_pick.ToSelectFrom(["0", "1"]),
+    )
+    assert not pick.policy.featurizer.model.loaded
+    pick.run(
+        User=learn_to_pick.BasedOn("Context"),
+        action=learn_to_pick.ToSelectFrom(learn_to_pick.Embed(["0", "1"])),
+    )
+    pick.run(
+        User=learn_to_pick.BasedOn("Context"),
+        action=learn_to_pick.ToSelectFrom(learn_to_pick.Embed(["0", "1"])),
+    )
+    assert pick.policy.featurizer.model.loaded
+    assert len(loads) == 1
+
+
+def test_import_does_not_load_heavy_dependencies() -> None:
+    import subprocess
+    import sys
+    import tempfile
+
+    code = (
+        "import sys, learn_to_pick\n"
+        "from learn_to_pick import PickBest, PickBestFeaturizer\n"
+        "assert 'numpy' not in sys.modules\n"
+        "PickBest.create(selection_scorer=None, model_save_dir=sys.argv[1])\n"
+        "heavy = {'pandas', 'torch', 'sentence_transformers'} & set(sys.modules)\n"
+        "assert not heavy, heavy\n"
+    )
+    with tempfile.TemporaryDirectory() as model_dir:
+        subprocess.run([sys.executable, "-c", code, model_dir], check=True)
+
+
+def test_submodules_are_attributes() -> None:
+    import subprocess
+    import sys
+
+    code = (
+        "import learn_to_pick\n"
+        "assert learn_to_pick.base.BasedOn is learn_to_pick.BasedOn\n"
+        "assert learn_to_pick.metrics.LatencyHistogram\n"
+        "assert learn_to_pick.pick_best.PickBest is learn_to_pick.PickBest\n"
+        "assert not hasattr(learn_to_pick, 'no_such_module')\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_import_prints_info_logs() -> None:
+    import subprocess
+    import sys
+
+    code = (
+        "import logging, learn_to_pick\n"
+        "logging.getLogger('learn_to_pick.test').info('hello')\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    assert "learn_to_pick.test - INFO - hello" in result.stderr
+
+
+def test_dedupe_actions() -> None:
+    pick = learn_to_pick.PickBest.create(
+        selection_scorer=None,
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        dedupe_actions=True,
+    )
+    actions = ["0", "1", "0", {"a": "2"}, "1", {"a": "2"}, "3"]
+    response = pick.run(
+        User=learn_to_pick.BasedOn("Context"),
+        action=learn_to_pick.ToSelectFrom(actions),
+    )
+    event = response["picked_metadata"]
+    assert event.to_select_from["action"] == ["0", "1", {"a": "2"}, "3"]
+    assert event.candidate_indices == [0, 1, 3, 6]
+    assert event.duplicate_indices == [[0, 2], [1, 4], [3, 5], [6]]
+    picked = response["picked"]["action"]
+    assert picked == actions[event.candidate_indices[event.selected.index]]
+    assert 0 < event.selected.probability <= 1
+
+    response = pick.run(
+        User=learn_to_pick.BasedOn("Context"),
+        action=learn_to_pick.ToSelectFrom(["0", "1"]),
+    )
+    assert response["picked_metadata"].candidate_indices is None
+    assert response["picked_metadata"].duplicate_indices is None
@@ -1,5 +1,5 @@
 import pytest
-from test_utils import MockEncoder, assert_vw_ex_equals
+from test_utils import CountingEncoder, MockEncoder, assert_vw_ex_equals
 
 import learn_to_pick.base as rl_chain
 import learn_to_pick.pick_best as pick_best_chain
@@ -407,3 +407,75 @@ def test_raw_features_underscored() -> None:
     )
     vw_ex_str = vw_cb_formatter(*featurizer.featurize(event))
     assert_vw_ex_equals(vw_ex_str, expected_embed_and_keep)
+
+
+@pytest.mark.parametrize("auto_embed", [False, True])
+def test_pickbest_textembedder_context_cache(auto_embed: bool) -> None:
+    encoder = CountingEncoder()
+    cached = pick_best_chain.PickBestFeaturizer(
+        auto_embed=auto_embed,
+        model=encoder,
+        context_cache_size=1024,
+        encode_cache_size=4096,
+    )
+    uncached = pick_best_chain.PickBestFeaturizer(
+        auto_embed=auto_embed, model=MockEncoder()
+    )
+    assert uncached.context_cache is None and uncached.encoder is None
+
+    def format(featurizer, message: str) -> str:
+        event = pick_best_chain.PickBestEvent(
+            inputs={
+                "profile": rl_chain.Embed(BasedOn("user profile")),
+                "history": BasedOn(["first message", "second message"]),
+                "message": BasedOn(message),
+                "action": ToSelectFrom(["0", "1 one"]),
+            },
+        )
+        return vw_cb_formatter(*featurizer.featurize(event))
+
+    for message in ["hello", "bye", "hello"]:
+        assert_vw_ex_equals(format(cached, message), format(uncached, message))
+    assert encoder.encoded.count("user profile") == 1
+    assert len(cached.context_cache) == 4
+    assert cached.context_cache.hits == 5
+    if auto_embed:
+        assert encoder.encoded.count("1_one") == 1
+
+
+@pytest.mark.parametrize("auto_embed", [False, True])
+def test_pickbest_textembedder_duplicate_actions(auto_embed: bool) -> None:
+    featurizer = pick_best_chain.PickBestFeaturizer(
+        auto_embed=auto_embed,
+        model=MockEncoder(),
+        context_cache_size=1024,
+        encode_cache_size=4096,
+    )
+    plain = pick_best_chain.PickBestFeaturizer(
+        auto_embed=auto_embed, model=MockEncoder()
+    )
+    actions = [
+        {"a": "template", "b": rl_chain.Embed("0")},
+        "other",
+        {"a": "template", "b": rl_chain.Embed("0")},
+        {"a": "template", "b": rl_chain.Embed("1")},
+    ]
+    if auto_embed:
+        actions = ["template", "other", "template", "template 1"]
+
+    def format(featurizer) -> str:
+        event = pick_best_chain.PickBestEvent(
+            inputs={"context": BasedOn("ctx"), "action": ToSelectFrom(actions)}
+        )
+        return vw_cb_formatter(*featurizer.featurize(event))
+
+    assert_vw_ex_equals(format(featurizer), format(plain))
+
+    _, featurized = featurizer.get_context_and_actions(
+        pick_best_chain.PickBestEvent(
+            inputs={"context": BasedOn("ctx"), "action": ToSelectFrom(actions)}
+        )
+    )
+    assert featurized[0] is not featurized[2]
+    assert featurized[0].rendered and featurized[0].rendered == featurized[2].rendered
+    assert not featurized[1].rendered
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+import learn_to_pick
+from learn_to_pick.policy_manager import PolicyManager
+from test_utils import ConstantScorer, MockEncoder
+
+
+def _manager(tmp_path, **kwargs) -> PolicyManager:
+    return PolicyManager(
+        key_fn=lambda event: event.based_on["segment"],
+        model_save_dir=tmp_path,
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        **kwargs,
+    )
+
+
+def _run(pick, segment: str) -> None:
+    pick.run(
+        segment=learn_to_pick.BasedOn(segment),
+        action=learn_to_pick.ToSelectFrom(["0", "1", "2"]),
+    )
+
+
+def test_policies_are_routed_by_key(tmp_path) -> None:
+    manager = _manager(tmp_path)
+    pick = learn_to_pick.PickBest.create(
+        policy=manager, selection_scorer=ConstantScorer()
+    )
+    _run(pick, "a")
+    _run(pick, "b")
+    _run(pick, "a")
+    assert manager.resident_keys() == ["b", "a"]
+    assert manager.metrics.hits == 1
+    assert manager.metrics.misses == 2
+    assert manager.metrics.loads == 2
+    assert manager.metrics.hit_rate == 1 / 3
+
+
+def test_lru_eviction_checkpoints_dirty_policies(tmp_path) -> None:
+    manager = _manager(tmp_path, max_policies=2)
+    pick = learn_to_pick.PickBest.create(
+        policy=manager, selection_scorer=ConstantScorer()
+    )
+    _run(pick, "a")
+    _run(pick, "b")
+    _run(pick, "a")
+    _run(pick, "c")
+    assert manager.resident_keys() == ["a", "c"]
+    assert manager.metrics.evictions == 1
+    assert manager.metrics.checkpoints == 1
+    assert (tmp_path / "b" / "latest.vw").exists()
+
+    # evicted policy is reloaded from its checkpoint
+    _run(pick, "b")
+    assert manager.metrics.loads == 4
+
+
+def test_eviction_by_bytes(tmp_path) -> None:
+    manager = _manager(tmp_path, max_bytes=10, size_estimator=lambda policy: 6)
+    pick = learn_to_pick.PickBest.create(policy=manager, selection_scorer=None)
+    _run(pick, "a")
+    _run(pick, "b")
+    assert manager.resident_keys() == ["b"]
+    assert manager.resident_bytes == 6
+    # nothing was learned, so nothing needs to be saved
+    assert manager.metrics.checkpoints == 0
+
+
+def test_save_checkpoints_all_dirty_policies(tmp_path) -> None:
+    manager = _manager(tmp_path)
+    pick = learn_to_pick.PickBest.create(
+        policy=manager, selection_scorer=ConstantScorer()
+    )
+    _run(pick, "a")
+    _run(pick, "b")
+    pick.save_progress()
+    assert manager.metrics.checkpoints == 2
+    pick.save_progress()
+    assert manager.metrics.checkpoints == 2
+
+
+def test_invalid_keys_are_rejected(tmp_path) -> None:
+    manager = _manager(tmp_path)
+    pick = learn_to_pick.PickBest.create(policy=manager, selection_scorer=None)
+    for key in ["..", ".", "a/b", ""]:
+        with pytest.raises(ValueError):
+            _run(pick, key)
+    _run(pick, "v1.2")
+    assert manager.resident_keys() == ["v1.2"]
+
+
+class _SlowPolicy(learn_to_pick.Policy):
+    def __init__(self, **kwargs) -> None:
+        super().__init__()
+        self.learning = threading.Event()
+        self.saves = 0
+
+    def predict(self, event):
+        return []
+
+    def learn(self, event) -> None:
+        self.learning.set()
+        time.sleep(0.1)
+
+    def log(self, event) -> None:
+        pass
+
+    def save(self) -> None:
+        self.saves += 1
+
+
+class _Event:
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.selected = type("Selected", (), {"score": 1.0})()
+
+
+def test_policy_is_not_evicted_while_learning(tmp_path) -> None:
+    manager = PolicyManager(
+        key_fn=lambda event: event.key,
+        model_save_dir=tmp_path,
+        max_policies=1,
+        create_policy=_SlowPolicy,
+    )
+    policy = manager.policy_for(_Event("a"))
+    learning = threading.Thread(target=manager.learn, args=(_Event("a"),))
+    learning.start()
+    policy.learning.wait()
+    # loading another policy evicts "a", which must be saved with what it is learning
+    manager.predict(_Event("b"))
+    learning.join()
+    assert manager.resident_keys() == ["b"]
+    assert policy.saves == 1
@@ -0,0 +1,81 @@
+import gzip
+import shutil
+
+import pytest
+
+import learn_to_pick
+from learn_to_pick.replay import main, replay
+from learn_to_pick.vw_logger import (
+    VwLogger,
+    log_segments,
+    parse_cb_label,
+    read_vw_log,
+    read_vw_log_chunks,
+)
+from test_utils import ConstantScorer, MockEncoder
+
+labeled = "shared |User_sparse default_ft=ctx\n|action_sparse default_ft=0\n1:-1.0:0.5 |action_sparse default_ft=1"
+unlabeled = "shared |User_sparse default_ft=ctx\n|action_sparse default_ft=0\n|action_sparse default_ft=1"
+
+
+def _write_log(path, examples) -> None:
+    logger = VwLogger(path)
+    for ex in examples:
+        logger.log(ex)
+
+
+def test_parse_cb_label() -> None:
+    assert parse_cb_label(labeled) == (1, -1.0, 0.5)
+    assert parse_cb_label(unlabeled) is None
+
+
+def test_read_rotated_and_compressed_segments(tmp_path) -> None:
+    log = tmp_path / "rl_logs.txt"
+    _write_log(tmp_path / "old.txt", [labeled] * 2)
+    with open(tmp_path / "old.txt", "rb") as src, gzip.open(f"{log}.2.gz", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    _write_log(f"{log}.1", [unlabeled])
+    _write_log(log, [labeled])
+
+    assert [p.name for p in log_segments(log)] == [
+        "rl_logs.txt.2.gz",
+        "rl_logs.txt.1",
+        "rl_logs.txt",
+    ]
+    assert list(read_vw_log(log)) == [labeled, labeled, unlabeled, labeled]
+    assert [len(c) for c in read_vw_log_chunks(log, chunk_size=3)] == [3, 1]
+
+
+@pytest.mark.parametrize("background_parsing", [True, False])
+def test_replay_learns_labeled_examples(tmp_path, background_parsing) -> None:
+    log = tmp_path / "rl_logs.txt"
+    _write_log(log, [labeled, unlabeled] * 5)
+    policy = learn_to_pick.PickBest.create_policy(
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        model_save_dir=str(tmp_path / "model"),
+    )
+    stats = replay(log, policy, chunk_size=3, background_parsing=background_parsing)
+    assert stats.examples == 5
+    assert stats.skipped == 5
+    assert (tmp_path / "model" / "latest.vw").exists()
+
+
+def test_replay_from_picker_logs(tmp_path) -> None:
+    log = tmp_path / "rl_logs.txt"
+    featurizer = learn_to_pick.PickBestFeaturizer(auto_embed=False, model=MockEncoder())
+    pick = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(),
+        featurizer=featurizer,
+        rl_logs=log,
+        model_save_dir=str(tmp_path / "online"),
+    )
+    for _ in range(10):
+        pick.run(
+            User=learn_to_pick.BasedOn("ctx"),
+            action=learn_to_pick.ToSelectFrom(["0", "1", "2"]),
+        )
+
+    main([str(log), "--model-save-dir", str(tmp_path / "offline")])
+    assert (tmp_path / "offline" / "latest.vw").exists()
@@ -0,0 +1,421 @@
+import time
+
+import pytest
+
+import learn_to_pick
+from learn_to_pick.scoring import (
+    CompiledPrompt,
+    ScoreCache,
+    ScoringStats,
+    TokenBucket,
+)
+from test_utils import MockEncoder
+
+
+class counting_llm:
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, prompt: str) -> str:
+        self.calls += 1
+        return "0.5"
+
+
+def test_score_cache_lru_eviction() -> None:
+    cache = ScoreCache(max_size=2)
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+    assert cache.get("a") == 1.0
+    cache.put("c", 3.0)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1.0
+    assert cache.get("c") == 3.0
+    assert cache.evictions == 1
+    assert cache.hits == 3 and cache.misses == 1
+    assert cache.hit_rate == 0.75
+
+
+def test_score_cache_ttl() -> None:
+    cache = ScoreCache(ttl=0.01)
+    cache.put("a", 1.0)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_score_cache_persistence(tmp_path) -> None:
+    path = tmp_path / "scores.json"
+    cache = ScoreCache(path=path)
+    cache.put("a", 1.0)
+    cache.save()
+    assert ScoreCache(path=path).get("a") == 1.0
+
+
+def test_auto_selection_scorer_uses_cache(tmp_path) -> None:
+    llm = counting_llm()
+    cache = ScoreCache(path=tmp_path / "scores.json")
+    pick = learn_to_pick.PickBest.create(
+        selection_scorer=learn_to_pick.AutoSelectionScorer(llm=llm, cache=cache),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        model_save_dir=str(tmp_path),
+    )
+    for _ in range(5):
+        response = pick.run(
+            User=learn_to_pick.BasedOn("Context"),
+            action=learn_to_pick.ToSelectFrom(["0"]),
+        )
+        assert response["picked_metadata"].selected.score == 0.5  # type: ignore
+    assert llm.calls == 1
+    assert cache.hits == 4
+
+    pick.save_progress()
+    assert (tmp_path / "scores.json").exists()
+
+
+class batching_llm:
+    def __init__(self, fail_batch: bool = False):
+        self.fail_batch = fail_batch
+        self.batches = []
+        self.predict_calls = 0
+
+    def predict(self, prompt: str) -> str:
+        self.predict_calls += 1
+        return "oops" if "broken" in prompt else "0.5"
+
+    def batch(self, prompts):
+        if self.fail_batch:
+            raise RuntimeError("endpoint down")
+        self.batches.append(len(prompts))
+        return ["oops" if "broken" in p else "0.5" for p in prompts]
+
+
+def _pick(scorer):
+    return learn_to_pick.PickBest.create(
+        selection_scorer=scorer,
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+    )
+
+
+def _inputs(context: str):
+    return {
+        "User": learn_to_pick.BasedOn(context),
+        "action": learn_to_pick.ToSelectFrom(["0", "1"]),
+    }
+
+
+def test_run_batch_scores_in_batches() -> None:
+    llm = batching_llm()
+    scorer = learn_to_pick.BatchedAutoSelectionScorer(
+        llm=llm, batch_size=4, max_wait=0.01
+    )
+    pick = _pick(scorer)
+    responses = pick.run_batch([_inputs(f"ctx{i}") for i in range(8)])
+    assert [r["picked_metadata"].selected.score for r in responses] == [0.5] * 8
+    assert llm.batches == [4, 4]
+    assert llm.predict_calls == 0
+    scorer.close()
+
+
+def test_default_submit_is_a_scorer_method() -> None:
+    from learn_to_pick.base import Policy, SelectionScorer
+
+    assert not hasattr(Policy, "submit")
+    scorer = slow_scorer()
+    assert scorer.submit(inputs={}, picked=None, event=None).result() == 1.0
+
+    scorer.fail = True
+    with pytest.raises(RuntimeError):
+        SelectionScorer.submit(scorer, inputs={}, picked=None, event=None).result()
+
+    # run_batch() scores with scorers that do not batch
+    scorer = slow_scorer()
+    responses = _pick(scorer).run_batch([_inputs("a"), _inputs("b")])
+    assert [r["picked_metadata"].selected.score for r in responses] == [1.0, 1.0]
+    assert scorer.calls == 2
+
+
+def test_batched_scorer_isolates_failures() -> None:
+    for llm in [batching_llm(), batching_llm(fail_batch=True)]:
+        scorer = learn_to_pick.BatchedAutoSelectionScorer(llm=llm, max_wait=0.01)
+        pick = _pick(scorer)
+        responses = pick.run_batch(
+            [_inputs("good"), _inputs("broken"), _inputs("good")]
+        )
+        assert [r["picked_metadata"].selected.score for r in responses] == [
+            0.5,
+            None,
+            0.5,
+        ]
+        scorer.close()
+
+
+def test_batched_scorer_with_concurrent_runs() -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    llm = batching_llm()
+    scorer = learn_to_pick.BatchedAutoSelectionScorer(llm=llm, batch_size=4, max_wait=5)
+    pick = _pick(scorer)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(lambda i: pick.run(**_inputs(f"ctx{i}")), range(4)))
+    assert [r["picked_metadata"].selected.score for r in responses] == [0.5] * 4
+    assert llm.batches == [4]
+    scorer.close()
+
+
+class slow_scorer(learn_to_pick.SelectionScorer):
+    def __init__(self, seconds: float = 0, fail: bool = False):
+        self.seconds = seconds
+        self.fail = fail
+        self.calls = 0
+
+    def score_response(self, inputs, picked, event) -> float:
+        self.calls += 1
+        time.sleep(self.seconds)
+        if self.fail:
+            raise RuntimeError("llm down")
+        return 1.0
+
+
+def _pick_with(scorer, **kwargs):
+    return learn_to_pick.PickBest.create(
+        selection_scorer=scorer,
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        **kwargs,
+    )
+
+
+def test_scoring_timeout_uses_fallback() -> None:
+    pick = _pick_with(
+        slow_scorer(seconds=0.5),
+        scoring_timeout=0.05,
+        scoring_fallback="default",
+        default_score=-1.0,
+    )
+    response = pick.run(**_inputs("ctx"))
+    assert response["picked_metadata"].selected.score == -1.0
+    assert pick.scoring_stats.timeouts == 1
+    assert pick.scoring_stats.fallbacks == 1
+    pick.close()
+
+
+def test_scoring_timeout_cancels_queued_calls() -> None:
+    import threading
+
+    class blocking_scorer(learn_to_pick.SelectionScorer):
+        def __init__(self) -> None:
+            self.release = threading.Event()
+            self.calls = 0
+
+        def score_response(self, inputs, picked, event) -> float:
+            self.calls += 1
+            self.release.wait()
+            return 1.0
+
+    scorer = blocking_scorer()
+    pick = _pick_with(scorer, scoring_timeout=0.01, max_scoring_workers=1)
+    for _ in range(4):
+        pick.run(**_inputs("ctx"))
+    assert pick.scoring_stats.timeouts == 4
+    scorer.release.set()
+    pick._timeout_pool.shutdown(wait=True)
+    # at most the call that was running when it timed out reached the scorer
+    assert scorer.calls <= 1
+    assert pick.scoring_stats.in_flight == 0
+    pick.close()
+
+
+def test_max_inflight_scores_short_circuits() -> None:
+    pick = _pick_with(
+        slow_scorer(seconds=0.3), scoring_timeout=0.01, max_inflight_scores=1
+    )
+    first = pick.run(**_inputs("ctx"))
+    second = pick.run(**_inputs("ctx"))
+    assert first["picked_metadata"].selected.score is None
+    assert second["picked_metadata"].selected.score is None
+    assert pick.scoring_stats.timeouts == 1
+    assert pick.scoring_stats.short_circuits == 1
+    assert pick.selection_scorer.calls == 1
+    pick.close()
+
+
+def test_delayed_fallback_allows_delayed_score() -> None:
+    pick = _pick_with(slow_scorer(fail=True), scoring_fallback="delayed")
+    response = pick.run(**_inputs("ctx"))
+    event = response["picked_metadata"]
+    assert event.awaiting_delayed_score
+    assert event.selected.score is None
+    pick.update_with_delayed_score(score=0.7, chain_response=response)
+    assert event.selected.score == 0.7
+    assert not event.awaiting_delayed_score
+
+    with pytest.raises(RuntimeError):
+        pick.update_with_delayed_score(score=0.7, chain_response=response)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_circuit_breaker_pauses_scoring() -> None:
+    scorer = slow_scorer(fail=True)
+    clock = FakeClock()
+    breaker = learn_to_pick.ScoringCircuitBreaker(
+        failure_threshold=2, reset_timeout=10, clock=clock
+    )
+    pick = _pick_with(scorer, circuit_breaker=breaker)
+    for _ in range(5):
+        pick.run(**_inputs("ctx"))
+    assert scorer.calls == 2
+    assert pick.scoring_stats.failures == 2
+    assert pick.scoring_stats.short_circuits == 3
+    assert breaker.state == learn_to_pick.ScoringCircuitBreaker.OPEN
+
+    clock.now += 5
+    assert pick.run(**_inputs("ctx"))["picked_metadata"].selected.score is None
+    assert scorer.calls == 2
+
+    clock.now += 5
+    scorer.fail = False
+    response = pick.run(**_inputs("ctx"))
+    assert response["picked_metadata"].selected.score == 1.0
+    assert breaker.state == learn_to_pick.ScoringCircuitBreaker.CLOSED
+
+
+def test_scoring_sample_rate() -> None:
+    scorer = slow_scorer()
+    pick = _pick_with(scorer, scoring_sample_rate=0.0, metrics_step=1)
+    responses = [pick.run(**_inputs("ctx")) for _ in range(5)]
+    assert scorer.calls == 0
+    assert all(not r["picked_metadata"].scoring_sampled for r in responses)
+    assert all(r["picked_metadata"].selected.score is None for r in responses)
+    assert pick.metrics.decision_count == 0
+    assert pick.scoring_stats.sampled_out == 5
+
+    pick.update_with_delayed_score(
+        score=1.0, chain_response=responses[0], force_score=True
+    )
+    assert pick.metrics.decision_count == 1
+    assert pick.metrics.score == 1.0
+
+
+def test_max_scores_per_second() -> None:
+    scorer = slow_scorer()
+    pick = _pick_with(scorer, max_scores_per_second=2, metrics_step=1)
+    clock = FakeClock()
+    pick._scoring_budget = TokenBucket(rate=2, clock=clock)
+    responses = [pick.run(**_inputs("ctx")) for _ in range(5)]
+    sampled = [r["picked_metadata"].scoring_sampled for r in responses]
+    assert sampled == [True, True, False, False, False]
+    assert scorer.calls == 2
+    assert pick.metrics.decision_count == 2
+    assert pick.metrics.score == 1.0
+
+    clock.now += 0.4
+    assert not pick.run(**_inputs("ctx"))["picked_metadata"].scoring_sampled
+    clock.now += 0.1
+    assert pick.run(**_inputs("ctx"))["picked_metadata"].scoring_sampled
+
+
+def test_compiled_prompt_matches_str_format() -> None:
+    inputs = {"a": "x", "b": [1, 2], "c": 0.5, "unused": object()}
+    for template in [
+        "plain",
+        "{a} and {a}",
+        "{b[1]} {c:.2f} {a!r}",
+        "{{escaped}} {a}",
+        "{c:{width}}",
+    ]:
+        full = dict(inputs, width=6)
+        assert CompiledPrompt(template).format(full) == template.format(**full)
+
+    with pytest.raises(KeyError):
+        CompiledPrompt("{missing}").format(inputs)
+
+
+def test_lazy_inputs() -> None:
+    from learn_to_pick.base import _LazyInputs
+
+    renders = []
+
+    def render(value):
+        return lambda: renders.append(value) or value
+
+    inputs = _LazyInputs({"a": 1}, {"b": render("B"), "c": render("C")})
+    assert "b" in inputs and inputs
+    assert renders == []
+    assert CompiledPrompt("{a} {b}").format(inputs) == "1 B"
+    assert renders == ["B"]
+    assert inputs.get("b") == "B"
+    assert renders == ["B"]
+
+    inputs["c"] = "overridden"
+    assert dict(inputs) == {"a": 1, "b": "B", "c": "overridden"}
+    assert renders == ["B"]
+
+    other = _LazyInputs({}, {"d": render("D")})
+    assert len(other) == 1
+    assert renders == ["B", "D"]
+
+
+def test_response_pickle_and_deepcopy() -> None:
+    import copy
+    import pickle
+
+    pick = _pick(None)
+    response = pick.run(**_inputs("ctx"))
+    outputs = response["picked_metadata"].outputs
+    for restored in [pickle.loads(pickle.dumps(response)), copy.deepcopy(response)]:
+        event = restored["picked_metadata"]
+        assert type(event.outputs) is dict
+        assert event.outputs.keys() == outputs.keys()
+        assert event.outputs["picked"] == outputs["picked"]
+        assert event.outputs["selected_based_on"] == outputs["selected_based_on"]
+        assert restored["picked"] == response["picked"]
+        assert event.selected.index == response["picked_metadata"].selected.index
+
+
+def test_scorer_reads_rendered_selection() -> None:
+    class recording_llm:
+        prompts = []
+
+        def predict(self, prompt: str) -> str:
+            self.prompts.append(prompt)
+            return "1"
+
+    llm = recording_llm()
+    scorer = learn_to_pick.AutoSelectionScorer(
+        llm=llm, prompt="{selected_based_on} -> {picked}"
+    )
+    pick = _pick(scorer)
+    response = pick.run(**_inputs("ctx"))
+    picked = response["picked"]
+    assert llm.prompts == [f"{{'User': 'ctx'}} -> {picked}"]
+    assert response["picked_metadata"].outputs["picked"] == str(picked)
+
+
+def test_scoring_stats_are_thread_safe() -> None:
+    import threading
+
+    stats = ScoringStats()
+
+    def count() -> None:
+        for _ in range(10000):
+            stats.increment("scored")
+
+    threads = [threading.Thread(target=count) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert stats.scored == 80000
@@ -0,0 +1,101 @@
+import learn_to_pick
+from learn_to_pick.simulator import Environment, compare, simulate
+from test_utils import MockEncoder
+
+
+def _vw_picker(env: Environment) -> learn_to_pick.PickBest:
+    return learn_to_pick.PickBest.create(
+        selection_scorer=env.scorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        metrics_step=50,
+        metrics_window_size=50,
+    )
+
+
+def _random_picker(env: Environment) -> learn_to_pick.PickBest:
+    return learn_to_pick.PickBest.create(
+        selection_scorer=env.scorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        policy=learn_to_pick.PickBestRandomPolicy(),
+    )
+
+
+def test_environment_rewards() -> None:
+    env = Environment.random(n_features=2, n_values=3, n_actions=4, noise=0)
+    assert len(env.preferences) == 9
+    context = env.sample_context()
+    assert set(context) == {"feature0", "feature1"}
+    assert env.best_reward(context) == 1.0
+    assert sum(env.expected_reward(context, a) == 1.0 for a in env.actions) == 1
+    action = env.actions[0]
+    assert env.reward(context, action) == env.expected_reward(context, action)
+
+
+def test_environment_drift() -> None:
+    env = Environment.random(drift_every=10, drift_fraction=1.0, seed=1)
+    before = {k: dict(v) for k, v in env.preferences.items()}
+    for _ in range(9):
+        env.step()
+    assert env.preferences == before
+    env.step()
+    assert env.preferences != before
+
+
+def test_contexts_do_not_depend_on_rewards() -> None:
+    import copy
+
+    env = Environment.random(drift_every=5, seed=3)
+    other = copy.deepcopy(env)
+    for step in range(50):
+        context = env.sample_context()
+        assert context == other.sample_context()
+        # only one of the copies observes rewards, e.g. when scoring is sampled or fails
+        for _ in range(step % 3):
+            env.reward(context, env.actions[0])
+        env.step()
+        other.step()
+    assert env.preferences == other.preferences
+
+
+def test_environment_custom_reward() -> None:
+    env = Environment(
+        contexts={"user": ["Tom", "Anna"]},
+        actions=["sports", "music"],
+        reward_fn=lambda context, action: float(
+            (context["user"] == "Tom") == (action == "sports")
+        ),
+    )
+    assert env.expected_reward({"user": "Tom"}, "sports") == 1.0
+    assert env.expected_reward({"user": "Anna"}, "sports") == 0.0
+
+
+def test_simulate_reports() -> None:
+    env = Environment.random(n_actions=3)
+    result = simulate(_vw_picker(env), env, steps=200, report_every=50)
+    assert result.steps == 200
+    assert 0 < result.average_reward <= 1
+    assert result.regret >= 0
+    assert result.cpu_seconds > 0 and result.decisions_per_second > 0
+    assert result.reward_per_cpu_second > 0
+    assert list(result.curve["step"]) == [50, 100, 150, 200]
+    assert result.curve["regret"].is_monotonic_increasing
+    assert list(result.metrics["step"]) == [0, 50, 100, 150, 200]
+
+
+def test_learning_beats_random() -> None:
+    env = Environment(
+        contexts={"user": ["Tom", "Anna"]},
+        actions=["politics", "sports", "music"],
+        noise=0.05,
+        seed=3,
+    )
+    results = compare({"vw": _vw_picker, "random": _random_picker}, env, steps=1000)
+    assert list(results.index) == ["vw", "random"]
+    assert results.loc["vw", "regret"] < results.loc["random", "regret"]
+    assert results.loc["vw", "average_reward"] > results.loc["random", "average_reward"]
+    # every picker ran on its own copy of the environment
+    assert env.decisions == 0
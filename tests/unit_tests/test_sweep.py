@@ -0,0 +1,66 @@
+import pytest
+
+import learn_to_pick
+from learn_to_pick.sweep import expand_grid, sweep
+from test_utils import MockEncoder
+
+
+def test_expand_grid() -> None:
+    assert expand_grid(
+        ["--cb_explore_adf"],
+        {
+            "exploration": [["--squarecb"], ["--epsilon=0.1"]],
+            "lr": [["-l", "0.5"]],
+        },
+    ) == [
+        ["--cb_explore_adf", "--squarecb", "-l", "0.5"],
+        ["--cb_explore_adf", "--epsilon=0.1", "-l", "0.5"],
+    ]
+
+
+@pytest.fixture
+def logs(tmp_path):
+    class Scorer(learn_to_pick.SelectionScorer):
+        def score_response(self, inputs, picked, event) -> float:
+            return 1.0 if picked["action"] == inputs["User"] else 0.0
+
+    log = tmp_path / "rl_logs.txt"
+    pick = learn_to_pick.PickBest.create(
+        selection_scorer=Scorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        rl_logs=log,
+        model_save_dir=str(tmp_path / "production"),
+    )
+    actions = ["0", "1", "2"]
+    for i in range(30):
+        pick.run(
+            User=learn_to_pick.BasedOn(actions[i % 3]),
+            action=learn_to_pick.ToSelectFrom(actions),
+        )
+    return log
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_sweep_ranks_variants_and_saves_best(tmp_path, logs, processes) -> None:
+    vw_cmds = expand_grid(
+        ["--cb_explore_adf", "--quiet", "--interactions=::"],
+        {"exploration": [["--squarecb"], ["--epsilon=0.1"], ["--epsilon=0.5"]]},
+    )
+    result = sweep(
+        logs,
+        vw_cmds,
+        model_save_dir=tmp_path / "best",
+        processes=processes,
+        rank_by="snips",
+    )
+    assert len(result.table) == 3
+    assert list(result.table["snips"]) == sorted(result.table["snips"], reverse=True)
+    assert result.table["vw_cmd"][0] == " ".join(result.best_vw_cmd)
+    assert (tmp_path / "best" / "latest.vw").exists()
+
+
+def test_sweep_requires_cb_explore_adf(logs) -> None:
+    with pytest.raises(ValueError):
+        sweep(logs, [["--cb_adf"]], processes=1)
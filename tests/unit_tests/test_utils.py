@@ -1,4 +1,6 @@
-from typing import Any, List
+from typing import Any, Dict, List
+
+import learn_to_pick
 
 
 class MockEncoder:
@@ -6,6 +8,15 @@ class MockEncoder:
         return [float(len(to_encode)), 0.0]
 
 
+class CountingEncoder(MockEncoder):
+    def __init__(self) -> None:
+        self.encoded: List[str] = []
+
+    def encode(self, to_encode: str) -> List[float]:
+        self.encoded.append(to_encode)
+        return super().encode(to_encode)
+
+
 class MockEncoderReturnsList:
     def encode(self, to_encode: Any) -> List:
         if isinstance(to_encode, str):
@@ -15,6 +26,11 @@ class MockEncoderReturnsList:
         raise ValueError("Invalid input type for unit test")
 
 
+class ConstantScorer(learn_to_pick.SelectionScorer):
+    def score_response(self, inputs: Dict[str, Any], picked: Any, event: Any) -> float:
+        return 1.0
+
+
 def assert_vw_ex_equals(first, second):
     first = first.split("\n")
     second = second.split("\n")
@@ -0,0 +1,111 @@
+import gc
+import os
+from typing import Any, Dict
+
+import pytest
+
+import learn_to_pick
+from learn_to_pick.warmup import PreloadedModelRepository, Preloader, warm_up
+from test_utils import ConstantScorer, MockEncoder
+
+
+def _inputs() -> Dict[str, Any]:
+    return {
+        "user": learn_to_pick.BasedOn("Tom"),
+        "action": learn_to_pick.ToSelectFrom(learn_to_pick.Embed(["0", "1", "2"])),
+    }
+
+
+@pytest.fixture
+def unfreeze() -> Any:
+    yield
+    if hasattr(gc, "unfreeze"):
+        gc.unfreeze()
+
+
+def test_preloaded_model_repository_reads_once(tmp_path: Any) -> None:
+    picker = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        model_save_dir=str(tmp_path),
+    )
+    picker.run(_inputs())
+    picker.save_progress()
+
+    repo = PreloadedModelRepository(tmp_path)
+    model_data = repo.preload()
+    assert model_data == (tmp_path / "latest.vw").read_bytes()
+    os.remove(tmp_path / "latest.vw")
+    first = repo.load(picker.policy.vw_cmd)
+    second = repo.load(picker.policy.vw_cmd)
+    assert first is not second
+    assert first.serialize() == second.serialize()
+
+    repo.save(first)
+    assert not repo.preloaded
+    assert (tmp_path / "latest.vw").exists()
+
+
+def test_preloader(tmp_path: Any, unfreeze: Any) -> None:
+    loads = []
+
+    def factory() -> MockEncoder:
+        loads.append(1)
+        return MockEncoder()
+
+    preloader = Preloader(
+        model_save_dir=tmp_path,
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=learn_to_pick.LazyEncoder(factory)
+        ),
+        warmup_inputs=[_inputs()],
+    ).preload()
+    assert loads == [1]
+    assert preloader.preload_seconds >= 0
+    if hasattr(gc, "get_freeze_count"):
+        assert gc.get_freeze_count() > 0
+
+    pickers = [preloader.create(selection_scorer=ConstantScorer()) for _ in range(2)]
+    assert pickers[0].policy.workspace is not pickers[1].policy.workspace
+    for picker in pickers:
+        picker.run(_inputs())
+        assert picker.policy.featurizer is preloader.featurizer
+    assert loads == [1]
+
+
+def test_warm_up_has_no_side_effects() -> None:
+    picker = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+        metrics_step=1,
+    )
+    warm_up(picker, [_inputs()] * 3)
+    assert picker.metrics.decision_count == 0
+    assert picker.metrics.feedback_count == 0
+
+
+def test_warm_up_waits_for_the_policy_lock() -> None:
+    import threading
+
+    picker = learn_to_pick.PickBest.create(
+        selection_scorer=ConstantScorer(),
+        featurizer=learn_to_pick.PickBestFeaturizer(
+            auto_embed=False, model=MockEncoder()
+        ),
+    )
+    predictions = []
+    predict = picker.policy.predict
+    picker.policy.predict = lambda event: predictions.append(event) or predict(event)
+
+    with picker._policy_lock:
+        warming = threading.Thread(target=warm_up, args=(picker, [_inputs()]))
+        warming.start()
+        warming.join(timeout=0.1)
+        # a run() in progress holds the lock, the warm-up prediction waits for it
+        assert predictions == []
+    warming.join()
+    assert len(predictions) == 1